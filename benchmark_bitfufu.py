@@ -0,0 +1,1044 @@
+#!/usr/bin/env python3
+"""
+قياس أداء مكونات نظام مراقبة BitFuFu بدون اتصال بالإنترنت
+"""
+
+import re
+import sys
+import json
+import time
+import os
+import random
+import logging
+import argparse
+import tempfile
+import tracemalloc
+from copy import deepcopy
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional
+
+from bitfufu_email_parser import RevenueJournalParser
+from bitfufu_fakes import make_revenue_journal_body, make_mime_fixture_message, MIME_FIXTURE_LAYOUTS
+from bitfufu_plan_registry import PlanRegistry
+
+# أحجام الرسائل الاصطناعية من 1KB إلى 5MB
+BODY_SIZES = [1_000, 10_000, 100_000, 1_000_000, 5_000_000]
+
+# ملف الأزمنة المرجعية (يُنشأ محلياً عبر --save-baseline ولا يُرفع للمستودع)
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmark_baseline.json")
+
+# نسبة التراجع المسموح بها فوق الزمن المرجعي، وهامش ثابت للأزمنة الصغيرة جداً
+DEFAULT_TOLERANCE = 0.5
+BASELINE_SLACK_SECONDS = 0.005
+
+# أزمنة WebDriver الوهمي لقياس التشغيل الكامل (بالثواني)
+FAKE_DRIVER_LATENCIES = {"launch": 0.3, "get": 0.2, "paste": 0.01, "click": 0.005}
+
+# أحجام رسائل WhatsApp من 1KB إلى 10KB
+MESSAGE_SIZES = [1_000, 2_500, 5_000, 10_000]
+
+# صفحة محلية بديلة لمربع كتابة WhatsApp (تعالج اللصق كما يفعل محرر WhatsApp)
+COMPOSE_STANDIN_HTML = """<!DOCTYPE html>
+<html><body>
+<div contenteditable="true" data-tab="10" role="textbox" style="white-space: pre-wrap"></div>
+<script>
+const box = document.querySelector('[data-tab="10"]');
+box.addEventListener('paste', (event) => {
+    event.preventDefault();
+    document.execCommand('insertText', false, event.clipboardData.getData('text/plain'));
+});
+</script>
+</body></html>
+"""
+
+
+def _best_of(func: Callable, repeat: int = 3) -> float:
+    """أفضل زمن تنفيذ بالثواني من عدة محاولات"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def _make_plans(count: int) -> Dict[str, float]:
+    """خطط اصطناعية بأرقام من 5 خانات"""
+    return {str(90000 + i): round(0.00001 * (i + 1), 8) for i in range(count)}
+
+
+def _legacy_parse(body: str, plan_ids: List[str]) -> Dict:
+    """الطريقة السابقة: حتى ثلاثة أنماط لكل خطة على كامل النص (للمقارنة فقط)"""
+    btc_price = None
+    for pattern in [r'BTC[:/\s]+\$?([\d,]+\.?\d*)',
+                    r'Bitcoin[:/\s]+\$?([\d,]+\.?\d*)',
+                    r'Price[:/\s]+\$?([\d,]+\.?\d*)']:
+        match = re.search(pattern, body, re.IGNORECASE)
+        if match:
+            btc_price = float(match.group(1).replace(',', ''))
+            break
+
+    plans = {}
+    for plan_id in plan_ids:
+        for pattern in [rf'{plan_id}[^\d]+([\d.]+)\s*BTC',
+                        rf'Plan\s*{plan_id}[^\d]+([\d.]+)',
+                        rf'{plan_id}.*?(0\.\d+)']:
+            match = re.search(pattern, body, re.IGNORECASE)
+            if match:
+                plans[plan_id] = float(match.group(1))
+                break
+
+    return {"btc_price": btc_price, "plans": plans}
+
+
+def bench_parser(results: Dict[str, float]) -> bool:
+    """قياس زمن تحليل الرسائل حسب الحجم وعدد الخطط"""
+    parser = RevenueJournalParser()
+    ok = True
+
+    print("تحليل الرسائل حسب الحجم (4 خطط):")
+    print(f"{'الحجم':>10} {'نص ms':>10} {'HTML ms':>10} {'ms/MB':>10}")
+    plans = _make_plans(4)
+    for size in BODY_SIZES:
+        text_body = make_revenue_journal_body(62500.0, plans, padding_bytes=size)
+        html_body = make_revenue_journal_body(62500.0, plans, padding_bytes=size, html=True)
+
+        # التحقق من صحة النتائج قبل القياس
+        for body in (text_body, html_body):
+            result = parser.parse(body)
+            if result["btc_price"] != 62500.0 or result["plans"] != plans:
+                print(f"❌ نتيجة غير صحيحة للحجم {size}: {result}")
+                ok = False
+
+        text_time = _best_of(lambda: parser.parse(text_body))
+        html_time = _best_of(lambda: parser.parse(html_body))
+        per_mb = text_time * 1000 / (len(text_body) / 1_000_000)
+        print(f"{size:>10,} {text_time * 1000:>10.2f} {html_time * 1000:>10.2f} {per_mb:>10.2f}")
+        results[f"parser_text_{size}"] = text_time
+        results[f"parser_html_{size}"] = html_time
+
+    print("\nتحليل رسالة 1MB حسب عدد الخطط:")
+    print(f"{'الخطط':>10} {'جديد ms':>10} {'سابق ms':>10}")
+    for count in (4, 16, 64):
+        plans = _make_plans(count)
+        body = make_revenue_journal_body(62500.0, plans, padding_bytes=1_000_000)
+        new_time = _best_of(lambda: parser.parse(body))
+        legacy_time = _best_of(lambda: _legacy_parse(body, list(plans)), repeat=1)
+        print(f"{count:>10} {new_time * 1000:>10.2f} {legacy_time * 1000:>10.2f}")
+        results[f"parser_plans_{count}"] = new_time
+
+    return ok
+
+
+# عدد الخطط في البريد وحجم سجل الخطط لقياس الاستخراج
+EXTRACT_PLAN_COUNTS = [4, 1_000, 5_000]
+REGISTRY_SIZES = [10, 10_000]
+
+
+def bench_plan_registry(results: Dict[str, float]) -> bool:
+    """استخراج الخطط مع سجل الخطط: الزمن حسب خطط البريد وليس حجم السجل"""
+    from gmail_bitfufu_monitor import BitFuFuGmailMonitor
+
+    logging.getLogger('gmail_bitfufu_monitor').setLevel(logging.WARNING)
+    logging.getLogger('bitfufu_plan_registry').setLevel(logging.WARNING)
+
+    ok = True
+    start_day = datetime(2020, 1, 1)
+    print("استخراج الخطط حسب عدد خطط البريد وحجم سجل الخطط:")
+    print(f"{'خطط البريد':>10} " + " ".join(f"{f'سجل {size:,} ms':>14}" for size in REGISTRY_SIZES))
+    for count in EXTRACT_PLAN_COUNTS:
+        plans = _make_plans(count)
+        details = {plan_id: {"name": f"Plan {plan_id}", "cost": 50.0 + i % 400, "duration": 3 + i % 30}
+                   for i, plan_id in enumerate(plans)}
+        body = make_revenue_journal_body(62500.0, plans, details=details)
+
+        row = []
+        for size in REGISTRY_SIZES:
+            registry = PlanRegistry(None)
+            # خطط سابقة منتهية بأرقام مختلفة عن خطط البريد
+            for i in range(size):
+                registry.observe(str(1_000_000 + i), start_day + timedelta(days=i % 1500),
+                                 name=f"Old {i}", cost=63.0, duration=3)
+            monitor = BitFuFuGmailMonitor(plan_registry=registry)
+            email_data = monitor.extract_body_data(body, "bench", "2025-10-07T12:00:00")
+            if len(email_data["plans"]) != count or email_data["plans"][next(iter(plans))]["cost"] != 50.0:
+                print(f"❌ استخراج {len(email_data['plans'])} من {count} خطة")
+                ok = False
+            elapsed = _best_of(lambda: monitor.extract_body_data(body, "bench", "2025-10-07T12:00:00"))
+            row.append(elapsed)
+            results[f"extract_plans_{count}_registry_{size}"] = elapsed
+        print(f"{count:>10,} " + " ".join(f"{elapsed * 1000:>14.2f}" for elapsed in row))
+
+    # الاستعلام حسب فترة النشاط في سجل كبير
+    registry = PlanRegistry(None)
+    for i in range(10_000):
+        first = start_day + timedelta(days=i % 2000)
+        registry.observe(str(1_000_000 + i), first)
+        registry.observe(str(1_000_000 + i), first + timedelta(days=30))
+    day = start_day + timedelta(days=1990)
+    expected = sum(1 for i in range(10_000) if 1960 <= i % 2000 <= 1990)
+    active = registry.active_on(day)
+    if len(active) != expected:
+        print(f"❌ active_on أعاد {len(active)} بدلاً من {expected}")
+        ok = False
+    query_time = _best_of(lambda: registry.active_on(day))
+    print(f"\nالخطط النشطة في يوم من سجل 10,000 خطة: {len(active)} خطة في {query_time * 1000:.3f}ms")
+    results["plan_registry_active_on"] = query_time
+
+    return ok
+
+
+# أحجام مرفق PDF في رسائل MIME (المرفق لا يُجلب إلا إذا كان هو نص البريد)
+MIME_ATTACHMENT_SIZES = [0, 5_000_000]
+
+
+def bench_mime(results: Dict[str, float]) -> bool:
+    """استخراج نص البريد من أشكال MIME: الزمن وذروة الذاكرة حسب حجم المرفق"""
+    from bitfufu_fakes import FakeGmailService
+    from gmail_bitfufu_monitor import BitFuFuGmailMonitor
+
+    ok = True
+    plans = _make_plans(100)
+    print("استخراج نص البريد حسب شكل MIME وحجم المرفق:")
+    print(f"{'الشكل':>16} {'المرفق':>10} {'ms':>8} {'ذروة KB':>10} {'مرفقات مجلوبة':>14}")
+    for layout in MIME_FIXTURE_LAYOUTS:
+        peaks = []
+        for size in MIME_ATTACHMENT_SIZES:
+            message, attachments = make_mime_fixture_message(
+                layout, "bench", datetime(2025, 10, 7, 12, 0, 0), 62500.0, plans, attachment_bytes=size
+            )
+            service = FakeGmailService([message], attachments={"bench": attachments})
+            monitor = BitFuFuGmailMonitor(gmail_service=service, plan_registry=PlanRegistry(None))
+
+            # نسخة جديدة لكل قياس حتى لا يُحسب المرفق المحفوظ من قياس سابق
+            tracemalloc.start()
+            body = monitor._get_email_body(deepcopy(message))
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            fetched = service.calls['messages.attachments.get']
+            if "Revenue Journal" not in body or fetched != (1 if layout == "body_attachment" else 0):
+                print(f"❌ {layout}: نص البريد غير صحيح أو {fetched} مرفق مجلوب")
+                ok = False
+
+            elapsed = _best_of(lambda: monitor._get_email_body(deepcopy(message)))
+            peaks.append(peak)
+            results[f"mime_{layout}_attachment_{size}"] = elapsed
+            print(f"{layout:>16} {size:>10,} {elapsed * 1000:>8.3f} {peak / 1024:>10.1f} {fetched:>14}")
+
+        # ذروة الذاكرة لا تعتمد على حجم المرفق الذي لا يُجلب
+        if peaks[-1] - peaks[0] > 256 * 1024:
+            print(f"❌ {layout}: ذروة الذاكرة زادت مع حجم المرفق ({peaks[0]} → {peaks[-1]} بايت)")
+            ok = False
+
+    return ok
+
+
+def _make_snapshots(count: int, plans: int = 4) -> List[Dict]:
+    """لقطات بيانات بريد اصطناعية بصيغة extract_email_data"""
+    rng = random.Random(42)
+    start = datetime(2020, 1, 1, 12, 0, 0)
+    snapshots = []
+    for day in range(count):
+        snapshots.append({
+            "timestamp": (start + timedelta(days=day)).isoformat(),
+            "btc_price": round(rng.uniform(25000, 110000), 2),
+            "plans": {
+                str(90000 + j): {
+                    "name": f"خطة {j}",
+                    "cost": round(rng.uniform(50, 500), 2),
+                    "duration": 30,
+                    "btc_earned": round(rng.uniform(0.00001, 0.01), 8)
+                }
+                for j in range(plans)
+            }
+        })
+    return snapshots
+
+
+def bench_roi(results: Dict[str, float]) -> bool:
+    """مقارنة ROIAnalyzer لكل لقطة مع المحرك المجمع"""
+    from gmail_bitfufu_monitor import ROIAnalyzer
+    from roi_batch_engine import BatchROIEngine
+
+    # إسكات سجلات كل لقطة أثناء القياس
+    logging.getLogger('gmail_bitfufu_monitor').setLevel(logging.WARNING)
+    logging.getLogger('roi_batch_engine').setLevel(logging.WARNING)
+
+    ok = True
+    print("حساب ROI لسجل كامل:")
+    print(f"{'اللقطات':>10} {'الخطط':>6} {'حلقة ms':>10} {'مجمع ms':>10} {'إعادة تقييم ms':>15}")
+    for count, plans in ((365, 4), (3650, 4), (3650, 64)):
+        snapshots = _make_snapshots(count, plans)
+
+        start = time.perf_counter()
+        expected = [ROIAnalyzer(s).calculate_roi() for s in snapshots]
+        loop_time = time.perf_counter() - start
+
+        engine = BatchROIEngine(snapshots)
+        batch_time = _best_of(lambda: engine.compute())
+        revalue_time = _best_of(lambda: engine.compute(btc_price=62000.0))
+
+        # التطابق التام مع الحساب لكل لقطة (باستثناء وقت التحليل)
+        result = engine.compute()
+        for i, analysis in enumerate(expected):
+            actual = result.to_analysis(i)
+            actual.pop("timestamp")
+            analysis = dict(analysis)
+            analysis.pop("timestamp")
+            comparison = ROIAnalyzer(snapshots[i])
+            comparison.analysis = expected[i]
+            if actual != analysis or (
+                i > 0 and result.comparison(i) != comparison.compare_with_snapshot(expected[i - 1])
+            ):
+                print(f"❌ عدم تطابق في اللقطة {i}")
+                ok = False
+                break
+
+        print(f"{count:>10} {plans:>6} {loop_time * 1000:>10.2f} "
+              f"{batch_time * 1000:>10.2f} {revalue_time * 1000:>15.2f}")
+        results[f"roi_loop_{count}x{plans}"] = loop_time
+        results[f"roi_batch_{count}x{plans}"] = batch_time
+        results[f"roi_revalue_{count}x{plans}"] = revalue_time
+
+    return ok
+
+
+# أطوال السجل بالأيام لقياس تحديث التحليلات المتحركة
+ROLLING_HISTORY_DAYS = [30, 3650]
+
+
+def bench_rolling(results: Dict[str, float]) -> bool:
+    """تحديث التحليلات المتحركة بيوم جديد: الزمن لا يعتمد على طول السجل"""
+    from gmail_bitfufu_monitor import ROIAnalyzer
+    from roi_history_store import ROIHistoryStore
+    from roi_rolling_analytics import RollingAnalytics, update_rolling_analytics
+
+    logging.getLogger('gmail_bitfufu_monitor').setLevel(logging.WARNING)
+    logging.getLogger('roi_rolling_analytics').setLevel(logging.WARNING)
+
+    ok = True
+    print("تحديث التحليلات المتحركة بلقطة يوم جديد:")
+    print(f"{'الأيام':>8} {'الخطط':>6} {'تحديث ms':>10} {'إعادة بناء ms':>14}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for days in ROLLING_HISTORY_DAYS:
+            for plans in (4, 64):
+                # btc_earned تراكمي: قيمة متزايدة لكل خطة
+                analyses = [ROIAnalyzer(s).calculate_roi() for s in _make_snapshots(days + 1, plans)]
+                for i, analysis in enumerate(analyses):
+                    for plan in analysis["plans"].values():
+                        plan["btc_earned"] = round(plan["btc_earned"] * (i + 1), 8)
+
+                store = ROIHistoryStore(os.path.join(tmp, f"rolling_{days}_{plans}.db"))
+                store.save_snapshots(analyses[:-1])
+                update_rolling_analytics(store)
+                state = store.get_meta("rolling_analytics")
+                store.save_snapshot(analyses[-1])
+
+                def _update():
+                    store.set_meta("rolling_analytics", state)
+                    return update_rolling_analytics(store, analyses[-1])
+
+                summary = _update()
+                rebuilt = RollingAnalytics()
+                rebuilt.rebuild(store.all_snapshots())
+                if summary != rebuilt.summary():
+                    print(f"❌ التحديث التدريجي لا يطابق إعادة البناء ({days} يوم، {plans} خطة)")
+                    ok = False
+
+                update_time = _best_of(_update)
+                rebuild_time = _best_of(lambda: RollingAnalytics().rebuild(store.all_snapshots()))
+                store.close()
+                print(f"{days:>8,} {plans:>6} {update_time * 1000:>10.2f} {rebuild_time * 1000:>14.2f}")
+                results[f"rolling_update_{days}x{plans}"] = update_time
+                results[f"rolling_rebuild_{days}x{plans}"] = rebuild_time
+
+    return ok
+
+
+# عدد أيام السجل التي يُعاد تقييمها بسلسلة الأسعار
+REVALUE_DAYS = [365, 3650]
+
+
+def bench_price_series(results: Dict[str, float]) -> bool:
+    """سلسلة أسعار BTC: التحميل من CSV، الاستعلام، وإعادة تقييم السجل دفعة واحدة"""
+    from bitfufu_fakes import write_btc_price_csv, btc_price_at
+    from btc_price_series import BTCPriceSeries, revalue_history
+    from gmail_bitfufu_monitor import ROIAnalyzer
+    from roi_history_store import ROIHistoryStore
+
+    logging.getLogger('gmail_bitfufu_monitor').setLevel(logging.WARNING)
+    logging.getLogger('btc_price_series').setLevel(logging.WARNING)
+    logging.getLogger('roi_batch_engine').setLevel(logging.WARNING)
+
+    ok = True
+    with tempfile.TemporaryDirectory() as tmp:
+        start = datetime(2015, 1, 1)
+        csv_file = os.path.join(tmp, "btc_hourly.csv")
+        rows = write_btc_price_csv(csv_file, start, start + timedelta(days=max(REVALUE_DAYS) + 1))
+        load_time = _best_of(lambda: BTCPriceSeries.from_csv(csv_file), repeat=1)
+        series = BTCPriceSeries.from_csv(csv_file)
+        print(f"تحميل سلسلة أسعار ساعية: {rows:,} سعر في {load_time * 1000:.1f}ms")
+        results["price_series_load"] = load_time
+
+        # استعلامات بأوقات بين نقاط السلسلة (استيفاء)، ثم نفس الأوقات مرة ثانية (من الذاكرة)
+        moments = [start + timedelta(days=day, hours=12, minutes=30) for day in range(max(REVALUE_DAYS))]
+        for when in moments[:10]:
+            expected = round((btc_price_at(when - timedelta(minutes=30)) + btc_price_at(when + timedelta(minutes=30))) / 2, 2)
+            if abs(series.price_at(when) - expected) > 0.01:
+                print(f"❌ الاستيفاء في {when}: {series.price_at(when)} بدلاً من {expected}")
+                ok = False
+        series = BTCPriceSeries.from_csv(csv_file)
+        cold = _best_of(lambda: [series.price_at(when) for when in moments], repeat=1)
+        warm = _best_of(lambda: [series.price_at(when) for when in moments])
+        print(f"{len(moments):,} استعلام: {cold * 1000:.2f}ms أول مرة، {warm * 1000:.2f}ms من الذاكرة")
+        results["price_series_lookup_cold"] = cold
+        results["price_series_lookup_memoized"] = warm
+
+        print(f"\n{'الأيام':>8} {'يوماً بيوم ms':>14} {'دفعة واحدة ms':>14}")
+        for days in REVALUE_DAYS:
+            analyses = []
+            for i, snapshot in enumerate(_make_snapshots(days, 4)):
+                snapshot["email_date"] = (start + timedelta(days=i, hours=12)).isoformat()
+                snapshot["btc_price"] = 62000.0
+                snapshot["btc_price_source"] = "default"
+                analyses.append(ROIAnalyzer(snapshot).calculate_roi())
+
+            # الطريقة السابقة: إعادة حساب وحفظ كل يوم على حدة
+            store = ROIHistoryStore(os.path.join(tmp, f"loop_{days}.db"))
+            store.save_snapshots(analyses)
+
+            def _per_day():
+                for snapshot in store.all_snapshots():
+                    snapshot_id = snapshot.pop("snapshot_id")
+                    snapshot["btc_price"] = series.price_at(snapshot["email_date"])
+                    store.update_snapshots([(snapshot_id, ROIAnalyzer(snapshot).calculate_roi())])
+
+            loop_time = _best_of(_per_day, repeat=1)
+            store.close()
+
+            store = ROIHistoryStore(os.path.join(tmp, f"bulk_{days}.db"))
+            store.save_snapshots(analyses)
+            bulk_time = _best_of(lambda: revalue_history(store, series, revalue_all=True), repeat=1)
+            revalued = store.all_snapshots()
+            if any(abs(s["btc_price"] - series.price_at(s["email_date"])) > 0.01 for s in revalued):
+                print(f"❌ سعر غير صحيح بعد إعادة التقييم ({days} يوم)")
+                ok = False
+            store.close()
+
+            print(f"{days:>8,} {loop_time * 1000:>14.1f} {bulk_time * 1000:>14.1f}")
+            results[f"revalue_per_day_{days}"] = loop_time
+            results[f"revalue_bulk_{days}"] = bulk_time
+
+    return ok
+
+
+# أيام التقارير القديمة لقياس الأرشفة (تقريران لكل يوم: md و html)
+RETENTION_DAYS = [365, 1825]
+
+
+def bench_retention(results: Dict[str, float]) -> bool:
+    """الاحتفاظ: التجربة، الأرشفة الشهرية، استرجاع ملف واحد، وفحص مجلد التقارير قبل وبعد"""
+    from bitfufu_fakes import write_report_artifacts
+    from bitfufu_retention import RetentionEngine, RetentionPolicy
+
+    logging.getLogger('bitfufu_retention').setLevel(logging.WARNING)
+
+    ok = True
+    now = datetime(2026, 1, 1, 16, 5)
+    print(f"{'الأيام':>8} {'فحص قبل ms':>11} {'تجربة ms':>10} {'أرشفة ms':>10} "
+          f"{'فحص بعد ms':>11} {'استرجاع ms':>11} {'الحجم MB':>9} {'الأرشيف MB':>10}")
+    for days in RETENTION_DAYS:
+        with tempfile.TemporaryDirectory() as tmp:
+            reports_dir = os.path.join(tmp, "reports")
+            names = write_report_artifacts(reports_dir, now, days)
+            oldest = names[-1]
+            with open(os.path.join(reports_dir, oldest), 'rb') as f:
+                original = f.read()
+            policy = RetentionPolicy("reports", reports_dir, ["bitfufu_report_*"])
+            engine = RetentionEngine([policy], os.path.join(tmp, "archive"), clock=lambda: now)
+
+            scan_before = _best_of(lambda: [entry.stat() for entry in os.scandir(reports_dir)])
+            dry_time = _best_of(lambda: engine.run(dry_run=True), repeat=1)
+            dry = engine.run(dry_run=True)
+            start = time.perf_counter()
+            stats = engine.run()
+            archive_time = time.perf_counter() - start
+            scan_after = _best_of(lambda: [entry.stat() for entry in os.scandir(reports_dir)])
+
+            if stats["files"] != dry["files"] or len(os.listdir(reports_dir)) != len(names) - stats["files"]:
+                print(f"❌ عدد الملفات المؤرشفة غير صحيح ({days} يوم)")
+                ok = False
+            if abs(stats["archived_bytes"] - dry["archived_bytes"]) > 0.05 * dry["archived_bytes"]:
+                print(f"❌ تقدير التجربة بعيد عن حجم الأرشيف ({days} يوم)")
+                ok = False
+
+            output_dir = os.path.join(tmp, "out")
+            retrieve_time = _best_of(lambda: engine.retrieve(oldest, output_dir))
+            if engine.retrieve(oldest, output_dir) is None:
+                print(f"❌ تعذر استرجاع {oldest}")
+                ok = False
+            elif open(os.path.join(output_dir, oldest), 'rb').read() != original:
+                print(f"❌ محتوى {oldest} المسترجع غير صحيح")
+                ok = False
+
+        print(f"{days:>8,} {scan_before * 1000:>11.2f} {dry_time * 1000:>10.1f} {archive_time * 1000:>10.1f} "
+              f"{scan_after * 1000:>11.2f} {retrieve_time * 1000:>11.2f} "
+              f"{stats['bytes'] / 1024 / 1024:>9.2f} {stats['archived_bytes'] / 1024 / 1024:>10.2f}")
+        results[f"retention_dry_run_{days}"] = dry_time
+        results[f"retention_archive_{days}"] = archive_time
+        results[f"retention_retrieve_{days}"] = retrieve_time
+
+    return ok
+
+
+# أعداد الخطط لقياس كتابة التقرير
+REPORT_PLAN_COUNTS = [4, 1_000, 5_000]
+
+
+def _legacy_report(analysis: Dict) -> Dict[str, str]:
+    """الطريقة السابقة: تجميع Markdown ورسالة WhatsApp بـ += كل على حدة (للمقارنة فقط)"""
+    report = "# تقرير BitFuFu اليومي\n\n## 📈 تفاصيل الخطط\n\n"
+    for plan_id, plan in analysis["plans"].items():
+        roi = plan["roi_percentage"]
+        emoji = "✅" if roi > 0 else "⚠️" if roi > -50 else "❌"
+        report += f"""### {emoji} {plan['name']} (#{plan_id})
+
+| المؤشر | القيمة |
+|--------|--------|
+| التكلفة | ${plan['cost']:.2f} |
+| المدة | {plan['duration']} يوم |
+| BTC المكتسبة | {plan['btc_earned']:.8f} BTC |
+| العائد بالدولار | ${plan['usd_earned']:.2f} |
+| الربح/الخسارة | ${plan['profit_loss']:.2f} |
+| ROI | {roi:.2f}% |
+
+"""
+    message = "📈 *حالة الخطط:*"
+    for plan_id, plan in analysis["plans"].items():
+        roi = plan["roi_percentage"]
+        emoji = "✅" if roi > 0 else "⚠️" if roi > -50 else "❌"
+        message += f"\n• {emoji} {plan['name']}: {roi:.2f}%"
+    return {"markdown": report, "message": message}
+
+
+def bench_report(results: Dict[str, float]) -> bool:
+    """كتابة التقرير (Markdown + HTML + WhatsApp) حسب عدد الخطط"""
+    from bitfufu_report_writer import ReportWriter
+    from gmail_bitfufu_monitor import ROIAnalyzer
+
+    ok = True
+    work_dir = tempfile.mkdtemp(prefix="bitfufu_bench_")
+    md_file = os.path.join(work_dir, "report.md")
+    html_file = os.path.join(work_dir, "report.html")
+
+    def legacy_write(analysis):
+        output = _legacy_report(analysis)
+        with open(md_file, 'w', encoding='utf-8') as f:
+            f.write(output["markdown"])
+
+    print("كتابة التقرير حسب عدد الخطط:")
+    print(f"{'الخطط':>8} {'سابق MD+WA ms':>14} {'MD+HTML+WA ms':>14} {'MD KB':>8} {'HTML KB':>8}")
+    for count in REPORT_PLAN_COUNTS:
+        plans = {
+            plan_id: {"name": f"خطة {plan_id}", "cost": 50.0 + i % 400, "duration": 3 + i % 30,
+                      "btc_earned": btc}
+            for i, (plan_id, btc) in enumerate(_make_plans(count).items())
+        }
+        analysis = ROIAnalyzer({"timestamp": datetime.now().isoformat(), "btc_price": 62500.0,
+                                "plans": plans}).calculate_roi()
+        comparison = {"roi_change": 1.2, "profit_loss_change": -3.5, "btc_price_change": 120.0}
+        writer = ReportWriter(analysis, comparison)
+
+        message = writer.write_files(md_file, html_file)
+        if message.count("\n• ") != count + 6 or open(html_file, encoding='utf-8').read().count("<tr>") < count:
+            print(f"❌ التقرير لا يحتوي جميع الخطط ({count})")
+            ok = False
+
+        legacy_time = _best_of(lambda: legacy_write(analysis))
+        writer_time = _best_of(lambda: writer.write_files(md_file, html_file))
+        print(f"{count:>8,} {legacy_time * 1000:>14.2f} {writer_time * 1000:>14.2f} "
+              f"{os.path.getsize(md_file) / 1024:>8.0f} {os.path.getsize(html_file) / 1024:>8.0f}")
+        results[f"report_{count}"] = writer_time
+
+    return ok
+
+
+def bench_pdf(results: Dict[str, float]) -> bool:
+    """زمن إنشاء تقرير PDF داخل العملية (أول تقرير يشمل تحميل الخطوط)"""
+    from gmail_bitfufu_monitor import ROIAnalyzer
+    from bitfufu_pdf_report import BitFuFuPDFRenderer
+
+    ok = True
+    output = os.path.join(tempfile.mkdtemp(prefix="bitfufu_bench_"), "report.pdf")
+    comparison = {"roi_change": -1.25, "profit_loss_change": -12.5, "btc_price_change": 850.0}
+
+    start = time.perf_counter()
+    renderer = BitFuFuPDFRenderer()
+    setup_time = time.perf_counter() - start
+
+    print("إنشاء تقرير PDF:")
+    print(f"{'الخطط':>10} {'أول ms':>10} {'تالي ms':>10} {'الحجم KB':>10}")
+    for plans in (4, 64):
+        analysis = ROIAnalyzer(_make_snapshots(1, plans)[0]).calculate_roi()
+        render = lambda: renderer.render(analysis, comparison, output, "خسائر محدودة", "مراقبة دقيقة")
+
+        start = time.perf_counter()
+        if not render():
+            print(f"❌ فشل إنشاء PDF ({plans} خطة)")
+            ok = False
+            continue
+        first_time = time.perf_counter() - start + (setup_time if plans == 4 else 0.0)
+        warm_time = _best_of(render)
+
+        print(f"{plans:>10} {first_time * 1000:>10.1f} {warm_time * 1000:>10.1f} "
+              f"{os.path.getsize(output) / 1024:>10.1f}")
+        results[f"pdf_first_{plans}"] = first_time
+        results[f"pdf_warm_{plans}"] = warm_time
+        if first_time >= 1.0:
+            print(f"❌ إنشاء PDF أبطأ من ثانية ({plans} خطة)")
+            ok = False
+
+    return ok
+
+
+# أزمنة تقريبية لمراحل التشغيل اليومي (بالثواني) لقياس المنفذ المتزامن
+PIPELINE_STAGES = [
+    ("gmail", 0.6, []),
+    ("warm_browser", 1.2, []),
+    ("analysis", 0.05, ["gmail"]),
+    ("report", 0.03, ["analysis"]),
+    ("pdf", 0.3, ["analysis"]),
+    ("whatsapp", 0.4, ["report", "pdf", "warm_browser"]),
+]
+
+
+def bench_pipeline(results: Dict[str, float]) -> bool:
+    """مقارنة التنفيذ المتسلسل للمراحل مع منفذ رسم الاعتماديات"""
+    from bitfufu_stage_scheduler import StageScheduler
+
+    def sleeper(seconds):
+        return lambda inputs: time.sleep(seconds) or True
+
+    sequential = sum(seconds for _, seconds, _ in PIPELINE_STAGES)
+    longest = {}
+    for name, seconds, deps in PIPELINE_STAGES:
+        longest[name] = seconds + max((longest[dep] for dep in deps), default=0.0)
+    critical_path = max(longest.values())
+
+    scheduler = StageScheduler()
+    for name, seconds, deps in PIPELINE_STAGES:
+        scheduler.add(name, sleeper(seconds), deps)
+    start = time.perf_counter()
+    ok = scheduler.run()
+    wall = time.perf_counter() - start
+
+    print("تشغيل المراحل:")
+    print(f"{'متسلسل s':>10} {'أطول مسار s':>12} {'متزامن s':>10}")
+    print(f"{sequential:>10.2f} {critical_path:>12.2f} {wall:>10.2f}")
+    results["pipeline_scheduler"] = wall
+
+    if not ok or wall > critical_path + 0.25:
+        print("❌ زمن التنفيذ المتزامن أبعد من أطول مسار")
+        ok = False
+
+    # فشل مرحلة مطلوبة يلغي ما بعدها
+    logging.getLogger('bitfufu_stage_scheduler').setLevel(logging.CRITICAL)
+    scheduler = StageScheduler()
+    for name, seconds, deps in PIPELINE_STAGES:
+        scheduler.add(name, (lambda inputs: False) if name == "gmail" else sleeper(0.01), deps)
+    scheduler.run()
+    if scheduler.status("whatsapp") != "cancelled":
+        print("❌ لم يتم إلغاء المراحل بعد الفشل")
+        ok = False
+
+    return ok
+
+
+def bench_gmail_client(results: Dict[str, float], runs: int = 5) -> bool:
+    """إنشاء عميل Gmail: build() لكل تشغيل مقابل وثيقة محفوظة واتصال مشترك"""
+    try:
+        from google.oauth2.credentials import Credentials
+        from googleapiclient.discovery import build
+    except ImportError:
+        print("⚠️ تم تخطي قياس عميل Gmail: مكتبات Google غير مثبتة")
+        return True
+    import bitfufu_gmail_client as client
+
+    credentials = Credentials(token="bench")
+    cache_file = os.path.join(tempfile.mkdtemp(prefix="bitfufu_bench_"), "gmail_discovery_v1.json")
+
+    # الطريقة السابقة: وثيقة ونقل HTTP جديدان في كل تشغيل
+    start = time.perf_counter()
+    legacy = [build('gmail', 'v1', credentials=credentials) for _ in range(runs)]
+    legacy_time = (time.perf_counter() - start) / runs
+
+    client.reset_clients()
+    start = time.perf_counter()
+    client.load_discovery_document(cache_file)
+    cold_load = time.perf_counter() - start
+
+    client.reset_clients()
+    start = time.perf_counter()
+    client.load_discovery_document(cache_file)
+    disk_load = time.perf_counter() - start
+
+    start = time.perf_counter()
+    first = client.build_gmail_service(credentials, cache_key="bench")
+    build_time = time.perf_counter() - start
+    start = time.perf_counter()
+    pooled = [first] + [client.build_gmail_service(credentials, cache_key="bench") for _ in range(runs - 1)]
+    reuse_time = (time.perf_counter() - start) / max(runs - 1, 1)
+    client.reset_clients()
+
+    legacy_transports = len({id(service._http) for service in legacy})
+    pooled_transports = len({id(service._http) for service in pooled})
+
+    print(f"إنشاء عميل Gmail ({runs} تشغيلات):")
+    print(f"{'الطريقة':>22} {'ms/تشغيل':>10} {'اتصالات HTTP':>14}")
+    print(f"{'build() لكل تشغيل':>22} {legacy_time * 1000:>10.2f} {legacy_transports:>14}")
+    print(f"{'وثيقة محفوظة (أول)':>22} {(disk_load + build_time) * 1000:>10.2f} {pooled_transports:>14}")
+    print(f"{'عميل مشترك (تالي)':>22} {reuse_time * 1000:>10.3f} {'':>14}")
+    print(f"حفظ الوثيقة أول مرة: {cold_load * 1000:.1f}ms")
+    results["gmail_client_build"] = legacy_time
+    results["gmail_client_cached"] = disk_load + build_time
+    results["gmail_client_reused"] = reuse_time
+
+    if pooled_transports != 1:
+        print("❌ لم يتم إعادة استخدام اتصال HTTP بين التشغيلات")
+        return False
+    return True
+
+
+def bench_gmail(results: Dict[str, float], messages: int, body_size: int) -> bool:
+    """إعادة بناء السجل والتزامن التدريجي على خدمة Gmail وهمية"""
+    from bitfufu_fakes import FakeGmailService, make_revenue_journal_history, make_revenue_journal_message
+    from gmail_bitfufu_monitor import BitFuFuGmailMonitor
+
+    logging.getLogger('gmail_bitfufu_monitor').setLevel(logging.WARNING)
+
+    ok = True
+    work_dir = tempfile.mkdtemp(prefix="bitfufu_bench_")
+    service = FakeGmailService(make_revenue_journal_history(messages, padding_bytes=body_size))
+    monitor = BitFuFuGmailMonitor(sync_state_file=os.path.join(work_dir, "sync_state.json"),
+                                  gmail_service=service, plan_registry=PlanRegistry(None))
+
+    start = time.perf_counter()
+    history = monitor.backfill_bitfufu_emails()
+    backfill_time = time.perf_counter() - start
+    if len(history) != messages:
+        print(f"❌ إعادة بناء السجل أعادت {len(history)} من {messages} رسالة")
+        ok = False
+
+    # التشغيل الأول يحدد نقطة التزامن، والثاني يجلب الرسالة الجديدة فقط من سجل التغييرات
+    # (مع بريد آخر في نفس الصندوق لا يُجلب محتواه الكامل)
+    monitor.sync_bitfufu_emails()
+    service.add_message(make_revenue_journal_message(
+        "msg_new", datetime(2025, 10, 8, 12, 0, 0), 61000.0, {"95936": 0.0002},
+        padding_bytes=body_size
+    ))
+    for i in range(20):
+        other = make_revenue_journal_message(f"other{i}", datetime(2025, 10, 8, 13, i, 0), 0.0, {},
+                                             padding_bytes=body_size)
+        other["payload"]["headers"] = [{"name": "From", "value": "news@example.com"},
+                                       {"name": "Subject", "value": "Newsletter"}]
+        service.add_message(other, in_query=False)
+    full_fetches = service.calls['messages.get']
+    start = time.perf_counter()
+    new_messages = monitor.sync_bitfufu_emails()
+    sync_time = time.perf_counter() - start
+    full_fetches = service.calls['messages.get'] - full_fetches
+    if [m["id"] for m in new_messages] != ["msg_new"]:
+        print(f"❌ التزامن التدريجي أعاد {len(new_messages)} رسالة بدلاً من 1")
+        ok = False
+    if full_fetches != 1:
+        print(f"❌ التزامن التدريجي جلب المحتوى الكامل لـ {full_fetches} رسالة بدلاً من 1")
+        ok = False
+
+    print(f"Gmail وهمي ({messages} رسالة × {body_size:,} بايت):")
+    print(f"{'إعادة البناء ms':>16} {'رسالة/ثانية':>12} {'تزامن ms':>10} {'طلبات':>8}")
+    rate = messages / backfill_time if backfill_time > 0 else 0.0
+    print(f"{backfill_time * 1000:>16.1f} {rate:>12.1f} {sync_time * 1000:>10.2f} "
+          f"{sum(service.calls.values()):>8}")
+    results["gmail_backfill"] = backfill_time
+    results["gmail_sync"] = sync_time
+
+    return ok
+
+
+def bench_mail_import(results: Dict[str, float], messages: int, body_size: int) -> bool:
+    """استيراد أرشيف mbox (بصيغة Google Takeout) إلى سجل التحليلات"""
+    from bitfufu_fakes import write_takeout_mbox
+    from bitfufu_mail_import import MailArchiveImporter
+    from roi_history_store import ROIHistoryStore
+
+    logging.getLogger('bitfufu_mail_import').setLevel(logging.WARNING)
+
+    ok = True
+    work_dir = tempfile.mkdtemp(prefix="bitfufu_bench_")
+    mbox_file = os.path.join(work_dir, "All mail.mbox")
+    write_takeout_mbox(mbox_file, messages, padding_bytes=body_size)
+    size_mb = os.path.getsize(mbox_file) / 1024 / 1024
+
+    importer = MailArchiveImporter(ROIHistoryStore(":memory:"),
+                                   plan_registry=PlanRegistry(os.path.join(work_dir, "plans.json")))
+    stats = importer.import_archive(mbox_file)
+    if stats["imported"] != messages:
+        print(f"❌ الاستيراد أضاف {stats['imported']} من {messages} لقطة")
+        ok = False
+
+    # إعادة الاستيراد لا تضيف لقطات مكررة
+    rerun = importer.import_archive(mbox_file)
+    if rerun["imported"] != 0 or rerun["duplicates"] != messages:
+        print(f"❌ إعادة الاستيراد أضافت {rerun['imported']} لقطة مكررة")
+        ok = False
+
+    print(f"استيراد mbox ({messages} رسالة BitFuFu، {size_mb:.1f}MB، {importer.workers} عمليات):")
+    print(f"{'استيراد ms':>12} {'رسالة/ثانية':>12} {'إعادة ms':>10}")
+    print(f"{stats['seconds'] * 1000:>12.1f} {stats['messages_per_second']:>12.1f} "
+          f"{rerun['seconds'] * 1000:>10.1f}")
+    results["mail_import"] = stats["seconds"]
+    results["mail_import_rerun"] = rerun["seconds"]
+
+    return ok
+
+
+def bench_end_to_end(results: Dict[str, float], messages: int, body_size: int) -> bool:
+    """التشغيل الكامل: Gmail وهمي ← تحليل ← تقارير ← WebDriver وهمي"""
+    from bitfufu_fakes import FakeGmailService, FakeWebDriver, make_revenue_journal_history
+    from bitfufu_whatsapp_automation import BitFuFuAutomation
+    from gmail_bitfufu_monitor import BitFuFuGmailMonitor, MINING_PLANS
+    from roi_history_store import ROIHistoryStore
+    from whatsapp_web_sender import WhatsAppWebSender
+
+    # إسكات سجلات المراحل أثناء القياس
+    logging.disable(logging.CRITICAL)
+
+    work_dir = tempfile.mkdtemp(prefix="bitfufu_bench_")
+    plans = {plan_id: 0.0002 * (i + 1) for i, plan_id in enumerate(MINING_PLANS)}
+    service = FakeGmailService(make_revenue_journal_history(messages, plans, padding_bytes=body_size),
+                               latency=0.005)
+    driver = FakeWebDriver(contacts=["BitFuFu Bench"], latencies=FAKE_DRIVER_LATENCIES)
+
+    automation = BitFuFuAutomation(
+        whatsapp_group_name="BitFuFu Bench",
+        gmail_monitor=BitFuFuGmailMonitor(sync_state_file=os.path.join(work_dir, "sync_state.json"),
+                                          gmail_service=service, plan_registry=PlanRegistry(None)),
+        whatsapp_sender=WhatsAppWebSender(profile_dir=work_dir, driver_factory=lambda: driver),
+        history_store=ROIHistoryStore(":memory:"),
+        report_dir=work_dir,
+        use_sender_daemon=False
+    )
+    automation.metrics_dir = work_dir
+
+    start = time.perf_counter()
+    try:
+        success = automation.run_complete_automation()
+    finally:
+        logging.disable(logging.NOTSET)
+    wall = time.perf_counter() - start
+
+    ok = True
+    if not success or not driver.sent_messages:
+        print("❌ لم يكتمل التشغيل الكامل أو لم تُرسل الرسالة")
+        ok = False
+
+    print("التشغيل الكامل بدون اتصال:")
+    print(f"{'المرحلة':>14} {'البداية s':>10} {'المدة s':>10}")
+    for entry in automation.scheduler.timeline():
+        print(f"{entry['stage']:>14} {entry.get('start', 0.0):>10.3f} {entry.get('seconds', 0.0):>10.3f}")
+    print(f"{'الإجمالي':>14} {'':>10} {wall:>10.3f}")
+    results["end_to_end"] = wall
+
+    # إعادة التشغيل لنفس الرسالة: نتائج محفوظة بدون تحليل أو تقارير أو إرسال جديد
+    snapshots = automation.history_store.count()
+    sent = len(driver.sent_messages)
+    comparison = automation.comparison_data
+    logging.disable(logging.CRITICAL)
+    start = time.perf_counter()
+    try:
+        rerun_success = automation.run_complete_automation()
+    finally:
+        logging.disable(logging.NOTSET)
+    rerun_wall = time.perf_counter() - start
+
+    if (not rerun_success or automation.history_store.count() != snapshots
+            or len(driver.sent_messages) != sent or automation.comparison_data != comparison):
+        print("❌ إعادة التشغيل لنفس الرسالة أعادت المعالجة أو الإرسال")
+        ok = False
+    print(f"{'إعادة التشغيل':>14} {'':>10} {rerun_wall:>10.3f}")
+    results["end_to_end_rerun"] = rerun_wall
+
+    return ok
+
+
+def _make_whatsapp_message(size: int) -> str:
+    """رسالة تقرير اصطناعية متعددة الأسطر بحجم تقريبي"""
+    lines = []
+    plan = 0
+    while sum(len(line) + 1 for line in lines) < size:
+        lines.append(f"• ✅ خطة {90000 + plan}: ROI {plan * 1.37 - 60:+.2f}% | ${plan * 3.5:,.2f}")
+        plan += 1
+    return "\n".join(lines)[:size]
+
+
+def bench_injection(results: Dict[str, float]) -> bool:
+    """مقارنة الإدخال السريع بالكتابة حرفاً بحرف في Chrome على صفحة محلية بديلة"""
+    from selenium.webdriver.common.by import By
+    from whatsapp_web_sender import WhatsAppWebSender, MESSAGE_BOX_XPATH
+
+    sender = WhatsAppWebSender(profile_dir=tempfile.mkdtemp(prefix="bitfufu_bench_"))
+    if not sender.initialize_browser(headless=True):
+        print("⚠️ تم تخطي قياس الإدخال: Chrome غير متاح")
+        return True
+
+    ok = True
+    page = os.path.join(tempfile.mkdtemp(prefix="bitfufu_bench_"), "compose.html")
+    with open(page, 'w', encoding='utf-8') as f:
+        f.write(COMPOSE_STANDIN_HTML)
+
+    try:
+        sender.driver.get(f"file://{page}")
+        box = sender.driver.find_element(By.XPATH, MESSAGE_BOX_XPATH)
+
+        print("إدخال رسالة WhatsApp في مربع الكتابة:")
+        print(f"{'الحجم':>10} {'سريع ms':>10} {'كتابة ms':>10}")
+        for size in MESSAGE_SIZES:
+            message = _make_whatsapp_message(size)
+
+            sender.driver.execute_script("arguments[0].textContent = '';", box)
+            start = time.perf_counter()
+            injected = sender._inject_text(box, message)
+            inject_time = time.perf_counter() - start
+            content = box.get_attribute('innerText') or ''
+            if not injected or content.strip() != message.strip():
+                print(f"❌ الإدخال السريع لم ينقل الرسالة كاملة ({size})")
+                ok = False
+
+            sender.driver.execute_script("arguments[0].textContent = '';", box)
+            start = time.perf_counter()
+            sender._type_text(box, message)
+            type_time = time.perf_counter() - start
+
+            print(f"{size:>10,} {inject_time * 1000:>10.1f} {type_time * 1000:>10.1f}")
+            results[f"injection_{size}"] = inject_time
+    finally:
+        sender.close_browser()
+
+    return ok
+
+
+def load_baseline(path: str = BASELINE_FILE) -> Optional[Dict[str, float]]:
+    """تحميل الأزمنة المرجعية إن وجدت"""
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f).get("results", {})
+
+
+def save_baseline(results: Dict[str, float], path: str = BASELINE_FILE):
+    """حفظ أزمنة هذا التشغيل كمرجع للمقارنة لاحقاً"""
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({
+            "created_at": datetime.now().isoformat(),
+            "python": sys.version.split()[0],
+            "results": {name: round(seconds, 6) for name, seconds in sorted(results.items())}
+        }, f, ensure_ascii=False, indent=2)
+    print(f"💾 تم حفظ الأزمنة المرجعية: {path}")
+
+
+def compare_with_baseline(results: Dict[str, float], baseline: Dict[str, float],
+                          tolerance: float = DEFAULT_TOLERANCE) -> bool:
+    """مقارنة الأزمنة بالمرجع؛ يفشل إذا تجاوز أي قياس المرجع بأكثر من النسبة المسموحة"""
+    ok = True
+    print(f"المقارنة مع الأزمنة المرجعية (تراجع مسموح {tolerance:.0%}):")
+    print(f"{'القياس':>24} {'مرجع ms':>10} {'حالي ms':>10} {'التغير':>8}")
+    for name in sorted(results):
+        if name not in baseline:
+            continue
+        reference = baseline[name]
+        current = results[name]
+        change = (current - reference) / reference if reference > 0 else 0.0
+        regressed = current > reference * (1 + tolerance) + BASELINE_SLACK_SECONDS
+        print(f"{name:>24} {reference * 1000:>10.2f} {current * 1000:>10.2f} {change:>+8.0%}"
+              + (" ❌" if regressed else ""))
+        if regressed:
+            ok = False
+    return ok
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="قياس أداء نظام مراقبة BitFuFu بدون اتصال")
+    parser.add_argument("--browser", action="store_true",
+                        help="قياس الإدخال في Google Chrome الحقيقي (يتطلب Chrome محلياً)")
+    parser.add_argument("--save-baseline", action="store_true",
+                        help="حفظ أزمنة هذا التشغيل كمرجع")
+    parser.add_argument("--baseline", default=BASELINE_FILE,
+                        help="مسار ملف الأزمنة المرجعية")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="نسبة التراجع المسموح بها (0.5 = أبطأ بـ 50%%)")
+    parser.add_argument("--messages", type=int, default=200,
+                        help="عدد رسائل Revenue Journal الاصطناعية في خدمة Gmail الوهمية")
+    parser.add_argument("--body-size", type=int, default=10_000,
+                        help="حجم الحشو في كل رسالة اصطناعية بالبايت")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> bool:
+    args = parse_args(argv)
+    results: Dict[str, float] = {}
+
+    print("\n" + "=" * 60)
+    print("قياس أداء نظام مراقبة BitFuFu")
+    print("=" * 60 + "\n")
+
+    success = bench_parser(results)
+    print()
+    success = bench_plan_registry(results) and success
+    print()
+    success = bench_mime(results) and success
+    print()
+    success = bench_roi(results) and success
+    print()
+    success = bench_rolling(results) and success
+    print()
+    success = bench_price_series(results) and success
+    print()
+    success = bench_report(results) and success
+    print()
+    success = bench_retention(results) and success
+    print()
+    success = bench_pdf(results) and success
+    print()
+    success = bench_pipeline(results) and success
+    print()
+    success = bench_gmail_client(results) and success
+    print()
+    success = bench_gmail(results, args.messages, args.body_size) and success
+    print()
+    success = bench_mail_import(results, args.messages, args.body_size) and success
+    print()
+    success = bench_end_to_end(results, args.messages, args.body_size) and success
+
+    # يتطلب Google Chrome محلياً
+    if args.browser:
+        print()
+        success = bench_injection(results) and success
+
+    print()
+    if args.save_baseline:
+        save_baseline(results, args.baseline)
+    else:
+        baseline = load_baseline(args.baseline)
+        if baseline is None:
+            print(f"لا توجد أزمنة مرجعية ({args.baseline})؛ شغّل مع --save-baseline لإنشائها")
+        else:
+            success = compare_with_baseline(results, baseline, args.tolerance) and success
+
+    print("\n" + "=" * 60)
+    print("✅ اكتمل القياس" if success else "❌ فشل التحقق من النتائج")
+    print("=" * 60 + "\n")
+    return success
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
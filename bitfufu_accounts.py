@@ -0,0 +1,290 @@
+#!/usr/bin/env python3
+"""
+مراقبة عدة حسابات BitFuFu في تشغيل واحد
+لكل حساب اعتمادات Gmail وخطط تعدين خاصة، وتُجمع البيانات بالتوازي ثم تُدمج في تقرير واحد
+"""
+
+import os
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+from gmail_bitfufu_monitor import (
+    BitFuFuGmailMonitor, QuotaRateLimiter, MINING_PLANS, GMAIL_QUOTA_UNITS_PER_SECOND
+)
+from bitfufu_metrics import REGISTRY
+from bitfufu_plan_registry import PlanRegistry
+
+logger = logging.getLogger(__name__)
+
+# ملف إعداد الحسابات
+ACCOUNTS_FILE = "/home/ubuntu/bitfufu_accounts.json"
+
+# الحد الأقصى للحسابات التي تُجمع بياناتها في نفس الوقت
+MAX_ACCOUNT_WORKERS = 4
+
+# فاصل معرف الحساب عن معرف الخطة في البيانات المدمجة
+ACCOUNT_SEPARATOR = "/"
+
+
+class BitFuFuAccount:
+    """إعدادات حساب BitFuFu واحد"""
+
+    def __init__(self, name: str, token_file: str, plans: Optional[Dict] = None,
+                 sync_state_file: Optional[str] = None,
+                 quota_units_per_second: float = GMAIL_QUOTA_UNITS_PER_SECOND,
+                 plan_registry_file: Optional[str] = None):
+        if ACCOUNT_SEPARATOR in name:
+            raise ValueError(f"اسم الحساب لا يجب أن يحتوي '{ACCOUNT_SEPARATOR}': {name}")
+        self.name = name
+        self.token_file = token_file
+        self.plans = plans or MINING_PLANS
+        self.sync_state_file = sync_state_file or f"/home/ubuntu/gmail_sync_state_{name}.json"
+        self.quota_units_per_second = quota_units_per_second
+        self.plan_registry_file = plan_registry_file or f"/home/ubuntu/bitfufu_plans_{name}.json"
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'BitFuFuAccount':
+        return cls(
+            name=data["name"],
+            token_file=data["token_file"],
+            plans=data.get("plans"),
+            sync_state_file=data.get("sync_state_file"),
+            quota_units_per_second=data.get("quota_units_per_second", GMAIL_QUOTA_UNITS_PER_SECOND),
+            plan_registry_file=data.get("plan_registry_file")
+        )
+
+
+def load_accounts(accounts_file: str = ACCOUNTS_FILE) -> List[BitFuFuAccount]:
+    """تحميل الحسابات من ملف JSON بالشكل {"accounts": [{"name", "token_file", "plans"}]}"""
+    try:
+        if not os.path.exists(accounts_file):
+            logger.error(f"ملف الحسابات غير موجود: {accounts_file}")
+            return []
+
+        with open(accounts_file, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+
+        accounts = [BitFuFuAccount.from_dict(entry) for entry in data.get("accounts", [])]
+        names = [account.name for account in accounts]
+        if len(set(names)) != len(names):
+            logger.error("أسماء الحسابات مكررة في ملف الإعداد")
+            return []
+
+        logger.info(f"تم تحميل {len(accounts)} حساب: {', '.join(names)}")
+        return accounts
+
+    except Exception as e:
+        logger.error(f"خطأ في تحميل ملف الحسابات: {str(e)}")
+        return []
+
+
+class MultiAccountCollector:
+    """جمع بيانات آخر Revenue Journal لكل حساب بمجموعة خيوط محدودة
+
+    الخيوط كافية هنا لأن العمل انتظار لطلبات Gmail، ولكل حساب محدد معدل خاص بحصته؛
+    ومراقب كل حساب (الاعتمادات وعميل Gmail) يبقى بين عمليات الجمع في العمليات الدائمة
+    """
+
+    def __init__(self, accounts: List[BitFuFuAccount], max_workers: int = MAX_ACCOUNT_WORKERS,
+                 incremental_sync: bool = False,
+                 monitor_factory: Optional[Callable[[BitFuFuAccount], BitFuFuGmailMonitor]] = None):
+        self.accounts = accounts
+        self.max_workers = max_workers
+        self.incremental_sync = incremental_sync
+        self.monitor_factory = monitor_factory or self._create_monitor
+        # نتيجة كل حساب: collected / no_new_messages / failed
+        self.statuses: Dict[str, str] = {}
+        # معرف الرسالة وبصمة محتواها لكل حساب تم جمعه
+        self.fingerprints: Dict[str, Dict] = {}
+        # جميع رسائل هذا الجمع لكل حساب من الأقدم: {"email_data", "message_id", "content_hash"}
+        self.messages: Dict[str, List[Dict]] = {}
+        # مراقب Gmail لكل حساب (يُنشأ عند أول جمع ويُعاد استخدامه)
+        self.monitors: Dict[str, BitFuFuGmailMonitor] = {}
+        # نطاق نقاط التزامن (مثل اسم الجدول في خدمة الجدولة)
+        self.sync_scope: Optional[str] = None
+
+    def _create_monitor(self, account: BitFuFuAccount) -> BitFuFuGmailMonitor:
+        return BitFuFuGmailMonitor(
+            sync_state_file=account.sync_state_file,
+            token_file=account.token_file,
+            mining_plans=account.plans,
+            rate_limiter=QuotaRateLimiter(account.quota_units_per_second),
+            plan_registry=PlanRegistry(account.plan_registry_file)
+        )
+
+    @staticmethod
+    def _entry(monitor: BitFuFuGmailMonitor, message: Dict, email_data: Dict) -> Dict:
+        return {
+            "email_data": email_data,
+            "message_id": message.get("id"),
+            "content_hash": monitor.message_fingerprint(message)
+        }
+
+    def _collect_account(self, account: BitFuFuAccount) -> Optional[Dict]:
+        """آخر بيانات بريد لحساب واحد، أو None"""
+        try:
+            with REGISTRY.timer("account_collect_seconds", account=account.name):
+                monitor = self.monitors.get(account.name)
+                if monitor is None:
+                    monitor = self.monitors[account.name] = self.monitor_factory(account)
+                if not monitor.authenticate_gmail():
+                    logger.error(f"[{account.name}] فشل الاتصال بـ Gmail API")
+                    self.statuses[account.name] = "failed"
+                    return None
+
+                if self.incremental_sync:
+                    # نقطة التزامن تُحفظ بعد نجاح التشغيل كاملاً (commit_sync_state)
+                    messages = monitor.sync_bitfufu_emails(commit=False, scope=self.sync_scope)
+                    if not messages:
+                        logger.info(f"[{account.name}] لا توجد رسائل جديدة")
+                        self.statuses[account.name] = "no_new_messages"
+                        return None
+                else:
+                    message = monitor.search_latest_bitfufu_email()
+                    messages = [message] if message else []
+
+                email_data = monitor.extract_email_data(messages[0]) if messages else None
+                if not email_data:
+                    logger.error(f"[{account.name}] لم يتم العثور على بيانات Revenue Journal")
+                    self.statuses[account.name] = "failed"
+                    return None
+
+                # جميع الرسائل الجديدة من الأقدم حتى الأحدث (بيانات التقرير)
+                entries = []
+                for message in reversed(messages[1:]):
+                    older_data = monitor.extract_email_data(message)
+                    if older_data:
+                        entries.append(self._entry(monitor, message, older_data))
+                    else:
+                        logger.warning(f"[{account.name}] تعذر استخراج بيانات الرسالة {message.get('id')}")
+                entries.append(self._entry(monitor, messages[0], email_data))
+
+                self.statuses[account.name] = "collected"
+                self.messages[account.name] = entries
+                self.fingerprints[account.name] = {
+                    "message_id": entries[-1]["message_id"],
+                    "content_hash": entries[-1]["content_hash"]
+                }
+                return email_data
+
+        except Exception as e:
+            logger.error(f"[{account.name}] خطأ في جمع البيانات: {str(e)}")
+            self.statuses[account.name] = "failed"
+            return None
+
+    def collect(self) -> Dict[str, Dict]:
+        """بيانات كل حساب نجح جمعها، بترتيب ملف الإعداد"""
+        self.statuses = {}
+        self.fingerprints = {}
+        self.messages = {}
+        # نقاط تزامن مؤجلة من جمع سابق لم يكتمل تشغيله لا يجب حفظها مع هذا الجمع
+        for monitor in self.monitors.values():
+            monitor.pending_sync_state = None
+        if not self.accounts:
+            return {}
+
+        workers = max(1, min(self.max_workers, len(self.accounts)))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="account") as pool:
+            results = list(pool.map(self._collect_account, self.accounts))
+
+        for account in self.accounts:
+            REGISTRY.inc("account_collections_total", account=account.name,
+                         result=self.statuses.get(account.name, "failed"))
+
+        # بترتيب ملف الإعداد (الخيوط تملأ القاموس بترتيب انتهائها)
+        self.messages = {account.name: self.messages[account.name]
+                         for account in self.accounts if account.name in self.messages}
+        collected = {
+            account.name: email_data
+            for account, email_data in zip(self.accounts, results)
+            if email_data
+        }
+        logger.info(f"تم جمع بيانات {len(collected)} من {len(self.accounts)} حساب")
+        return collected
+
+    def commit_sync_state(self):
+        """حفظ نقاط التزامن المؤجلة لجميع الحسابات بعد نجاح التشغيل"""
+        for monitor in self.monitors.values():
+            monitor.commit_sync_state()
+
+
+def combine_email_data(account_data: Dict[str, Dict]) -> Optional[Dict]:
+    """دمج بيانات الحسابات في لقطة واحدة بصيغة extract_email_data
+
+    معرف كل خطة يصبح "<الحساب>/<الخطة>"، ويُستخدم سعر BTC من أحدث بريد
+    لتقييم جميع الحسابات بنفس السعر
+    """
+    if not account_data:
+        return None
+
+    latest = max(account_data.values(), key=lambda data: data.get("email_date", data["timestamp"]))
+    combined = {
+        "timestamp": datetime.now().isoformat(),
+        "btc_price": latest["btc_price"],
+        "plans": {},
+        "accounts": list(account_data)
+    }
+    if "email_date" in latest:
+        combined["email_date"] = latest["email_date"]
+
+    for account_name, email_data in account_data.items():
+        for plan_id, plan in email_data.get("plans", {}).items():
+            combined["plans"][f"{account_name}{ACCOUNT_SEPARATOR}{plan_id}"] = dict(
+                plan, name=f"{plan['name']} - {account_name}"
+            )
+
+    return combined
+
+
+def _email_day(email_data: Dict) -> str:
+    return email_data.get("email_date", email_data["timestamp"])[:10]
+
+
+def backlog_rounds(account_messages: Dict[str, List[Dict]]) -> List[Dict[str, Dict]]:
+    """رسائل الأيام السابقة لآخر يوم في هذا الجمع (بعد انقطاع التشغيل لعدة أيام)
+
+    يعيد لكل يوم من الأقدم {الحساب: الرسالة}، وكل حساب يشارك بأحدث رسالة له حتى ذلك اليوم؛
+    الحساب الذي لا رسالة له حتى ذلك اليوم لا يدخل لقطة اليوم. آخر يوم هو بيانات التقرير نفسها
+    """
+    days = sorted({_email_day(entry["email_data"])
+                   for entries in account_messages.values() for entry in entries})
+    rounds = []
+    for day in days[:-1]:
+        selected = {}
+        for name, entries in account_messages.items():
+            earlier = [entry for entry in entries if _email_day(entry["email_data"]) <= day]
+            if earlier:
+                selected[name] = earlier[-1]
+        rounds.append(selected)
+    return rounds
+
+
+def summarize_accounts(analysis: Dict) -> List[Dict]:
+    """الإجماليات لكل حساب من تحليل البيانات المدمجة"""
+    totals: Dict[str, Dict] = {}
+    for plan_id, plan in analysis.get("plans", {}).items():
+        if ACCOUNT_SEPARATOR not in plan_id:
+            continue
+        account_name = plan_id.split(ACCOUNT_SEPARATOR, 1)[0]
+        account = totals.setdefault(account_name, {
+            "account": account_name, "plans": 0, "investment": 0.0, "returns": 0.0
+        })
+        account["plans"] += 1
+        account["investment"] += plan["cost"]
+        account["returns"] += plan["usd_earned"]
+
+    summary = []
+    for account in totals.values():
+        profit_loss = account["returns"] - account["investment"]
+        summary.append({
+            "account": account["account"],
+            "plans": account["plans"],
+            "investment": round(account["investment"], 2),
+            "returns": round(account["returns"], 2),
+            "profit_loss": round(profit_loss, 2),
+            "roi": round(profit_loss / account["investment"] * 100, 2) if account["investment"] > 0 else 0.0
+        })
+    return summary
@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+محلل رسائل BitFuFu Revenue Journal
+يستخرج سعر BTC وجميع صفوف الخطط في مرور خطي واحد على نص الرسالة
+"""
+
+import re
+import logging
+from html.parser import HTMLParser
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# نمط موحد مُجمّع مسبقاً: سعر BTC أو صف خطة (بعد كلمة Plan، أو رقم في خلية مستقلة
+# أول الصف يليه فاصل ثم قيمة BTC في نفس الصف)
+# جميع المسافات محدودة بسطر واحد وطول ثابت حتى يبقى الزمن خطياً بحجم النص،
+# والفحص المسبق للحرف الأول يتجاوز بسرعة المواضع التي لا يمكن أن تبدأ بها مطابقة
+_TOKEN_RE = re.compile(
+    r'(?=[BP0-9])(?:'
+    r'(?P<price_label>\bBTC|\bBitcoin|\bPrice)[:/ \t]+\$?[ \t]*(?P<price>\d[\d,]*(?:\.\d+)?)'
+    r'|(?<![\d.])(?P<plan_id>\d{5,7})[ \t]*[:|\t][^\n]{0,160}?(?<![\d.])(?P<btc>\d+\.\d+)[ \t]*BTC\b'
+    r'|\bPlan[ \t]*#?[ \t]*(?P<plan_id_alt>\d{5,7})(?![\d.,])[^\d\n]{0,80}(?P<btc_alt>\d+\.\d+)'
+    r')',
+    re.IGNORECASE
+)
+
+# تفاصيل الخطة بعد قيمة BTC في نفس السطر، مفصولة بـ | أو خلايا جدول:
+# "Plan 95936: 0.00015 BTC | 3-Day Plan | Cost: $63.00 | Duration: 3 days"
+_DETAIL_SEPARATOR_RE = re.compile(r'[|\t]')
+_COST_RE = re.compile(r'^(?:cost|investment|amount)?[:\s]*\$\s*(\d[\d,]*(?:\.\d+)?)$', re.IGNORECASE)
+_DURATION_RE = re.compile(r'^(?:duration[:\s]*)?(\d+)\s*-?\s*(?:days?|يوم|أيام)$', re.IGNORECASE)
+_NAME_PREFIX_RE = re.compile(r'^(?:name|plan name)[:\s]*', re.IGNORECASE)
+
+# ما يسبق رقم الخطة المجرد داخل خليته: مسافات أو علامة #
+_CELL_PREFIX_CHARS = ' #'
+_CELL_BOUNDARY_CHARS = '\n\t|'
+
+# للكشف السريع عن محتوى HTML
+_HTML_HINT_RE = re.compile(r'<\s*(?:html|body|table|div|p|br|td|span)\b', re.IGNORECASE)
+
+# الوسوم التي تعني سطراً جديداً أو خلية جديدة في النص المستخرج
+_BLOCK_TAGS = {'br', 'p', 'div', 'tr', 'table', 'li', 'ul', 'ol', 'h1', 'h2', 'h3',
+               'h4', 'h5', 'h6', 'thead', 'tbody', 'section', 'header', 'footer'}
+_CELL_TAGS = {'td', 'th'}
+_SKIP_TAGS = {'script', 'style', 'head', 'title'}
+
+
+class _HTMLTextExtractor(HTMLParser):
+    """تحويل HTML إلى نص مع الحفاظ على حدود الصفوف والخلايا"""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.chunks: List[str] = []
+        self._skip_depth = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in _SKIP_TAGS:
+            self._skip_depth += 1
+        elif tag in _BLOCK_TAGS:
+            self.chunks.append('\n')
+        elif tag in _CELL_TAGS:
+            self.chunks.append('\t')
+
+    def handle_endtag(self, tag):
+        if tag in _SKIP_TAGS:
+            self._skip_depth = max(0, self._skip_depth - 1)
+        elif tag in _BLOCK_TAGS:
+            self.chunks.append('\n')
+
+    def handle_data(self, data):
+        if not self._skip_depth:
+            self.chunks.append(data)
+
+
+def html_to_text(html: str) -> str:
+    """تحويل جزء HTML إلى نص عادي"""
+    extractor = _HTMLTextExtractor()
+    extractor.feed(html)
+    extractor.close()
+    return ''.join(extractor.chunks)
+
+
+def parse_plan_details(text: str) -> Dict:
+    """الاسم والتكلفة والمدة من بقية سطر الخطة (ما وُجد منها فقط)"""
+    details: Dict = {}
+    for segment in _DETAIL_SEPARATOR_RE.split(text):
+        segment = segment.strip(" :-")
+        # وحدة BTC بعد القيمة مباشرة (في صيغة "Plan 12345: 0.0001 BTC")
+        if not segment or segment.upper() == "BTC":
+            continue
+        cost = _COST_RE.match(segment)
+        if cost:
+            details.setdefault("cost", float(cost.group(1).replace(',', '')))
+            continue
+        duration = _DURATION_RE.match(segment)
+        if duration:
+            details.setdefault("duration", int(duration.group(1)))
+            continue
+        if "name" not in details and any(ch.isalpha() for ch in segment):
+            details["name"] = _NAME_PREFIX_RE.sub('', segment)
+    return details
+
+
+def _starts_cell(body: str, pos: int) -> bool:
+    """هل يبدأ الموضع خلية جدول أو سطراً (بعد مسافات أو # فقط)؟
+
+    يمنع اعتبار أرقام داخل الجمل خططاً، مثل "Block 918234 reward 3.125 BTC"
+    """
+    while pos > 0 and body[pos - 1] in _CELL_PREFIX_CHARS:
+        pos -= 1
+    return pos == 0 or body[pos - 1] in _CELL_BOUNDARY_CHARS
+
+
+def is_html(body: str) -> bool:
+    """هل يبدو النص كـ HTML؟"""
+    return bool(_HTML_HINT_RE.search(body, 0, 4096))
+
+
+class RevenueJournalParser:
+    """محلل نص Revenue Journal بمرور واحد"""
+
+    def parse(self, body: str, mime_type: Optional[str] = None) -> Dict:
+        """استخراج سعر BTC وBTC المكتسبة لكل خطة
+
+        يعيد {"btc_price": float أو None, "plans": {plan_id: btc_earned},
+               "plan_details": {plan_id: {"name", "cost", "duration"}}}
+        وفي حال تكرار الخطة تُعتمد أول قيمة تظهر في الرسالة.
+        تفاصيل الخطة تُقرأ من بقية سطرها فقط، فيبقى الزمن خطياً بحجم النص
+        """
+        if mime_type == 'text/html' or (mime_type is None and is_html(body)):
+            body = html_to_text(body)
+
+        btc_price = None
+        plans: Dict[str, float] = {}
+        plan_details: Dict[str, Dict] = {}
+
+        for match in _TOKEN_RE.finditer(body):
+            if match.group('price') is not None:
+                if btc_price is None:
+                    try:
+                        btc_price = float(match.group('price').replace(',', ''))
+                    except ValueError:
+                        pass
+                continue
+
+            plan_id = match.group('plan_id')
+            if plan_id is not None and not _starts_cell(body, match.start('plan_id')):
+                continue
+            plan_id = plan_id or match.group('plan_id_alt')
+            btc = match.group('btc') or match.group('btc_alt')
+            if plan_id not in plans:
+                plans[plan_id] = float(btc)
+                line_end = body.find('\n', match.end())
+                rest = body[match.end():line_end if line_end >= 0 else len(body)]
+                if rest.strip():
+                    details = parse_plan_details(rest)
+                    if details:
+                        plan_details[plan_id] = details
+
+        return {"btc_price": btc_price, "plans": plans, "plan_details": plan_details}
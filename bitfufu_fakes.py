@@ -0,0 +1,711 @@
+#!/usr/bin/env python3
+"""
+كائنات وهمية محلية لاختبار نظام BitFuFu بدون اتصال بالإنترنت
+تحاكي واجهة Gmail API (googleapiclient) بالقدر الذي يستخدمه النظام
+"""
+
+import os
+import sys
+import base64
+import math
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional, Tuple
+
+
+def _plan_detail_cells(info: Dict) -> List[str]:
+    cells = []
+    if "name" in info:
+        cells.append(info["name"])
+    if "cost" in info:
+        cells.append(f"Cost: ${info['cost']:,.2f}")
+    if "duration" in info:
+        cells.append(f"Duration: {info['duration']} days")
+    return cells
+
+
+def make_revenue_journal_body(btc_price: float, plans: Dict[str, float],
+                              padding_bytes: int = 0, html: bool = False,
+                              details: Optional[Dict[str, Dict]] = None) -> str:
+    """إنشاء نص Revenue Journal اصطناعي (نص عادي أو HTML)
+
+    details: اسم وتكلفة ومدة اختيارية لكل خطة تُكتب في نفس صف الخطة
+    """
+    details = details or {}
+    # حشو نصي قبل جدول الخطط لمحاكاة الرسائل الكبيرة
+    filler = "Thank you for choosing BitFuFu cloud mining services.\n"
+    padding = (filler * (padding_bytes // len(filler) + 1))[:padding_bytes] if padding_bytes > 0 else ""
+
+    if html:
+        rows = "".join(
+            f"<tr><td>Plan {plan_id}</td><td>{btc_earned:.8f} BTC</td>"
+            + "".join(f"<td>{cell}</td>" for cell in _plan_detail_cells(details.get(plan_id, {})))
+            + "</tr>"
+            for plan_id, btc_earned in plans.items()
+        )
+        return (
+            "<html><head><style>td { padding: 4px; }</style></head><body>"
+            "<h2>BitFuFu Revenue Journal</h2>"
+            f"<p>BTC Price: ${btc_price:,.2f}</p>"
+            f"<div>{padding}</div>"
+            f"<table>{rows}</table>"
+            "</body></html>"
+        )
+
+    lines = [
+        "BitFuFu Revenue Journal",
+        f"BTC Price: ${btc_price:,.2f}",
+        padding
+    ]
+    for plan_id, btc_earned in plans.items():
+        cells = _plan_detail_cells(details.get(plan_id, {}))
+        lines.append(f"Plan {plan_id}: {btc_earned:.8f} BTC" + "".join(f" | {cell}" for cell in cells))
+
+    return "\n".join(lines) + "\n"
+
+
+def make_revenue_journal_message(message_id: str, received: datetime,
+                                 btc_price: float, plans: Dict[str, float],
+                                 padding_bytes: int = 0,
+                                 history_id: int = 1,
+                                 details: Optional[Dict[str, Dict]] = None) -> Dict:
+    """إنشاء رسالة Gmail اصطناعية بصيغة format='full'"""
+    body = make_revenue_journal_body(btc_price, plans, padding_bytes, details=details)
+    data = base64.urlsafe_b64encode(body.encode('utf-8')).decode('ascii')
+
+    return {
+        "id": message_id,
+        "threadId": message_id,
+        "historyId": str(history_id),
+        "internalDate": str(int(received.timestamp() * 1000)),
+        "payload": {
+            "mimeType": "multipart/alternative",
+            "headers": [
+                {"name": "From", "value": "BitFuFu <noreply@e.bitfufu.com>"},
+                {"name": "Subject", "value": "BitFuFu Revenue Journal"}
+            ],
+            "body": {"size": 0},
+            "parts": [
+                {
+                    "mimeType": "text/plain",
+                    "body": {"size": len(body), "data": data}
+                }
+            ]
+        }
+    }
+
+
+def _b64(content: bytes) -> str:
+    return base64.urlsafe_b64encode(content).decode('ascii')
+
+
+def _text_part(mime_type: str, text: str) -> Dict:
+    content = text.encode('utf-8')
+    return {
+        "mimeType": mime_type,
+        "filename": "",
+        "headers": [{"name": "Content-Type", "value": f'{mime_type}; charset="UTF-8"'}],
+        "body": {"size": len(content), "data": _b64(content)}
+    }
+
+
+def _attachment_part(mime_type: str, filename: str, attachment_id: str, size: int) -> Dict:
+    return {
+        "mimeType": mime_type,
+        "filename": filename,
+        "headers": [
+            {"name": "Content-Type", "value": f'{mime_type}; name="{filename}"'},
+            {"name": "Content-Disposition", "value": f'attachment; filename="{filename}"'}
+        ],
+        "body": {"size": size, "attachmentId": attachment_id}
+    }
+
+
+# أشكال شجرة MIME المتاحة في make_mime_fixture_message
+MIME_FIXTURE_LAYOUTS = ("flat", "nested", "related", "body_attachment")
+
+
+def make_mime_fixture_message(layout: str, message_id: str, received: datetime,
+                              btc_price: float, plans: Dict[str, float],
+                              attachment_bytes: int = 0) -> Tuple[Dict, Dict[str, str]]:
+    """رسالة Gmail بشجرة MIME محددة، ويعيد (الرسالة، محتوى المرفقات حسب attachmentId)
+
+    flat: multipart/alternative ← text/plain (مثل make_revenue_journal_message)
+    nested: multipart/mixed ← (multipart/alternative ← text/plain + text/html) + مرفق PDF
+    related: multipart/mixed ← multipart/related ← (multipart/alternative ← text/html) + صورة، ومرفق PDF
+    body_attachment: مثل nested لكن النص العادي في مرفق (كما يعيد Gmail النصوص الكبيرة)
+    """
+    if layout not in MIME_FIXTURE_LAYOUTS:
+        raise ValueError(f"Unknown MIME fixture layout: {layout}")
+
+    text = make_revenue_journal_body(btc_price, plans)
+    html = make_revenue_journal_body(btc_price, plans, html=True)
+    attachments = {}
+
+    def _attachment(mime_type: str, filename: str, size: int) -> Dict:
+        attachment_id = f"att-{message_id}-{len(attachments) + 1}"
+        attachments[attachment_id] = _b64(b"\0" * size)
+        return _attachment_part(mime_type, filename, attachment_id, size)
+
+    if layout == "flat":
+        payload = {"mimeType": "multipart/alternative", "parts": [_text_part("text/plain", text)]}
+    elif layout == "related":
+        payload = {"mimeType": "multipart/mixed", "parts": [
+            {"mimeType": "multipart/related", "parts": [
+                {"mimeType": "multipart/alternative", "parts": [_text_part("text/html", html)]},
+                dict(_attachment("image/png", "", 1024), headers=[
+                    {"name": "Content-Type", "value": "image/png"},
+                    {"name": "Content-Disposition", "value": "inline"}
+                ])
+            ]},
+            _attachment("application/pdf", "statement.pdf", attachment_bytes)
+        ]}
+    else:
+        plain = _text_part("text/plain", text)
+        if layout == "body_attachment":
+            attachment_id = f"att-{message_id}-body"
+            attachments[attachment_id] = plain["body"].pop("data")
+            plain["body"]["attachmentId"] = attachment_id
+        payload = {"mimeType": "multipart/mixed", "parts": [
+            {"mimeType": "multipart/alternative", "parts": [plain, _text_part("text/html", html)]},
+            _attachment("application/pdf", "statement.pdf", attachment_bytes)
+        ]}
+
+    payload.update(headers=[
+        {"name": "From", "value": "BitFuFu <noreply@e.bitfufu.com>"},
+        {"name": "Subject", "value": "BitFuFu Revenue Journal"}
+    ], body={"size": 0})
+    message = {
+        "id": message_id,
+        "threadId": message_id,
+        "historyId": "1",
+        "internalDate": str(int(received.timestamp() * 1000)),
+        "payload": payload
+    }
+    return message, attachments
+
+
+def make_revenue_journal_history(count: int, plans: Optional[Dict[str, float]] = None,
+                                 padding_bytes: int = 0,
+                                 end: Optional[datetime] = None) -> List[Dict]:
+    """إنشاء سجل يومي من رسائل Revenue Journal (الأحدث أولاً)"""
+    plans = plans or {
+        "95936": 0.00015,
+        "95735": 0.00048,
+        "95937": 0.00112,
+        "95736": 0.00235
+    }
+    end = end or datetime(2025, 10, 7, 12, 0, 0)
+
+    messages = []
+    for day in range(count):
+        received = end - timedelta(days=day)
+        daily_plans = {
+            plan_id: round(btc * (count - day) / count, 8)
+            for plan_id, btc in plans.items()
+        }
+        messages.append(make_revenue_journal_message(
+            message_id=f"msg{count - day:06d}",
+            received=received,
+            btc_price=60000.0 + (count - day) * 25.0,
+            plans=daily_plans,
+            padding_bytes=padding_bytes,
+            history_id=1000 + count - day
+        ))
+
+    return messages
+
+
+def write_takeout_mbox(path: str, count: int, other_per_message: int = 1,
+                       plans: Optional[Dict[str, float]] = None, padding_bytes: int = 0,
+                       end: Optional[datetime] = None, html: bool = False) -> int:
+    """كتابة ملف mbox اصطناعي بصيغة Google Takeout (رسائل BitFuFu بين رسائل أخرى)
+
+    تُكتب الرسائل واحدة تلو الأخرى لإنشاء أرشيفات كبيرة بدون تحميلها في الذاكرة،
+    ويعيد عدد رسائل Revenue Journal المكتوبة
+    """
+    from email.message import EmailMessage
+    from email.utils import format_datetime
+
+    plans = plans or {"95936": 0.00015, "95735": 0.00048, "95937": 0.00112, "95736": 0.00235}
+    end = end or datetime(2025, 10, 7, 12, 0, 0)
+
+    def _write(f, sender: str, subject: str, received: datetime, body: str, subtype: str = "plain"):
+        message = EmailMessage()
+        message["From"] = sender
+        message["To"] = "me@example.com"
+        message["Subject"] = subject
+        message["Date"] = format_datetime(received.astimezone())
+        message["Message-ID"] = f"<{received.timestamp():.0f}.{len(subject)}@{sender.split('@')[-1].strip('>')}>"
+        message.set_content(body, subtype=subtype)
+        f.write(f"From {sender.split('<')[-1].strip('>')} {received.strftime('%a %b %d %H:%M:%S %Y')}\n".encode())
+        # تهريب أسطر "From " داخل النص (mboxrd)
+        content = message.as_bytes().replace(b"\nFrom ", b"\n>From ")
+        f.write(content.rstrip(b"\n") + b"\n\n")
+
+    with open(path, 'wb') as f:
+        for day in range(count):
+            received = end - timedelta(days=count - 1 - day)
+            daily_plans = {plan_id: round(btc * (day + 1) / count, 8) for plan_id, btc in plans.items()}
+            for other in range(other_per_message):
+                _write(f, "Newsletter <news@example.com>", f"Weekly digest {day}-{other}",
+                       received - timedelta(hours=other + 1),
+                       "From our team: BTC Price: $1.00 is not a real quote.\n" * 20)
+            _write(f, "BitFuFu <noreply@e.bitfufu.com>", "BitFuFu Revenue Journal", received,
+                   make_revenue_journal_body(60000.0 + day * 25.0, daily_plans, padding_bytes, html=html),
+                   "html" if html else "plain")
+
+    return count
+
+
+def btc_price_at(when: datetime) -> float:
+    """سعر BTC اصطناعي متغير بسلاسة حسب الوقت (نفس القيم في CSV وفي الاختبارات)"""
+    hours = when.timestamp() / 3600
+    return round(60000.0 + 5000.0 * math.sin(hours / 240.0) + 10.0 * (hours % 24), 2)
+
+
+def write_btc_price_csv(path: str, start: datetime, end: datetime,
+                        step: timedelta = timedelta(hours=1)) -> int:
+    """كتابة ملف أسعار BTC/USD اصطناعي (timestamp بالثواني، price)، ويعيد عدد الصفوف"""
+    rows = 0
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write("timestamp,price\n")
+        when = start
+        while when <= end:
+            f.write(f"{int(when.timestamp())},{btc_price_at(when):.2f}\n")
+            when += step
+            rows += 1
+    return rows
+
+
+def write_report_artifacts(directory: str, end: datetime, days: int,
+                           extensions: Tuple[str, ...] = ("md", "html")) -> List[str]:
+    """كتابة تقارير يومية قديمة كما يكتبها _generate_report (تقرير لكل يوم حتى end)، ويعيد أسماءها"""
+    os.makedirs(directory, exist_ok=True)
+    names = []
+    for day in range(days):
+        when = end - timedelta(days=day)
+        plans = "\n".join(
+            f"| {plan_id} | {0.0001 * (day + 1) * (i + 1):.8f} BTC | ${btc_price_at(when):,.2f} |"
+            for i, plan_id in enumerate(("36450", "36521", "36892", "37104"))
+        )
+        content = f"# تقرير BitFuFu - {when:%Y-%m-%d}\n\n{plans}\n" * 20
+        for extension in extensions:
+            name = f"bitfufu_report_{when:%Y%m%d_%H%M%S}.{extension}"
+            with open(os.path.join(directory, name), 'w', encoding='utf-8') as f:
+                f.write(content)
+            names.append(name)
+    return names
+
+
+class FakeHttpError(Exception):
+    """خطأ HTTP وهمي يحاكي googleapiclient.errors.HttpError"""
+
+    def __init__(self, status: int, reason: str = ""):
+        super().__init__(f"<HttpError {status}: {reason}>")
+        self.resp = type('FakeResponse', (), {'status': status, 'reason': reason})()
+        self.status_code = status
+
+
+class FakeRequest:
+    """طلب وهمي يحاكي HttpRequest"""
+
+    def __init__(self, service: 'FakeGmailService', name: str, handler: Callable[[], Dict]):
+        self.service = service
+        self.name = name
+        self.handler = handler
+
+    def execute(self) -> Dict:
+        self.service.calls[self.name] += 1
+        self.service.http_requests += 1
+        self.service._simulate_latency()
+        return self.handler()
+
+
+class FakeBatchRequest:
+    """طلب مجمع وهمي يحاكي BatchHttpRequest"""
+
+    def __init__(self, service: 'FakeGmailService', callback: Optional[Callable] = None):
+        self.service = service
+        self.callback = callback
+        self.requests = []
+
+    def add(self, request: FakeRequest, callback: Optional[Callable] = None,
+            request_id: Optional[str] = None):
+        if len(self.requests) >= 100:
+            raise ValueError("Gmail batch requests are limited to 100 calls")
+        request_id = request_id or str(len(self.requests) + 1)
+        self.requests.append((request_id, request, callback or self.callback))
+
+    def execute(self):
+        # طلب HTTP واحد لكامل الدفعة
+        self.service.calls['batch'] += 1
+        self.service.http_requests += 1
+        self.service._simulate_latency()
+
+        for request_id, request, callback in self.requests:
+            self.service.calls[request.name] += 1
+            try:
+                response, exception = request.handler(), None
+            except Exception as e:
+                response, exception = None, e
+            if callback:
+                callback(request_id, response, exception)
+
+
+class _FakeAttachmentsResource:
+    def __init__(self, service: 'FakeGmailService'):
+        self.service = service
+
+    def get(self, userId: str, messageId: str, id: str,
+            fields: Optional[str] = None) -> FakeRequest:
+        def handler():
+            data = self.service.attachments.get(messageId, {}).get(id)
+            if data is None:
+                raise FakeHttpError(404, "Requested entity was not found.")
+            return {"size": len(data) * 3 // 4, "data": data}
+        return FakeRequest(self.service, 'messages.attachments.get', handler)
+
+
+class _FakeMessagesResource:
+    def __init__(self, service: 'FakeGmailService'):
+        self.service = service
+
+    def list(self, userId: str, q: Optional[str] = None, maxResults: int = 100,
+             pageToken: Optional[str] = None, fields: Optional[str] = None) -> FakeRequest:
+        def handler():
+            offset = int(pageToken or 0)
+            page = self.service.messages[offset:offset + maxResults]
+            result = {
+                "messages": [{"id": m["id"], "threadId": m["threadId"]} for m in page],
+                "resultSizeEstimate": len(page)
+            }
+            if offset + maxResults < len(self.service.messages):
+                result["nextPageToken"] = str(offset + maxResults)
+            return result
+        return FakeRequest(self.service, 'messages.list', handler)
+
+    def get(self, userId: str, id: str, format: str = 'full',
+            metadataHeaders: Optional[List[str]] = None,
+            fields: Optional[str] = None) -> FakeRequest:
+        def handler():
+            if id not in self.service.messages_by_id:
+                raise KeyError(f"Requested entity was not found: {id}")
+            message = self.service.messages_by_id[id]
+            if format != 'metadata':
+                return message
+            names = {name.lower() for name in metadataHeaders or []}
+            return {
+                "id": message["id"],
+                "internalDate": message.get("internalDate"),
+                "payload": {"headers": [h for h in message.get("payload", {}).get("headers", [])
+                                        if not names or h["name"].lower() in names]}
+            }
+        # الرؤوس فقط تُحسب منفصلة عن جلب المحتوى الكامل
+        name = 'messages.get' if format != 'metadata' else 'messages.get.metadata'
+        return FakeRequest(self.service, name, handler)
+
+    def attachments(self) -> _FakeAttachmentsResource:
+        return _FakeAttachmentsResource(self.service)
+
+
+class _FakeHistoryResource:
+    def __init__(self, service: 'FakeGmailService'):
+        self.service = service
+
+    def list(self, userId: str, startHistoryId: str, historyTypes: Optional[List[str]] = None,
+             maxResults: int = 100, pageToken: Optional[str] = None,
+             fields: Optional[str] = None) -> FakeRequest:
+        def handler():
+            start = int(startHistoryId)
+            if start < self.service.history_floor:
+                raise FakeHttpError(404, "Requested entity was not found.")
+            records = [r for r in self.service.history if int(r["id"]) > start]
+            offset = int(pageToken or 0)
+            result = {
+                "history": records[offset:offset + maxResults],
+                "historyId": str(self.service.history_id)
+            }
+            if offset + maxResults < len(records):
+                result["nextPageToken"] = str(offset + maxResults)
+            return result
+        return FakeRequest(self.service, 'history.list', handler)
+
+
+class _FakeUsersResource:
+    def __init__(self, service: 'FakeGmailService'):
+        self.service = service
+
+    def messages(self) -> _FakeMessagesResource:
+        return _FakeMessagesResource(self.service)
+
+    def history(self) -> _FakeHistoryResource:
+        return _FakeHistoryResource(self.service)
+
+    def getProfile(self, userId: str, fields: Optional[str] = None) -> FakeRequest:
+        return FakeRequest(
+            self.service, 'getProfile',
+            lambda: {"emailAddress": "me@example.com", "historyId": str(self.service.history_id)}
+        )
+
+
+class FakeGmailService:
+    """خدمة Gmail وهمية تخدم رسائل Revenue Journal محلياً"""
+
+    def __init__(self, messages: Optional[List[Dict]] = None, latency: float = 0.0,
+                 attachments: Optional[Dict[str, Dict[str, str]]] = None):
+        # الرسائل مرتبة من الأحدث إلى الأقدم كما يعيدها Gmail
+        self.messages = list(messages or [])
+        self.messages_by_id = {m["id"]: m for m in self.messages}
+        # محتوى المرفقات: معرف الرسالة ← attachmentId ← البيانات بترميز base64url
+        self.attachments = dict(attachments or {})
+        self.latency = latency
+        self.calls = Counter()
+        self.http_requests = 0
+
+        # سجل التغييرات (history) لمحاكاة التزامن التدريجي
+        self.history = []
+        self.history_id = max((int(m.get("historyId", 0)) for m in self.messages), default=0)
+        self.history_floor = 0
+
+    def add_message(self, message: Dict, in_query: bool = True,
+                    attachments: Optional[Dict[str, str]] = None):
+        """إضافة رسالة جديدة (الأحدث أولاً كما في Gmail)"""
+        if attachments:
+            self.attachments[message["id"]] = attachments
+        self.history_id += 1
+        message = dict(message, historyId=str(self.history_id))
+        if in_query:
+            self.messages.insert(0, message)
+        self.messages_by_id[message["id"]] = message
+        self.history.append({
+            "id": str(self.history_id),
+            "messagesAdded": [{"message": {"id": message["id"], "threadId": message.get("threadId")}}]
+        })
+
+    def expire_history(self):
+        """محاكاة انتهاء صلاحية historyId القديمة"""
+        self.history_floor = self.history_id
+        self.history = []
+
+    def users(self) -> _FakeUsersResource:
+        return _FakeUsersResource(self)
+
+    def new_batch_http_request(self, callback: Optional[Callable] = None) -> FakeBatchRequest:
+        return FakeBatchRequest(self, callback)
+
+    def _simulate_latency(self):
+        if self.latency > 0:
+            time.sleep(self.latency)
+
+
+# ----------------------------------------------------------------------
+# متصفح WhatsApp Web وهمي
+# ----------------------------------------------------------------------
+
+# بدائل محلية حتى لا يُحمّل استيراد هذه الوحدة Selenium في مسار Gmail/التقارير
+class WebDriverException(Exception):
+    pass
+
+
+class NoSuchElementException(WebDriverException):
+    pass
+
+
+def _no_such_element(message: str) -> Exception:
+    """استثناء عنصر غير موجود: صنف Selenium إن كان محمّلاً أصلاً (ليتجاهله WebDriverWait)، وإلا البديل المحلي"""
+    selenium_exceptions = sys.modules.get('selenium.common.exceptions')
+    exception_class = getattr(selenium_exceptions, 'NoSuchElementException', NoSuchElementException)
+    return exception_class(message)
+
+# رموز مفاتيح Selenium (Keys.ENTER و Keys.SHIFT)
+_KEY_ENTER = '\ue007'
+_KEY_SHIFT = '\ue008'
+_KEY_CONTROL = '\ue009'
+_KEY_DELETE = '\ue017'
+
+
+class FakeWebElement:
+    """عنصر صفحة وهمي"""
+
+    def __init__(self, driver: 'FakeWebDriver', kind: str, contact: Optional[str] = None):
+        self.driver = driver
+        self.kind = kind
+        self.contact = contact
+
+    @property
+    def text(self) -> str:
+        if self.kind == 'message_box':
+            return self.driver.compose_text
+        if self.kind == 'outgoing_text':
+            return self.driver._last_outgoing_text()
+        return ''
+
+    def is_displayed(self) -> bool:
+        return True
+
+    def is_enabled(self) -> bool:
+        return True
+
+    def get_attribute(self, name: str):
+        if name in ('textContent', 'innerText'):
+            return self.text
+        return None
+
+    def clear(self):
+        self.driver._check_alive()
+        if self.kind == 'search_box':
+            self.driver.search_text = ''
+
+    def click(self):
+        self.driver._check_alive()
+        self.driver._simulate('click')
+        if self.kind == 'contact':
+            self.driver.current_chat = self.contact
+            self.driver.compose_text = ''
+        elif self.kind == 'attach_button':
+            self.driver.attach_menu_open = True
+        elif self.kind == 'send_button':
+            self.driver._simulate('upload')
+            self.driver.sent_files.append((self.driver.current_chat, self.driver.pending_file))
+            self.driver.pending_file = None
+            self.driver.attach_menu_open = False
+
+    def send_keys(self, *values):
+        self.driver._check_alive()
+        value = ''.join(values)
+        self.driver._simulate('send_keys', len(value))
+        if self.kind == 'search_box':
+            self.driver.search_text += value
+        elif self.kind == 'file_input':
+            self.driver.pending_file = value
+        elif self.kind == 'message_box':
+            if value == _KEY_CONTROL + 'a' or value == _KEY_DELETE:
+                self.driver.compose_text = ''
+            elif value == _KEY_SHIFT + _KEY_ENTER:
+                self.driver.compose_text += '\n'
+            elif value == _KEY_ENTER:
+                self.driver.sent_messages.append((self.driver.current_chat, self.driver.compose_text))
+                self.driver.compose_text = ''
+            else:
+                self.driver.compose_text += value
+
+
+class FakeWebDriver:
+    """WebDriver وهمي يحاكي WhatsApp Web بزمن استجابة قابل للضبط
+
+    latencies: زمن كل عملية بالثواني، مثل {"launch": 2.0, "get": 1.0, "send_keys_per_char": 0.001}
+    paste_limit: عدد الأحرف التي يقبلها اللصق (محاكاة لصق مقطوع)، None: الرسالة كاملة
+    """
+
+    def __init__(self, contacts: Optional[List[str]] = None, logged_in: bool = True,
+                 latencies: Optional[Dict[str, float]] = None, supports_paste: bool = True,
+                 paste_limit: Optional[int] = None):
+        self.contacts = contacts
+        self.supports_paste = supports_paste
+        self.paste_limit = paste_limit
+        self.logged_in = logged_in
+        self.latencies = latencies or {}
+        self.current_url = ''
+        self.title = ''
+        self.search_text = ''
+        self.current_chat = None
+        self.compose_text = ''
+        self.attach_menu_open = False
+        self.pending_file = None
+        self.sent_messages = []
+        self.sent_files = []
+        self.crashed = False
+        self.quit_called = False
+        self._simulate('launch')
+
+    def _simulate(self, operation: str, size: int = 0):
+        delay = self.latencies.get(operation, 0.0)
+        if size:
+            delay += self.latencies.get(f"{operation}_per_char", 0.0) * size
+        if delay > 0:
+            time.sleep(delay)
+
+    def _check_alive(self):
+        if self.crashed or self.quit_called:
+            raise WebDriverException("chrome not reachable")
+
+    def crash(self):
+        """محاكاة توقف المتصفح"""
+        self.crashed = True
+
+    def get(self, url: str):
+        self._check_alive()
+        self._simulate('get')
+        self.current_url = url
+        self.title = 'WhatsApp'
+
+    def quit(self):
+        self.quit_called = True
+
+    def execute_script(self, script: str, *args):
+        self._check_alive()
+        if 'readyState' in script:
+            return 'complete'
+        if 'ClipboardEvent' in script and args:
+            # محاكاة لصق النص كاملاً في مربع الكتابة
+            if self.supports_paste and args[0].kind == 'message_box':
+                self._simulate('paste')
+                self.compose_text = args[1][:self.paste_limit]
+            return self.compose_text
+        return None
+
+    def _resolve(self, value: str) -> Optional[FakeWebElement]:
+        if not self.logged_in or not self.current_url:
+            return None
+        if 'data-tab="3"' in value:
+            return FakeWebElement(self, 'search_box')
+        if value.startswith('//span[@title="'):
+            contact = value[len('//span[@title="'):-2]
+            if self.contacts is None or contact in self.contacts:
+                return FakeWebElement(self, 'contact', contact)
+            return None
+        if self.current_chat is None:
+            return None
+        if 'data-tab="10"' in value:
+            return FakeWebElement(self, 'message_box')
+        if '@title="Attach"' in value:
+            return FakeWebElement(self, 'attach_button')
+        if '@accept="*"' in value and self.attach_menu_open:
+            return FakeWebElement(self, 'file_input')
+        if 'data-icon="send"' in value and self.pending_file:
+            return FakeWebElement(self, 'send_button')
+        return None
+
+    def find_element(self, by: str = 'xpath', value: Optional[str] = None) -> FakeWebElement:
+        self._check_alive()
+        self._simulate('find')
+        element = self._resolve(value or '')
+        if element is None:
+            raise _no_such_element(f"no such element: {value}")
+        return element
+
+    def _outgoing_count(self) -> int:
+        return sum(1 for chat, _ in self.sent_messages + self.sent_files if chat == self.current_chat)
+
+    def _last_outgoing_text(self) -> str:
+        texts = [text for chat, text in self.sent_messages if chat == self.current_chat]
+        return texts[-1] if texts else ''
+
+    def find_elements(self, by: str = 'xpath', value: Optional[str] = None) -> List[FakeWebElement]:
+        self._check_alive()
+        value = value or ''
+        if 'message-out' in value and 'selectable-text' in value:
+            # نص آخر رسالة صادرة في المحادثة الحالية
+            return [FakeWebElement(self, 'outgoing_text')] if self._last_outgoing_text() else []
+        if 'message-out' in value:
+            # الرسائل الصادرة في المحادثة الحالية، وكلها تحمل علامة الإرسال
+            count = self._outgoing_count()
+            if 'msg-check' in value:
+                count = min(count, 1)
+            return [FakeWebElement(self, 'outgoing') for _ in range(count)]
+        if 'canvas' in value:
+            return [FakeWebElement(self, 'qr_code')] if self.current_url and not self.logged_in else []
+        element = self._resolve(value)
+        return [element] if element else []
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+إنشاء عميل Gmail API من وثيقة discovery محفوظة على القرص
+مع اتصال HTTP واحد (keep-alive) يُعاد استخدامه لجميع الطلبات وبين التشغيلات في نفس العملية
+"""
+
+import os
+import json
+import time
+import logging
+import threading
+from typing import Dict, Optional, Tuple
+
+from bitfufu_metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+# وثيقة discovery المحفوظة وعمرها الأقصى قبل التحديث
+DISCOVERY_CACHE_FILE = "/home/ubuntu/gmail_discovery_v1.json"
+DISCOVERY_MAX_AGE_SECONDS = 7 * 24 * 3600
+DISCOVERY_URL = "https://gmail.googleapis.com/$discovery/rest?version=v1"
+
+# مهلة طلبات HTTP بالثواني
+HTTP_TIMEOUT = 60
+
+_lock = threading.Lock()
+_discovery_document: Optional[Dict] = None
+
+# عميل واحد لكل ملف token: {"service", "http"}
+_clients: Dict[str, Dict] = {}
+
+
+def _read_cached_document(cache_file: str) -> Optional[Dict]:
+    if not os.path.exists(cache_file):
+        return None
+    if time.time() - os.path.getmtime(cache_file) > DISCOVERY_MAX_AGE_SECONDS:
+        return None
+    with open(cache_file, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _fetch_document() -> Tuple[Dict, str]:
+    """الوثيقة المضمنة في googleapiclient، أو تنزيلها إن لم تكن متاحة"""
+    try:
+        from googleapiclient.discovery_cache import get_static_doc
+        content = get_static_doc("gmail", "v1")
+        if content:
+            return json.loads(content), "static"
+    except ImportError:
+        pass
+
+    import httplib2
+    response, content = httplib2.Http(timeout=HTTP_TIMEOUT).request(DISCOVERY_URL)
+    if response.status != 200:
+        raise RuntimeError(f"فشل تنزيل وثيقة Gmail discovery: HTTP {response.status}")
+    return json.loads(content), "network"
+
+
+def load_discovery_document(cache_file: str = DISCOVERY_CACHE_FILE) -> Dict:
+    """وثيقة Gmail discovery: من الذاكرة، ثم القرص، ثم المصدر (مع حفظها)"""
+    global _discovery_document
+
+    with _lock:
+        if _discovery_document is not None:
+            return _discovery_document
+
+        start = time.perf_counter()
+        source = "disk"
+        try:
+            document = _read_cached_document(cache_file)
+        except Exception as e:
+            logger.warning(f"تعذر قراءة وثيقة discovery المحفوظة: {str(e)}")
+            document = None
+
+        if document is None:
+            document, source = _fetch_document()
+            try:
+                tmp_file = f"{cache_file}.tmp"
+                with open(tmp_file, 'w', encoding='utf-8') as f:
+                    json.dump(document, f)
+                os.replace(tmp_file, cache_file)
+            except Exception as e:
+                logger.warning(f"تعذر حفظ وثيقة discovery: {str(e)}")
+
+        REGISTRY.observe("gmail_discovery_load_seconds", time.perf_counter() - start, source=source)
+        _discovery_document = document
+        return document
+
+
+def build_gmail_service(credentials, cache_key: str):
+    """عميل Gmail لملف token معين، يُنشأ مرة واحدة لكل عملية
+
+    httplib2.Http غير آمن للاستخدام من عدة خيوط، لذلك لكل ملف token اتصاله الخاص
+    ولا يُستخدم نفس الحساب من خيطين في نفس الوقت
+    """
+    with _lock:
+        client = _clients.get(cache_key)
+        if client is not None:
+            # تحديث الاعتمادات (مثلاً بعد refresh) مع الإبقاء على الاتصال المفتوح
+            client["http"].credentials = credentials
+            REGISTRY.inc("gmail_client_builds_total", source="reused")
+            return client["service"]
+
+    import httplib2
+    import google_auth_httplib2
+    from googleapiclient.discovery import build_from_document
+
+    document = load_discovery_document()
+    start = time.perf_counter()
+    http = google_auth_httplib2.AuthorizedHttp(credentials, http=httplib2.Http(timeout=HTTP_TIMEOUT))
+    service = build_from_document(document, http=http)
+    REGISTRY.observe("gmail_client_build_seconds", time.perf_counter() - start)
+    REGISTRY.inc("gmail_client_builds_total", source="built")
+
+    with _lock:
+        _clients[cache_key] = {"service": service, "http": http}
+    return service
+
+
+def open_connections() -> int:
+    """عدد اتصالات HTTP المفتوحة في جميع العملاء"""
+    with _lock:
+        return sum(len(client["http"].connections) for client in _clients.values())
+
+
+def reset_clients():
+    """إغلاق الاتصالات ونسيان العملاء والوثيقة المحملة (مثلاً بعد تغيير ملفات token)"""
+    global _discovery_document
+    with _lock:
+        for client in _clients.values():
+            client["http"].close()
+        _clients.clear()
+        _discovery_document = None
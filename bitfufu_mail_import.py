@@ -0,0 +1,296 @@
+#!/usr/bin/env python3
+"""
+استيراد سجل Revenue Journal من أرشيف بريد محلي (mbox من Google Takeout أو مجلد Maildir)
+يقرأ الأرشيف تدريجياً عبر mmap بدون تحميله في الذاكرة، ويحلل الرسائل بالتوازي على أنوية المعالج
+ثم يحفظ اللقطات في سجل التحليلات على دفعات
+"""
+
+import os
+import re
+import sys
+import mmap
+import time
+import logging
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from email import message_from_bytes, policy
+from email.parser import BytesHeaderParser
+from email.utils import parsedate_to_datetime
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from roi_history_store import ROIHistoryStore, snapshot_timestamp
+from roi_rolling_analytics import invalidate_rolling_analytics
+from bitfufu_plan_registry import PlanRegistry, PLAN_REGISTRY_FILE, PLAN_FIELDS
+
+logger = logging.getLogger(__name__)
+
+BITFUFU_SENDER = "noreply@e.bitfufu.com"
+BITFUFU_SUBJECT = "revenue journal"
+
+# أقصى حجم لرأس الرسالة الذي يُقرأ للتصفية
+MAX_HEADER_BYTES = 64 * 1024
+
+# عدد اللقطات في كل معاملة حفظ
+SAVE_BATCH_SIZE = 500
+
+# عدد المهام المعلقة لكل عامل (يحد استهلاك الذاكرة مهما كان حجم الأرشيف)
+TASKS_PER_WORKER = 8
+
+# مصدر الرسالة: ("mbox", المسار, البداية, النهاية) أو ("maildir", المسار, 0, 0)
+MessageSource = Tuple[str, str, int, int]
+
+_header_parser = BytesHeaderParser(policy=policy.default)
+
+# أسطر "From " المهربة داخل الرسائل في صيغة mboxrd
+_MBOXRD_ESCAPE_RE = re.compile(rb'^>(>*From )', re.MULTILINE)
+
+
+def _message_id(value) -> str:
+    return str(value or "").strip("<> ")
+
+
+def _bitfufu_message_id(header_bytes: bytes) -> Optional[str]:
+    """التصفية حسب المرسل والموضوع من رأس الرسالة فقط
+
+    يعيد Message-ID (أو نصاً فارغاً إن لم يوجد) لرسائل BitFuFu، وNone لغيرها
+    """
+    # فحص سريع على البايتات قبل تحليل الرأس (أغلب رسائل الأرشيف ليست من BitFuFu)
+    if BITFUFU_SENDER.encode() not in header_bytes.lower():
+        return None
+    headers = _header_parser.parsebytes(header_bytes)
+    if (BITFUFU_SENDER in str(headers.get("From", "")).lower()
+            and BITFUFU_SUBJECT in str(headers.get("Subject", "")).lower()):
+        return _message_id(headers.get("Message-ID"))
+    return None
+
+
+def _header_end(buffer, start: int, end: int) -> int:
+    """نهاية رأس الرسالة (أول سطر فارغ) ضمن حد MAX_HEADER_BYTES"""
+    limit = min(end, start + MAX_HEADER_BYTES)
+    position = buffer.find(b"\n\n", start, limit)
+    if position < 0:
+        position = buffer.find(b"\r\n\r\n", start, limit)
+    return limit if position < 0 else position
+
+
+def iter_mbox_sources(path: str) -> Iterator[Tuple[MessageSource, str]]:
+    """مواقع رسائل BitFuFu داخل ملف mbox مع Message-ID (بدون نسخ محتواها)"""
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            size = len(buffer)
+            position = 0 if buffer[:5] == b"From " else buffer.find(b"\nFrom ")
+            while 0 <= position < size:
+                # تخطي سطر الفاصل "From ..." نفسه
+                line_end = buffer.find(b"\n", position + 1)
+                if line_end < 0:
+                    break
+                start = line_end + 1
+                next_separator = buffer.find(b"\nFrom ", start)
+                end = size if next_separator < 0 else next_separator + 1
+
+                message_id = _bitfufu_message_id(buffer[start:_header_end(buffer, start, end)])
+                if message_id is not None:
+                    yield ("mbox", path, start, end), message_id
+                position = next_separator
+
+
+def iter_maildir_sources(path: str) -> Iterator[Tuple[MessageSource, str]]:
+    """ملفات رسائل BitFuFu في مجلد Maildir (cur و new)"""
+    for folder in ("cur", "new"):
+        directory = os.path.join(path, folder)
+        if not os.path.isdir(directory):
+            continue
+        for entry in os.scandir(directory):
+            if not entry.is_file() or entry.name.startswith("."):
+                continue
+            # قراءة الرأس فقط
+            with open(entry.path, 'rb') as f:
+                header = f.read(MAX_HEADER_BYTES)
+            end = header.find(b"\n\n")
+            message_id = _bitfufu_message_id(header if end < 0 else header[:end])
+            if message_id is not None:
+                yield ("maildir", entry.path, 0, 0), message_id
+
+
+def iter_sources(path: str) -> Iterator[Tuple[MessageSource, str]]:
+    """رسائل BitFuFu في أرشيف mbox أو Maildir"""
+    if os.path.isdir(path):
+        return iter_maildir_sources(path)
+    return iter_mbox_sources(path)
+
+
+# ----------------------------------------------------------------------
+# العمل داخل العمليات الفرعية
+# ----------------------------------------------------------------------
+
+_worker_state: Dict = {}
+
+
+def _init_worker(registry_file: Optional[str]):
+    """تهيئة كل عملية فرعية: المحلل مرة واحدة وبدون سجلات لكل رسالة
+
+    سجل الخطط في العمليات الفرعية للقراءة فقط؛ العملية الرئيسية تسجل الخطط المكتشفة وتحفظها
+    """
+    logging.disable(logging.INFO)
+    from gmail_bitfufu_monitor import BitFuFuGmailMonitor
+    _worker_state["monitor"] = BitFuFuGmailMonitor(plan_registry=PlanRegistry(registry_file))
+    _worker_state["mmaps"] = {}
+
+
+def _read_source(source: MessageSource) -> bytes:
+    kind, path, start, end = source
+    if kind == "maildir":
+        with open(path, 'rb') as f:
+            return f.read()
+
+    # mmap واحد لكل ملف في كل عملية فرعية
+    buffer = _worker_state["mmaps"].get(path)
+    if buffer is None:
+        with open(path, 'rb') as f:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        _worker_state["mmaps"][path] = buffer
+    return _MBOXRD_ESCAPE_RE.sub(rb'\1', buffer[start:end])
+
+
+def _message_body(message) -> str:
+    """النص العادي إن وجد، وإلا HTML"""
+    part = message.get_body(preferencelist=("plain", "html"))
+    if part is None:
+        return ""
+    return part.get_content()
+
+
+def _email_date(message) -> Optional[str]:
+    """تاريخ الرسالة بالتوقيت المحلي (بنفس صيغة internalDate من Gmail API)"""
+    try:
+        received = parsedate_to_datetime(str(message["Date"]))
+    except (TypeError, ValueError):
+        return None
+    if received.tzinfo is not None:
+        received = received.astimezone().replace(tzinfo=None)
+    return received.isoformat()
+
+
+def _analyze_source(source: MessageSource) -> Optional[Dict]:
+    """تحليل رسالة واحدة وحساب ROI لها (داخل عملية فرعية)"""
+    from gmail_bitfufu_monitor import ROIAnalyzer
+
+    try:
+        message = message_from_bytes(_read_source(source), policy=policy.default)
+        body = _message_body(message)
+        if not body:
+            return None
+        message_id = _message_id(message["Message-ID"]) or None
+        email_data = _worker_state["monitor"].extract_body_data(body, message_id, _email_date(message))
+        if not email_data:
+            return None
+        return ROIAnalyzer(email_data).calculate_roi() or None
+    except Exception as e:
+        logger.error(f"خطأ في تحليل الرسالة {source[1]}:{source[2]}: {str(e)}")
+        return None
+
+
+# ----------------------------------------------------------------------
+# الاستيراد
+# ----------------------------------------------------------------------
+
+class MailArchiveImporter:
+    """استيراد أرشيف بريد إلى سجل التحليلات بذاكرة ثابتة"""
+
+    def __init__(self, history_store: Optional[ROIHistoryStore] = None,
+                 workers: Optional[int] = None, save_batch_size: int = SAVE_BATCH_SIZE,
+                 plan_registry: Optional[PlanRegistry] = None):
+        self.history_store = history_store or ROIHistoryStore()
+        self.plan_registry = plan_registry or PlanRegistry(PLAN_REGISTRY_FILE)
+        self.workers = workers or os.cpu_count() or 1
+        self.save_batch_size = save_batch_size
+        self.stats: Dict = {}
+
+    def import_archive(self, path: str) -> Dict:
+        """استيراد أرشيف mbox أو Maildir، ويعيد إحصائيات الاستيراد"""
+        start_time = time.perf_counter()
+        known = self.history_store.known_messages()
+        stats = {"matched": 0, "imported": 0, "duplicates": 0, "failed": 0}
+        pending_saves: List[Dict] = []
+
+        def _collect(analysis: Optional[Dict]):
+            if not analysis:
+                stats["failed"] += 1
+                return
+            timestamp = snapshot_timestamp(analysis)
+            if analysis.get("message_id") in known["message_ids"] or timestamp in known["timestamps"]:
+                stats["duplicates"] += 1
+                return
+            known["timestamps"].add(timestamp)
+            for plan_id, plan in analysis.get("plans", {}).items():
+                self.plan_registry.observe(plan_id, timestamp,
+                                           **{field: plan.get(field) for field in PLAN_FIELDS})
+            if analysis.get("message_id"):
+                known["message_ids"].add(analysis["message_id"])
+            pending_saves.append(analysis)
+            if len(pending_saves) >= self.save_batch_size:
+                stats["imported"] += self.history_store.save_snapshots(pending_saves)
+                pending_saves.clear()
+
+        try:
+            max_in_flight = self.workers * TASKS_PER_WORKER
+            with ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                     initargs=(self.plan_registry.registry_file,)) as pool:
+                in_flight = set()
+                for source, message_id in iter_sources(path):
+                    stats["matched"] += 1
+                    # الرسائل المستوردة سابقاً لا تُرسل للتحليل
+                    if message_id and message_id in known["message_ids"]:
+                        stats["duplicates"] += 1
+                        continue
+                    in_flight.add(pool.submit(_analyze_source, source))
+                    if len(in_flight) >= max_in_flight:
+                        done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            _collect(future.result())
+                for future in in_flight:
+                    _collect(future.result())
+
+            if pending_saves:
+                stats["imported"] += self.history_store.save_snapshots(pending_saves)
+            self.plan_registry.save()
+            # اللقطات المستوردة قد تسبق آخر يوم في التحليلات المتحركة
+            if stats["imported"]:
+                invalidate_rolling_analytics(self.history_store)
+
+        except Exception as e:
+            logger.error(f"خطأ في استيراد الأرشيف {path}: {str(e)}")
+            stats["error"] = str(e)
+
+        elapsed = time.perf_counter() - start_time
+        stats["seconds"] = round(elapsed, 3)
+        stats["messages_per_second"] = round(stats["matched"] / elapsed, 1) if elapsed > 0 else 0.0
+        self.stats = stats
+
+        logger.info(
+            f"تم استيراد {stats['imported']} لقطة من {stats['matched']} رسالة BitFuFu "
+            f"({stats['duplicates']} مكررة، {stats['failed']} فاشلة) في {stats['seconds']}s"
+        )
+        return stats
+
+
+def main():
+    """استيراد أرشيف: bitfufu_mail_import.py <mbox أو Maildir> [--workers N] [--db FILE]"""
+    args = sys.argv[1:]
+    if not args or args[0].startswith("--"):
+        print("الاستخدام: python3 bitfufu_mail_import.py <ملف mbox أو مجلد Maildir> [--workers N] [--db FILE]")
+        sys.exit(1)
+
+    workers = int(args[args.index("--workers") + 1]) if "--workers" in args else None
+    store = ROIHistoryStore(args[args.index("--db") + 1]) if "--db" in args else ROIHistoryStore()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    stats = MailArchiveImporter(store, workers=workers).import_archive(args[0])
+    print(f"✅ {stats['imported']} لقطة جديدة ({stats['matched']} رسالة، "
+          f"{stats['messages_per_second']} رسالة/ثانية)")
+    sys.exit(0 if "error" not in stats else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,287 @@
+#!/usr/bin/env python3
+"""
+مقاييس الأداء لنظام BitFuFu: عدادات، مدرجات تكرارية ومؤقتات
+تُكتب في نهاية كل تشغيل بصيغة Prometheus النصية وملخص JSON
+"""
+
+import os
+import json
+import time
+import logging
+import functools
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+METRICS_DIR = "/home/ubuntu/bitfufu_metrics"
+METRICS_PREFIX = "bitfufu_"
+
+# حدود المدرج الافتراضية بالثواني (من 1ms حتى دقيقتين)
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                   1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+# حدود أحجام الرسائل بالبايت
+SIZE_BUCKETS = (1_000, 10_000, 100_000, 1_000_000, 5_000_000, 25_000_000)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _label_key(labels: Dict) -> LabelKey:
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels: LabelKey, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(labels) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in pairs) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return "+Inf"
+    value = float(value)
+    return str(int(value)) if value.is_integer() else repr(value)
+
+
+class _Histogram:
+    """مدرج تراكمي بحدود ثابتة"""
+
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * len(self.buckets)
+        self.count = 0
+        self.sum = 0.0
+        self.min = None
+        self.max = None
+
+    def observe(self, value: float):
+        self.count += 1
+        self.sum += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+
+    def cumulative(self) -> List[Tuple[float, int]]:
+        total = 0
+        result = []
+        for bound, count in zip(self.buckets, self.counts):
+            total += count
+            result.append((bound, total))
+        result.append((float('inf'), self.count))
+        return result
+
+
+class MetricsRegistry:
+    """سجل مقاييس آمن للاستخدام من عدة خيوط"""
+
+    def __init__(self, prefix: str = METRICS_PREFIX):
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self._counters: Dict[str, Dict[LabelKey, float]] = {}
+        self._gauges: Dict[str, Dict[LabelKey, float]] = {}
+        self._histograms: Dict[str, Dict[LabelKey, _Histogram]] = {}
+        self._help: Dict[str, str] = {}
+
+    def describe(self, name: str, help_text: str):
+        """وصف المقياس في ملف Prometheus"""
+        self._help[name] = help_text
+
+    def reset(self):
+        """مسح جميع القيم (في بداية كل تشغيل)"""
+        with self._lock:
+            self._counters.clear()
+            self._gauges.clear()
+            self._histograms.clear()
+
+    # ------------------------------------------------------------------
+    # التسجيل
+    # ------------------------------------------------------------------
+
+    def inc(self, name: str, value: float = 1, **labels):
+        """زيادة عداد"""
+        key = _label_key(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+
+    def set_gauge(self, name: str, value: float, **labels):
+        """تعيين قيمة لحظية"""
+        with self._lock:
+            self._gauges.setdefault(name, {})[_label_key(labels)] = value
+
+    def observe(self, name: str, value: float, buckets: Sequence[float] = DEFAULT_BUCKETS, **labels):
+        """إضافة قيمة إلى مدرج"""
+        key = _label_key(labels)
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = _Histogram(buckets)
+            histogram.observe(value)
+
+    @contextmanager
+    def timer(self, name: str, **labels):
+        """قياس زمن كتلة بالثواني (يُسجل حتى عند حدوث استثناء)"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def timed(self, name: str, **labels):
+        """مُزخرف لقياس زمن دالة"""
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.timer(name, **labels):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    # ------------------------------------------------------------------
+    # القراءة والتصدير
+    # ------------------------------------------------------------------
+
+    def counter_value(self, name: str, **labels) -> float:
+        with self._lock:
+            return self._counters.get(name, {}).get(_label_key(labels), 0)
+
+    def histogram_stats(self, name: str, **labels) -> Optional[Dict]:
+        with self._lock:
+            histogram = self._histograms.get(name, {}).get(_label_key(labels))
+            if histogram is None:
+                return None
+            return {"count": histogram.count, "sum": histogram.sum,
+                    "min": histogram.min, "max": histogram.max}
+
+    def to_dict(self) -> Dict:
+        """ملخص JSON لجميع المقاييس"""
+        with self._lock:
+            counters = [
+                {"name": name, "labels": dict(key), "value": value}
+                for name, series in sorted(self._counters.items())
+                for key, value in sorted(series.items())
+            ]
+            gauges = [
+                {"name": name, "labels": dict(key), "value": value}
+                for name, series in sorted(self._gauges.items())
+                for key, value in sorted(series.items())
+            ]
+            histograms = [
+                {
+                    "name": name,
+                    "labels": dict(key),
+                    "count": h.count,
+                    "sum": round(h.sum, 6),
+                    "min": round(h.min, 6) if h.min is not None else None,
+                    "max": round(h.max, 6) if h.max is not None else None,
+                    "mean": round(h.sum / h.count, 6) if h.count else None
+                }
+                for name, series in sorted(self._histograms.items())
+                for key, h in sorted(series.items())
+            ]
+        return {"counters": counters, "gauges": gauges, "histograms": histograms}
+
+    def to_prometheus(self) -> str:
+        """التصدير بصيغة Prometheus النصية (text exposition format)"""
+        lines = []
+
+        def header(name: str, metric_type: str):
+            full_name = self.prefix + name
+            if name in self._help:
+                lines.append(f"# HELP {full_name} {self._help[name]}")
+            lines.append(f"# TYPE {full_name} {metric_type}")
+            return full_name
+
+        with self._lock:
+            for name, series in sorted(self._counters.items()):
+                full_name = header(name, "counter")
+                for key, value in sorted(series.items()):
+                    lines.append(f"{full_name}{_format_labels(key)} {_format_value(value)}")
+
+            for name, series in sorted(self._gauges.items()):
+                full_name = header(name, "gauge")
+                for key, value in sorted(series.items()):
+                    lines.append(f"{full_name}{_format_labels(key)} {_format_value(value)}")
+
+            for name, series in sorted(self._histograms.items()):
+                full_name = header(name, "histogram")
+                for key, histogram in sorted(series.items()):
+                    for bound, count in histogram.cumulative():
+                        labels = _format_labels(key, ("le", _format_value(bound)))
+                        lines.append(f"{full_name}_bucket{labels} {count}")
+                    lines.append(f"{full_name}_sum{_format_labels(key)} {repr(histogram.sum)}")
+                    lines.append(f"{full_name}_count{_format_labels(key)} {histogram.count}")
+
+        return "\n".join(lines) + "\n"
+
+    def write_run(self, output_dir: str = METRICS_DIR, run_id: Optional[str] = None) -> Dict[str, str]:
+        """كتابة مقاييس التشغيل الحالي
+
+        - bitfufu.prom: آخر تشغيل (لمجمّع ملفات node_exporter)
+        - run_<id>.json: ملخص هذا التشغيل
+        - metrics_history.jsonl: سطر لكل تشغيل لرسم تطور الأزمنة
+        """
+        try:
+            os.makedirs(output_dir, exist_ok=True)
+            run_id = run_id or datetime.now().strftime("%Y%m%d_%H%M%S")
+            summary = {"run_id": run_id, "timestamp": datetime.now().isoformat()}
+            summary.update(self.to_dict())
+
+            prom_file = os.path.join(output_dir, "bitfufu.prom")
+            tmp_file = f"{prom_file}.tmp"
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                f.write(self.to_prometheus())
+            os.replace(tmp_file, prom_file)
+
+            json_file = os.path.join(output_dir, f"run_{run_id}.json")
+            with open(json_file, 'w', encoding='utf-8') as f:
+                json.dump(summary, f, ensure_ascii=False, indent=2)
+
+            history_file = os.path.join(output_dir, "metrics_history.jsonl")
+            with open(history_file, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(summary, ensure_ascii=False) + "\n")
+
+            logger.info(f"تم حفظ مقاييس الأداء: {json_file}")
+            return {"prometheus": prom_file, "json": json_file, "history": history_file}
+
+        except Exception as e:
+            logger.error(f"خطأ في حفظ مقاييس الأداء: {str(e)}")
+            return {}
+
+
+# السجل المشترك لجميع الوحدات في العملية
+REGISTRY = MetricsRegistry()
+
+REGISTRY.describe("gmail_auth_seconds", "Gmail OAuth and service build time")
+REGISTRY.describe("gmail_api_seconds", "Gmail API request latency by method")
+REGISTRY.describe("gmail_api_requests_total", "Gmail API requests by method")
+REGISTRY.describe("email_parse_seconds", "Revenue Journal body parse time")
+REGISTRY.describe("email_body_bytes", "Revenue Journal body size")
+REGISTRY.describe("roi_calculation_seconds", "ROIAnalyzer.calculate_roi time")
+REGISTRY.describe("pdf_render_seconds", "In-process PDF render time")
+REGISTRY.describe("stage_seconds", "Automation stage duration")
+REGISTRY.describe("stage_runs_total", "Automation stage results by status")
+REGISTRY.describe("run_seconds", "End-to-end automation run time")
+REGISTRY.describe("runs_total", "Automation runs by result")
+REGISTRY.describe("whatsapp_step_seconds", "WhatsApp Web step duration")
+REGISTRY.describe("whatsapp_steps_total", "WhatsApp Web steps by result")
+REGISTRY.describe("gmail_api_retries_total", "Gmail API retries after quota or server errors")
+REGISTRY.describe("account_collect_seconds", "Per-account Gmail collection time")
+REGISTRY.describe("account_collections_total", "Per-account collection results")
+REGISTRY.describe("gmail_discovery_load_seconds", "Gmail discovery document load time by source")
+REGISTRY.describe("gmail_client_build_seconds", "Gmail client build time from the cached document")
+REGISTRY.describe("gmail_client_builds_total", "Gmail clients built or reused")
+REGISTRY.describe("gmail_http_connections", "Open pooled Gmail HTTP connections")
+REGISTRY.describe("processed_messages_reused_total", "Runs that reused results of an already processed message")
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+قراءة أجزاء MIME لرسائل Gmail API (payload بصيغة format='full')
+تمر على شجرة الأجزاء بكل مستوياتها دون فك ترميز أي جزء، ثم تفك ترميز الجزء المختار فقط،
+ولا تجلب محتوى المرفقات (attachmentId) من Gmail إلا عند الحاجة إليه
+"""
+
+import base64
+import logging
+from typing import Callable, Dict, Iterator, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# أنواع نص البريد حسب الأولوية (النص العادي أسرع في التحليل من HTML)
+BODY_MIME_TYPES = ("text/plain", "text/html")
+
+# أقصى عمق للأجزاء المتداخلة (حماية من الرسائل المشوهة)
+MAX_MIME_DEPTH = 10
+
+# أقصى حجم لنص البريد الذي يُفك ترميزه (النص الأكبر يُتجاهل بدلاً من تحميله في الذاكرة)
+MAX_BODY_BYTES = 20 * 1024 * 1024
+
+# جلب محتوى مرفق من Gmail: attachmentId ← البيانات بترميز base64url
+AttachmentFetcher = Callable[[str], str]
+
+
+def iter_parts(payload: Dict, max_depth: int = MAX_MIME_DEPTH) -> Iterator[Tuple[Dict, int]]:
+    """المرور على جميع أجزاء الرسالة بالترتيب (عمقاً أولاً) مع عمق كل جزء
+
+    يعيد الأجزاء نفسها بدون نسخ أو فك ترميز، ويتوقف المرور عند توقف المستدعي
+    """
+    stack = [(payload, 0)]
+    while stack:
+        part, depth = stack.pop()
+        yield part, depth
+        children = part.get("parts")
+        if not children:
+            continue
+        if depth >= max_depth:
+            logger.warning(f"تجاوز عمق أجزاء الرسالة الحد ({max_depth})، تم تجاهل الأجزاء الأعمق")
+            continue
+        # بالترتيب العكسي حتى يخرج الجزء الأول من المكدس أولاً
+        stack.extend((child, depth + 1) for child in reversed(children))
+
+
+def is_attachment(part: Dict) -> bool:
+    """الجزء مرفق ملف وليس نص الرسالة"""
+    if part.get("filename"):
+        return True
+    for header in part.get("headers", ()):
+        if header.get("name", "").lower() == "content-disposition":
+            return header.get("value", "").lower().startswith("attachment")
+    return False
+
+
+def find_body_part(payload: Dict, mime_types: Tuple[str, ...] = BODY_MIME_TYPES) -> Optional[Dict]:
+    """اختيار جزء نص البريد حسب أولوية الأنواع، بدون فك ترميز أي جزء
+
+    يتوقف المرور عند أول جزء من النوع الأعلى أولوية
+    """
+    best, best_rank = None, len(mime_types)
+    for part, _ in iter_parts(payload):
+        mime_type = part.get("mimeType", "").lower()
+        if mime_type not in mime_types or is_attachment(part):
+            continue
+        rank = mime_types.index(mime_type)
+        if rank < best_rank:
+            best, best_rank = part, rank
+            if rank == 0:
+                break
+    return best
+
+
+def _part_charset(part: Dict) -> str:
+    for header in part.get("headers", ()):
+        if header.get("name", "").lower() == "content-type":
+            for param in header.get("value", "").split(";")[1:]:
+                key, _, value = param.strip().partition("=")
+                if key.lower() == "charset" and value:
+                    return value.strip('"\' ')
+    return "utf-8"
+
+
+def decode_part(part: Dict, fetch_attachment: Optional[AttachmentFetcher] = None) -> str:
+    """فك ترميز جزء واحد، مع جلب محتواه من Gmail إن كان مرفقاً (body.attachmentId)
+
+    البيانات المجلوبة تُحفظ في الجزء نفسه حتى لا تُجلب مرة ثانية لنفس الرسالة
+    """
+    body = part.get("body", {})
+    size = body.get("size", 0)
+    if size > MAX_BODY_BYTES:
+        logger.warning(f"تجاوز حجم نص البريد الحد ({size} بايت)، تم تجاهله")
+        return ""
+
+    data = body.get("data")
+    if data is None and body.get("attachmentId"):
+        if fetch_attachment is None:
+            logger.warning("نص البريد في مرفق ولا يمكن جلبه")
+            return ""
+        data = body["data"] = fetch_attachment(body["attachmentId"])
+    if not data:
+        return ""
+
+    # Gmail قد يحذف حشو base64
+    raw = base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+    try:
+        return raw.decode(_part_charset(part))
+    except LookupError:
+        return raw.decode("utf-8")
+
+
+def get_body_text(payload: Dict, fetch_attachment: Optional[AttachmentFetcher] = None,
+                  mime_types: Tuple[str, ...] = BODY_MIME_TYPES) -> str:
+    """نص البريد: أفضل جزء نصي في شجرة الأجزاء بعد فك ترميزه فقط"""
+    part = find_body_part(payload, mime_types)
+    if part is None:
+        return ""
+    return decode_part(part, fetch_attachment)
@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+"""
+إنشاء تقرير BitFuFu بصيغة PDF داخل العملية (reportlab)
+مع تشكيل الحروف العربية واتجاه الكتابة من اليمين لليسار، بدون أي عملية خارجية
+"""
+
+import os
+import re
+import logging
+import functools
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from bitfufu_metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+# خط يدعم العربية (يمكن تحديده صراحة عبر متغير البيئة)
+PDF_FONT_ENV = "BITFUFU_PDF_FONT"
+PDF_FONT_CANDIDATES = [
+    ("/usr/share/fonts/truetype/noto/NotoNaskhArabic-Regular.ttf",
+     "/usr/share/fonts/truetype/noto/NotoNaskhArabic-Bold.ttf"),
+    ("/usr/share/fonts/truetype/noto/NotoSansArabic-Regular.ttf",
+     "/usr/share/fonts/truetype/noto/NotoSansArabic-Bold.ttf"),
+    ("/usr/share/fonts/truetype/fonts-arabeyes/ae_AlArabiya.ttf", None),
+    ("/usr/share/fonts/opentype/fonts-hosny-amiri/amiri-regular.ttf",
+     "/usr/share/fonts/opentype/fonts-hosny-amiri/amiri-bold.ttf"),
+    ("/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf",
+     "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf"),
+]
+
+# الرموز التعبيرية خارج نطاق الخطوط المتاحة (تبقى في Markdown وWhatsApp فقط)
+_EMOJI_RE = re.compile('[\U00010000-\U0010FFFF\u2600-\u27BF\uFE0F\u200D]')
+
+# الألوان
+_HEADER_COLOR = "#1F4E79"
+_GRID_COLOR = "#B4C6E7"
+_ROW_COLOR = "#EEF3FA"
+_POSITIVE_COLOR = "#1E7B34"
+_NEGATIVE_COLOR = "#B02A37"
+
+
+@functools.lru_cache(maxsize=None)
+def _register_fonts() -> Tuple[str, str]:
+    """تسجيل الخط مرة واحدة لكل عملية، ويعيد اسمي الخط العادي والعريض"""
+    from reportlab.pdfbase import pdfmetrics
+    from reportlab.pdfbase.ttfonts import TTFont
+
+    candidates = list(PDF_FONT_CANDIDATES)
+    env_font = os.environ.get(PDF_FONT_ENV)
+    if env_font:
+        candidates.insert(0, (env_font, None))
+
+    for regular, bold in candidates:
+        if not os.path.exists(regular):
+            continue
+        try:
+            pdfmetrics.registerFont(TTFont("BitFuFuArabic", regular))
+            bold_name = "BitFuFuArabic"
+            if bold and os.path.exists(bold):
+                pdfmetrics.registerFont(TTFont("BitFuFuArabic-Bold", bold))
+                bold_name = "BitFuFuArabic-Bold"
+            logger.info(f"تم تسجيل خط PDF: {regular}")
+            return "BitFuFuArabic", bold_name
+        except Exception as e:
+            logger.warning(f"تعذر تحميل الخط {regular}: {str(e)}")
+
+    logger.warning(f"لم يتم العثور على خط عربي، حدد المسار عبر {PDF_FONT_ENV}")
+    return "Helvetica", "Helvetica-Bold"
+
+
+@functools.lru_cache(maxsize=4096)
+def shape_text(text: str) -> str:
+    """تشكيل الحروف العربية وترتيبها للعرض من اليمين لليسار"""
+    import arabic_reshaper
+    from bidi.algorithm import get_display
+
+    text = _EMOJI_RE.sub('', text).strip()
+    return get_display(arabic_reshaper.reshape(text))
+
+
+def _signed_color(value: float) -> str:
+    return _POSITIVE_COLOR if value >= 0 else _NEGATIVE_COLOR
+
+
+class BitFuFuPDFRenderer:
+    """رسم التقرير مباشرة من بيانات التحليل؛ الخطوط والأنماط تُجهز مرة واحدة"""
+
+    def __init__(self):
+        from reportlab.lib import colors
+        from reportlab.lib.enums import TA_RIGHT, TA_CENTER
+        from reportlab.lib.styles import ParagraphStyle
+
+        self.font, self.bold_font = _register_fonts()
+        self.colors = colors
+
+        self.styles = {
+            "title": ParagraphStyle("title", fontName=self.bold_font, fontSize=20,
+                                    leading=28, alignment=TA_CENTER,
+                                    textColor=colors.HexColor(_HEADER_COLOR)),
+            "heading": ParagraphStyle("heading", fontName=self.bold_font, fontSize=14,
+                                      leading=22, alignment=TA_RIGHT, spaceBefore=10,
+                                      spaceAfter=6, textColor=colors.HexColor(_HEADER_COLOR)),
+            "body": ParagraphStyle("body", fontName=self.font, fontSize=11,
+                                   leading=17, alignment=TA_RIGHT),
+            "note": ParagraphStyle("note", fontName=self.font, fontSize=9,
+                                   leading=14, alignment=TA_RIGHT, textColor=colors.grey),
+        }
+
+        # نمط الجداول المشترك: الرأس في الصف الأول وعمود التسميات على اليمين
+        self.table_style = [
+            ("FONTNAME", (0, 0), (-1, -1), self.font),
+            ("FONTNAME", (0, 0), (-1, 0), self.bold_font),
+            ("FONTSIZE", (0, 0), (-1, -1), 10),
+            ("BACKGROUND", (0, 0), (-1, 0), colors.HexColor(_HEADER_COLOR)),
+            ("TEXTCOLOR", (0, 0), (-1, 0), colors.white),
+            ("ROWBACKGROUNDS", (0, 1), (-1, -1), [colors.white, colors.HexColor(_ROW_COLOR)]),
+            ("GRID", (0, 0), (-1, -1), 0.5, colors.HexColor(_GRID_COLOR)),
+            ("ALIGN", (0, 0), (-1, -1), "CENTER"),
+            ("VALIGN", (0, 0), (-1, -1), "MIDDLE"),
+            ("TOPPADDING", (0, 0), (-1, -1), 4),
+            ("BOTTOMPADDING", (0, 0), (-1, -1), 4),
+        ]
+
+    def _paragraph(self, text: str, style: str):
+        from reportlab.platypus import Paragraph
+        from xml.sax.saxutils import escape
+        return Paragraph(escape(shape_text(text)), self.styles[style])
+
+    def _table(self, header: List[str], rows: List[List], widths: List[float],
+               value_colors: Optional[List[Tuple[int, int, str]]] = None):
+        """جدول من اليمين لليسار: ترتيب الأعمدة معكوس عند الرسم"""
+        from reportlab.platypus import Table, TableStyle
+
+        data = [[shape_text(cell) for cell in reversed(header)]]
+        for row in rows:
+            data.append([shape_text(str(cell)) for cell in reversed(row)])
+
+        style = list(self.table_style)
+        last = len(header) - 1
+        for row, col, color in value_colors or []:
+            # تحويل رقم العمود إلى الترتيب المعكوس (+1 لصف الرأس)
+            style.append(("TEXTCOLOR", (last - col, row + 1), (last - col, row + 1),
+                          self.colors.HexColor(color)))
+
+        table = Table(data, colWidths=list(reversed(widths)), hAlign="RIGHT")
+        table.setStyle(TableStyle(style))
+        return table
+
+    def render(self, analysis: Dict, comparison: Optional[Dict], output_file: str,
+               status_text: str, recommendation: str,
+               generated_at: Optional[datetime] = None) -> bool:
+        """إنشاء ملف PDF للتقرير"""
+        try:
+            from reportlab.lib.pagesizes import A4
+            from reportlab.lib.units import cm
+            from reportlab.platypus import SimpleDocTemplate, Spacer
+
+            now = generated_at or datetime.now()
+            story = [
+                self._paragraph("تقرير BitFuFu اليومي", "title"),
+                self._paragraph(f"التاريخ: {now.strftime('%d/%m/%Y')}   "
+                                f"الوقت: {now.strftime('%H:%M:%S')}", "body"),
+                self._paragraph(f"الحالة: {status_text}", "body"),
+                Spacer(1, 0.3 * cm),
+
+                self._paragraph("الملخص المالي", "heading"),
+                self._table(
+                    ["المؤشر", "القيمة"],
+                    [
+                        ["إجمالي الاستثمار", f"${analysis['total_investment']:,.2f}"],
+                        ["إجمالي العوائد", f"${analysis['total_returns']:,.2f}"],
+                        ["صافي الربح/الخسارة", f"${analysis['total_profit_loss']:,.2f}"],
+                        ["العائد الإجمالي (ROI)", f"{analysis['overall_roi']:.2f}%"],
+                        ["سعر BTC الحالي", f"${analysis['btc_price']:,.2f}"],
+                    ],
+                    [7 * cm, 6 * cm],
+                    [(2, 1, _signed_color(analysis['total_profit_loss'])),
+                     (3, 1, _signed_color(analysis['overall_roi']))]
+                ),
+
+                self._paragraph("مقارنة مع اليوم السابق", "heading"),
+            ]
+
+            if comparison:
+                roi_change = comparison.get('roi_change', 0)
+                pl_change = comparison.get('profit_loss_change', 0)
+                btc_change = comparison.get('btc_price_change', 0)
+                story.append(self._table(
+                    ["المؤشر", "التغيير"],
+                    [
+                        ["تغير ROI", f"{roi_change:+.2f}%"],
+                        ["تغير الربح/الخسارة", f"${pl_change:+.2f}"],
+                        ["تغير سعر BTC", f"${btc_change:+.2f}"],
+                    ],
+                    [7 * cm, 6 * cm],
+                    [(0, 1, _signed_color(roi_change)),
+                     (1, 1, _signed_color(pl_change)),
+                     (2, 1, _signed_color(btc_change))]
+                ))
+            else:
+                story.append(self._paragraph("لا توجد بيانات سابقة للمقارنة", "body"))
+
+            plan_rows, plan_colors = [], []
+            for i, (plan_id, plan) in enumerate(analysis['plans'].items()):
+                plan_rows.append([
+                    f"{plan['name']} (#{plan_id})",
+                    f"${plan['cost']:.2f}",
+                    f"{plan['duration']} يوم",
+                    f"{plan['btc_earned']:.8f}",
+                    f"${plan['usd_earned']:.2f}",
+                    f"${plan['profit_loss']:.2f}",
+                    f"{plan['roi_percentage']:.2f}%",
+                ])
+                plan_colors.append((i, 5, _signed_color(plan['profit_loss'])))
+                plan_colors.append((i, 6, _signed_color(plan['roi_percentage'])))
+
+            story += [
+                self._paragraph("تفاصيل الخطط", "heading"),
+                self._table(
+                    ["الخطة", "التكلفة", "المدة", "BTC المكتسبة",
+                     "العائد بالدولار", "الربح/الخسارة", "ROI"],
+                    plan_rows,
+                    [3.8 * cm, 2 * cm, 1.4 * cm, 2.6 * cm, 2.7 * cm, 2.7 * cm, 2.2 * cm],
+                    plan_colors
+                ),
+
+                self._paragraph("التوصية", "heading"),
+                self._paragraph(recommendation, "body"),
+                Spacer(1, 0.5 * cm),
+                self._paragraph("هذا التقرير تم إنشاؤه تلقائياً بواسطة نظام مراقبة BitFuFu", "note"),
+                self._paragraph("البيانات مستخرجة من آخر بريد Revenue Journal", "note"),
+            ]
+
+            doc = SimpleDocTemplate(
+                output_file, pagesize=A4,
+                rightMargin=1.5 * cm, leftMargin=1.5 * cm,
+                topMargin=1.5 * cm, bottomMargin=1.5 * cm,
+                title="BitFuFu Report", author="BitFuFu Monitor"
+            )
+            with REGISTRY.timer("pdf_render_seconds"):
+                doc.build(story)
+            return True
+
+        except Exception as e:
+            logger.error(f"خطأ في إنشاء PDF: {str(e)}")
+            return False
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+سجل خطط التعدين المكتشفة من رسائل Revenue Journal
+كل خطة تظهر في البريد تُسجل مع اسمها وتكلفتها ومدتها وأول وآخر يوم ظهرت فيه،
+مع فهرس حسب رقم الخطة وفهرس مرتب حسب فترة النشاط
+"""
+
+import os
+import json
+import bisect
+import logging
+import threading
+from datetime import date, datetime
+from typing import Dict, List, Optional, Union
+
+logger = logging.getLogger(__name__)
+
+PLAN_REGISTRY_FILE = "/home/ubuntu/bitfufu_plans.json"
+
+# حقول الخطة التي تُكتشف من البريد أو من الإعداد
+PLAN_FIELDS = ("name", "cost", "duration")
+
+DateLike = Union[str, date, datetime]
+
+
+def _to_day(value: DateLike) -> str:
+    """اليوم بصيغة YYYY-MM-DD (فترات النشاط بدقة يوم)"""
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()[:10]
+    return value[:10]
+
+
+class PlanRegistry:
+    """سجل خطط دائم (JSON) مفهرس حسب الرقم وفترة النشاط
+
+    registry_file=None يعني سجلاً في الذاكرة فقط
+    """
+
+    def __init__(self, registry_file: Optional[str] = PLAN_REGISTRY_FILE,
+                 seed: Optional[Dict[str, Dict]] = None):
+        self.registry_file = registry_file
+        self._lock = threading.Lock()
+        self._plans: Dict[str, Dict] = {}
+        # (آخر يوم ظهور، رقم الخطة) مرتبة؛ الخطط النشطة مؤخراً في نهاية القائمة
+        self._by_last_seen: List[tuple] = []
+        self._dirty = False
+        self._load()
+        if seed:
+            self.seed(seed)
+
+    def _load(self):
+        if not self.registry_file or not os.path.exists(self.registry_file):
+            return
+        try:
+            with open(self.registry_file, 'r', encoding='utf-8') as f:
+                self._plans = json.load(f).get("plans", {})
+            self._by_last_seen = sorted(
+                (plan["last_seen"], plan_id) for plan_id, plan in self._plans.items() if plan.get("last_seen")
+            )
+        except Exception as e:
+            logger.error(f"خطأ في تحميل سجل الخطط: {str(e)}")
+            self._plans = {}
+            self._by_last_seen = []
+
+    def save(self) -> bool:
+        """حفظ السجل إذا تغير منذ آخر حفظ"""
+        if not self.registry_file or not self._dirty:
+            return True
+        try:
+            with self._lock:
+                content = json.dumps({"plans": self._plans}, ensure_ascii=False)
+                self._dirty = False
+            tmp_file = f"{self.registry_file}.tmp"
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                f.write(content)
+            os.replace(tmp_file, self.registry_file)
+            return True
+        except Exception as e:
+            logger.error(f"خطأ في حفظ سجل الخطط: {str(e)}")
+            return False
+
+    # ------------------------------------------------------------------
+    # التحديث
+    # ------------------------------------------------------------------
+
+    def seed(self, plans: Dict[str, Dict]):
+        """إضافة خطط معروفة من الإعداد (تكمل الحقول الناقصة فقط، ولا تغير ما اكتُشف من البريد)"""
+        with self._lock:
+            for plan_id, info in plans.items():
+                plan = self._plans.setdefault(plan_id, {"first_seen": None, "last_seen": None})
+                for field in PLAN_FIELDS:
+                    if plan.get(field) is None and info.get(field) is not None:
+                        plan[field] = info[field]
+                        self._dirty = True
+
+    def observe(self, plan_id: str, seen_at: DateLike, **details) -> Dict:
+        """تسجيل ظهور خطة في بريد بتاريخ معين مع ما اكتُشف من تفاصيلها، ويعيد بيانات الخطة"""
+        day = _to_day(seen_at)
+        with self._lock:
+            plan = self._plans.get(plan_id)
+            if plan is None:
+                plan = self._plans[plan_id] = {"first_seen": None, "last_seen": None}
+                logger.info(f"تم اكتشاف خطة جديدة: {plan_id}")
+                self._dirty = True
+
+            for field in PLAN_FIELDS:
+                value = details.get(field)
+                if value is not None and plan.get(field) != value:
+                    plan[field] = value
+                    self._dirty = True
+
+            if plan["first_seen"] is None or day < plan["first_seen"]:
+                plan["first_seen"] = day
+                self._dirty = True
+            if plan["last_seen"] is None or day > plan["last_seen"]:
+                if plan["last_seen"] is not None:
+                    index = bisect.bisect_left(self._by_last_seen, (plan["last_seen"], plan_id))
+                    del self._by_last_seen[index]
+                bisect.insort(self._by_last_seen, (day, plan_id))
+                plan["last_seen"] = day
+                self._dirty = True
+            return dict(plan, plan_id=plan_id)
+
+    # ------------------------------------------------------------------
+    # الاستعلامات
+    # ------------------------------------------------------------------
+
+    def __len__(self) -> int:
+        return len(self._plans)
+
+    def __contains__(self, plan_id: str) -> bool:
+        return plan_id in self._plans
+
+    def get(self, plan_id: str) -> Optional[Dict]:
+        """بيانات خطة حسب رقمها"""
+        plan = self._plans.get(plan_id)
+        return dict(plan, plan_id=plan_id) if plan is not None else None
+
+    def active_between(self, start: DateLike, end: DateLike) -> List[Dict]:
+        """الخطط التي ظهرت في أي يوم ضمن [start, end]
+
+        البحث الثنائي في فهرس آخر ظهور يتجاوز الخطط المنتهية قبل start،
+        فيتناسب الزمن مع عدد الخطط النشطة بعد start وليس مع حجم السجل
+        """
+        start_day, end_day = _to_day(start), _to_day(end)
+        with self._lock:
+            index = bisect.bisect_left(self._by_last_seen, (start_day,))
+            candidates = [plan_id for _, plan_id in self._by_last_seen[index:]]
+            return [
+                dict(self._plans[plan_id], plan_id=plan_id) for plan_id in candidates
+                if self._plans[plan_id]["first_seen"] <= end_day
+            ]
+
+    def active_on(self, day: DateLike) -> List[Dict]:
+        """الخطط النشطة في يوم معين (بين أول وآخر ظهور لها)"""
+        return self.active_between(day, day)
@@ -0,0 +1,464 @@
+#!/usr/bin/env python3
+"""
+كتابة تقرير BitFuFu بصيغ Markdown وHTML ونص WhatsApp من قوالب مشتركة
+يتم تصنيف الحالة مرة واحدة، ثم تُكتب الصيغ الثلاث في مرور واحد على الخطط
+مباشرة إلى الملفات بدون بناء المستند كاملاً في الذاكرة
+"""
+
+import html
+import logging
+from datetime import datetime
+from typing import Dict, List, Optional, TextIO
+
+logger = logging.getLogger(__name__)
+
+# مستويات الحالة حسب ROI الإجمالي: (الحد الأدنى، الرمز، النص، التوصية، التوصية المختصرة)
+ROI_STATUS_LEVELS = [
+    (5, "🟢 📈", "أداء ممتاز", "مواصلة الاستثمار في الخطط ذات الأداء العالي", "مواصلة الاستثمار"),
+    (0, "🟡 📊", "أداء مقبول", "مراجعة استراتيجية الاستثمار وتحسين التوزيع", "مراجعة الاستراتيجية"),
+    (-50, "🔴 📉", "خسائر محدودة", "مراقبة دقيقة للأداء وإعادة تقييم الخطط", "مراقبة دقيقة"),
+    (None, "🚨 ⚠️", "خسائر كبيرة", "إعادة تقييم فوري للاستراتيجية الاستثمارية", "إعادة تقييم فوري"),
+]
+
+# عدد أسطر الخطط التي تُجمع قبل كل كتابة إلى الملف
+WRITE_CHUNK_PLANS = 256
+
+
+def classify_roi(roi: float) -> Dict[str, str]:
+    """رمز الحالة ونصها والتوصية (الكاملة والمختصرة) حسب ROI الإجمالي"""
+    for threshold, emoji, text, recommendation, short_recommendation in ROI_STATUS_LEVELS:
+        if threshold is None or roi > threshold:
+            return {
+                "emoji": emoji,
+                "text": text,
+                "recommendation": recommendation,
+                "short_recommendation": short_recommendation
+            }
+
+
+def plan_emoji(roi: float) -> str:
+    """رمز حالة الخطة حسب ROI الخاص بها"""
+    return "✅" if roi > 0 else "⚠️" if roi > -50 else "❌"
+
+
+def _arrow(change: float) -> str:
+    return "📈" if change > 0 else "📉" if change < 0 else "➡️"
+
+
+# ----------------------------------------------------------------------
+# قوالب Markdown
+# ----------------------------------------------------------------------
+
+MD_HEADER = """# تقرير BitFuFu اليومي {status_emoji}
+
+**التاريخ:** {date}  
+**الوقت:** {time}  
+**الحالة:** {status_text}
+
+---
+
+## 💰 الملخص المالي
+
+| المؤشر | القيمة |
+|--------|--------|
+| إجمالي الاستثمار | ${total_investment:,.2f} |
+| إجمالي العوائد | ${total_returns:,.2f} |
+| صافي الربح/الخسارة | ${total_profit_loss:,.2f} |
+| العائد الإجمالي (ROI) | {overall_roi:.2f}% |
+| سعر BTC الحالي | ${btc_price:,.2f} |
+
+---
+
+## 📊 مقارنة مع اليوم السابق
+
+"""
+
+MD_COMPARISON = """| المؤشر | التغيير |
+|--------|---------|
+| تغير ROI | {roi_arrow} {roi_change:+.2f}% |
+| تغير الربح/الخسارة | {pl_arrow} ${pl_change:+.2f} |
+| تغير سعر BTC | {btc_arrow} ${btc_change:+.2f} |
+"""
+
+MD_NO_COMPARISON = "*لا توجد بيانات سابقة للمقارنة*\n"
+
+MD_ROLLING_HEADER = """
+---
+
+## 📆 الأداء التراكمي (حتى {as_of})
+
+| المؤشر | القيمة |
+|--------|--------|
+| BTC التراكمية | {cumulative_btc:.8f} BTC |
+| متوسط العائد اليومي | {avg_daily} |
+| ROI آخر 7 أيام | {roi_7d} |
+| ROI آخر 30 يوماً | {roi_30d} |
+| استرداد التكلفة المتوقع | {break_even} |
+
+| الخطة | BTC التراكمية | متوسط العائد اليومي | ROI 7 أيام | ROI 30 يوماً | استرداد التكلفة | ROI المتوقع بنهاية المدة |
+|-------|---------------|---------------------|------------|--------------|-----------------|--------------------------|
+"""
+
+MD_ROLLING_PLAN = ("| {name} (#{plan_id}) | {cumulative_btc:.8f} | {avg_daily} | {roi_7d} | {roi_30d} | "
+                   "{break_even} | {projected_roi} |\n")
+
+MD_ACCOUNTS_HEADER = """
+---
+
+## 👥 الحسابات
+
+| الحساب | الخطط | الاستثمار | العوائد | الربح/الخسارة | ROI |
+|--------|-------|-----------|---------|---------------|-----|
+"""
+
+MD_ACCOUNT_ROW = ("| {account} | {plans} | ${investment:,.2f} | "
+                  "${returns:,.2f} | ${profit_loss:,.2f} | {roi:.2f}% |\n")
+
+MD_PLANS_HEADER = "\n---\n\n## 📈 تفاصيل الخطط\n\n"
+
+MD_PLAN = """### {emoji} {name} (#{plan_id})
+
+| المؤشر | القيمة |
+|--------|--------|
+| التكلفة | ${cost:.2f} |
+| المدة | {duration} يوم |
+| BTC المكتسبة | {btc_earned:.8f} BTC |
+| العائد بالدولار | ${usd_earned:.2f} |
+| الربح/الخسارة | ${profit_loss:.2f} |
+| ROI | {roi_percentage:.2f}% |
+
+"""
+
+MD_FOOTER = """---
+
+## 💡 التوصية
+
+**{recommendation}**
+
+---
+
+## 📝 ملاحظات
+
+- هذا التقرير تم إنشاؤه تلقائياً بواسطة نظام مراقبة BitFuFu
+- البيانات مستخرجة من آخر بريد Revenue Journal
+- يتم تحديث التقرير يومياً في الساعة 16:05 بتوقيت أبوظبي
+
+---
+
+*تم الإنشاء بواسطة نظام المراقبة التلقائي* 🤖
+"""
+
+# ----------------------------------------------------------------------
+# قوالب HTML
+# ----------------------------------------------------------------------
+
+HTML_HEADER = """<!DOCTYPE html>
+<html lang="ar" dir="rtl">
+<head>
+<meta charset="utf-8">
+<title>تقرير BitFuFu اليومي - {date}</title>
+<style>
+body {{ font-family: "Noto Naskh Arabic", "DejaVu Sans", sans-serif; margin: 2em; color: #222; }}
+h1, h2 {{ color: #1F4E79; }}
+table {{ border-collapse: collapse; margin-bottom: 1.5em; }}
+th, td {{ border: 1px solid #B4C6E7; padding: 4px 10px; text-align: right; }}
+th {{ background: #1F4E79; color: #fff; }}
+tr:nth-child(even) td {{ background: #EEF3FA; }}
+.positive {{ color: #1E7B34; }}
+.negative {{ color: #B02A37; }}
+</style>
+</head>
+<body>
+<h1>تقرير BitFuFu اليومي {status_emoji}</h1>
+<p><b>التاريخ:</b> {date} &nbsp; <b>الوقت:</b> {time} &nbsp; <b>الحالة:</b> {status_text}</p>
+<h2>💰 الملخص المالي</h2>
+<table>
+<tr><th>المؤشر</th><th>القيمة</th></tr>
+<tr><td>إجمالي الاستثمار</td><td>${total_investment:,.2f}</td></tr>
+<tr><td>إجمالي العوائد</td><td>${total_returns:,.2f}</td></tr>
+<tr><td>صافي الربح/الخسارة</td><td class="{pl_class}">${total_profit_loss:,.2f}</td></tr>
+<tr><td>العائد الإجمالي (ROI)</td><td class="{pl_class}">{overall_roi:.2f}%</td></tr>
+<tr><td>سعر BTC الحالي</td><td>${btc_price:,.2f}</td></tr>
+</table>
+<h2>📊 مقارنة مع اليوم السابق</h2>
+"""
+
+HTML_COMPARISON = """<table>
+<tr><th>المؤشر</th><th>التغيير</th></tr>
+<tr><td>تغير ROI</td><td>{roi_arrow} {roi_change:+.2f}%</td></tr>
+<tr><td>تغير الربح/الخسارة</td><td>{pl_arrow} ${pl_change:+.2f}</td></tr>
+<tr><td>تغير سعر BTC</td><td>{btc_arrow} ${btc_change:+.2f}</td></tr>
+</table>
+"""
+
+HTML_NO_COMPARISON = "<p><i>لا توجد بيانات سابقة للمقارنة</i></p>\n"
+
+HTML_ROLLING_HEADER = """<h2>📆 الأداء التراكمي (حتى {as_of})</h2>
+<table>
+<tr><th>المؤشر</th><th>القيمة</th></tr>
+<tr><td>BTC التراكمية</td><td>{cumulative_btc:.8f} BTC</td></tr>
+<tr><td>متوسط العائد اليومي</td><td>{avg_daily}</td></tr>
+<tr><td>ROI آخر 7 أيام</td><td>{roi_7d}</td></tr>
+<tr><td>ROI آخر 30 يوماً</td><td>{roi_30d}</td></tr>
+<tr><td>استرداد التكلفة المتوقع</td><td>{break_even}</td></tr>
+</table>
+<table>
+<tr><th>الخطة</th><th>الرقم</th><th>BTC التراكمية</th><th>متوسط العائد اليومي</th><th>ROI 7 أيام</th>
+<th>ROI 30 يوماً</th><th>استرداد التكلفة</th><th>ROI المتوقع بنهاية المدة</th></tr>
+"""
+
+HTML_ROLLING_PLAN = ("<tr><td>{name}</td><td>{plan_id}</td><td>{cumulative_btc:.8f}</td><td>{avg_daily}</td>"
+                     "<td>{roi_7d}</td><td>{roi_30d}</td><td>{break_even}</td><td>{projected_roi}</td></tr>\n")
+
+HTML_ACCOUNTS_HEADER = """<h2>👥 الحسابات</h2>
+<table>
+<tr><th>الحساب</th><th>الخطط</th><th>الاستثمار</th><th>العوائد</th><th>الربح/الخسارة</th><th>ROI</th></tr>
+"""
+
+HTML_ACCOUNT_ROW = ("<tr><td>{account}</td><td>{plans}</td><td>${investment:,.2f}</td>"
+                    "<td>${returns:,.2f}</td><td>${profit_loss:,.2f}</td><td>{roi:.2f}%</td></tr>\n")
+
+HTML_TABLE_END = "</table>\n"
+
+HTML_PLANS_HEADER = """<h2>📈 تفاصيل الخطط</h2>
+<table>
+<tr><th></th><th>الخطة</th><th>الرقم</th><th>التكلفة</th><th>المدة</th><th>BTC المكتسبة</th>
+<th>العائد بالدولار</th><th>الربح/الخسارة</th><th>ROI</th></tr>
+"""
+
+HTML_PLAN = ("<tr><td>{emoji}</td><td>{name}</td><td>{plan_id}</td><td>${cost:.2f}</td>"
+             "<td>{duration} يوم</td><td>{btc_earned:.8f}</td><td>${usd_earned:.2f}</td>"
+             "<td class=\"{pl_class}\">${profit_loss:.2f}</td>"
+             "<td class=\"{pl_class}\">{roi_percentage:.2f}%</td></tr>\n")
+
+HTML_FOOTER = """</table>
+<h2>💡 التوصية</h2>
+<p><b>{recommendation}</b></p>
+<p><i>تم الإنشاء بواسطة نظام المراقبة التلقائي</i> 🤖</p>
+</body>
+</html>
+"""
+
+# ----------------------------------------------------------------------
+# قوالب رسالة WhatsApp
+# ----------------------------------------------------------------------
+
+WA_HEADER = """🤖 *تقرير BitFuFu اليومي* {status_emoji}
+📅 التاريخ: {date}
+
+💰 *الملخص المالي:*
+• إجمالي الاستثمار: ${total_investment:,.2f}
+• إجمالي العوائد: ${total_returns:,.2f}
+• صافي الخسارة: ${total_profit_loss:,.2f}
+• العائد الإجمالي: {overall_roi:.2f}%"""
+
+WA_COMPARISON = """
+
+📊 *مقارنة مع اليوم السابق:*
+• تغير ROI: {roi_change:+.2f}%
+• تغير الخسائر: ${pl_change:+.2f}"""
+
+WA_ROLLING = """
+
+📆 *الأداء التراكمي:*
+• BTC التراكمية: {cumulative_btc:.8f}
+• متوسط العائد اليومي: {avg_daily}
+• ROI آخر 7 أيام: {roi_7d} | 30 يوماً: {roi_30d}
+• استرداد التكلفة: {break_even}"""
+
+WA_ACCOUNTS_HEADER = "\n\n👥 *الحسابات:*"
+
+WA_ACCOUNT = "\n• {account}: {roi:.2f}% (${profit_loss:,.2f})"
+
+WA_PLANS_HEADER = "\n\n📈 *حالة الخطط:*"
+
+WA_PLAN = "\n• {emoji} {name}: {roi_percentage:.2f}%"
+
+WA_FOOTER = """
+
+💡 *التوصية:*
+{short_recommendation}
+
+📎 التقرير المفصل مرفق أعلاه"""
+
+
+def _pl_class(value: float) -> str:
+    return "positive" if value >= 0 else "negative"
+
+
+def _percent(value: Optional[float]) -> str:
+    return "—" if value is None else f"{value:.2f}%"
+
+
+def rolling_fields(figures: Dict) -> Dict:
+    """نصوص مؤشرات roi_rolling_analytics لخطة أو للمحفظة (القيم غير المتوفرة بعد تُكتب كنص)"""
+    if figures.get("avg_daily_btc") is None:
+        avg_daily = "غير متوفر بعد (يوم واحد)"
+    else:
+        avg_daily = f"{figures['avg_daily_btc']:.8f} BTC (${figures['avg_daily_usd']:,.2f})"
+
+    if figures.get("break_even_reached"):
+        break_even = "تم الاسترداد ✅"
+    elif figures.get("break_even_day") is None:
+        break_even = "غير متوقع بالعائد الحالي"
+    else:
+        break_even = f"{figures['break_even_day']} (بعد {figures['days_to_break_even']} يوم)"
+        if figures.get("end_day") and not figures.get("break_even_within_duration"):
+            break_even += " ⚠️ بعد انتهاء المدة"
+
+    return dict(
+        figures,
+        avg_daily=avg_daily,
+        roi_7d=_percent(figures.get("roi_7d")),
+        roi_30d=_percent(figures.get("roi_30d")),
+        break_even=break_even,
+        projected_roi=_percent(figures.get("projected_roi_at_end"))
+    )
+
+
+class _NullWriter:
+    """مخرج فارغ عند عدم طلب صيغة معينة"""
+
+    def write(self, text: str):
+        pass
+
+
+class ReportWriter:
+    """كتابة التقرير بالصيغ الثلاث في مرور واحد على الخطط"""
+
+    def __init__(self, analysis_data: Dict, comparison_data: Optional[Dict] = None,
+                 accounts_summary: Optional[List[Dict]] = None,
+                 generated_at: Optional[datetime] = None,
+                 rolling_data: Optional[Dict] = None):
+        self.analysis_data = analysis_data
+        self.comparison_data = comparison_data or {}
+        self.accounts_summary = accounts_summary or []
+        self.rolling_data = rolling_data or {}
+        self.generated_at = generated_at or datetime.now()
+        self.status = classify_roi(analysis_data['overall_roi'])
+
+    def write_files(self, md_file: Optional[str] = None, html_file: Optional[str] = None) -> str:
+        """كتابة ملفي Markdown وHTML مباشرة، ويعيد نص رسالة WhatsApp"""
+        md_stream = open(md_file, 'w', encoding='utf-8') if md_file else None
+        try:
+            html_stream = open(html_file, 'w', encoding='utf-8') if html_file else None
+            try:
+                return self.render(md_stream, html_stream)
+            finally:
+                if html_stream:
+                    html_stream.close()
+        finally:
+            if md_stream:
+                md_stream.close()
+
+    def render(self, md: Optional[TextIO] = None, html_out: Optional[TextIO] = None) -> str:
+        """كتابة Markdown وHTML إلى المخرجات المحددة، ويعيد نص رسالة WhatsApp"""
+        md = md or _NullWriter()
+        html_out = html_out or _NullWriter()
+        data = self.analysis_data
+        fields = {
+            "status_emoji": self.status["emoji"],
+            "status_text": self.status["text"],
+            "date": self.generated_at.strftime("%d/%m/%Y"),
+            "time": self.generated_at.strftime("%H:%M:%S"),
+            "total_investment": data['total_investment'],
+            "total_returns": data['total_returns'],
+            "total_profit_loss": data['total_profit_loss'],
+            "overall_roi": data['overall_roi'],
+            "btc_price": data['btc_price'],
+            "pl_class": _pl_class(data['total_profit_loss'])
+        }
+
+        md.write(MD_HEADER.format_map(fields))
+        html_out.write(HTML_HEADER.format_map(fields))
+        message = [WA_HEADER.format_map(fields)]
+
+        # المقارنة مع اليوم السابق
+        if self.comparison_data:
+            roi_change = self.comparison_data.get('roi_change', 0)
+            pl_change = self.comparison_data.get('profit_loss_change', 0)
+            btc_change = self.comparison_data.get('btc_price_change', 0)
+            changes = {
+                "roi_change": roi_change, "roi_arrow": _arrow(roi_change),
+                "pl_change": pl_change, "pl_arrow": _arrow(pl_change),
+                "btc_change": btc_change, "btc_arrow": _arrow(btc_change)
+            }
+            md.write(MD_COMPARISON.format_map(changes))
+            html_out.write(HTML_COMPARISON.format_map(changes))
+            message.append(WA_COMPARISON.format_map(changes))
+        else:
+            md.write(MD_NO_COMPARISON)
+            html_out.write(HTML_NO_COMPARISON)
+
+        # المؤشرات التراكمية والمتحركة
+        if self.rolling_data:
+            self._render_rolling(md, html_out, message)
+
+        # ملخص الحسابات
+        if self.accounts_summary:
+            md.write(MD_ACCOUNTS_HEADER)
+            html_out.write(HTML_ACCOUNTS_HEADER)
+            message.append(WA_ACCOUNTS_HEADER)
+            for account in self.accounts_summary:
+                md.write(MD_ACCOUNT_ROW.format_map(account))
+                html_out.write(HTML_ACCOUNT_ROW.format_map(dict(account, account=html.escape(account['account']))))
+                message.append(WA_ACCOUNT.format_map(account))
+            html_out.write(HTML_TABLE_END)
+
+        # مرور واحد على الخطط لجميع الصيغ، مع الكتابة على دفعات
+        md.write(MD_PLANS_HEADER)
+        html_out.write(HTML_PLANS_HEADER)
+        message.append(WA_PLANS_HEADER)
+        md_chunk: List[str] = []
+        html_chunk: List[str] = []
+        write_md = not isinstance(md, _NullWriter)
+        write_html = not isinstance(html_out, _NullWriter)
+        # الدفعة تُحسب بعدد الخطط لا بطول قائمة Markdown، حتى لا يتراكم جدول HTML كاملاً
+        # في الذاكرة عند طلب HTML وحده
+        for count, (plan_id, plan_data) in enumerate(data['plans'].items(), 1):
+            plan = dict(plan_data, plan_id=plan_id, emoji=plan_emoji(plan_data['roi_percentage']))
+            message.append(WA_PLAN.format_map(plan))
+            if write_md:
+                md_chunk.append(MD_PLAN.format_map(plan))
+            if write_html:
+                plan["name"] = html.escape(str(plan["name"]))
+                plan["plan_id"] = html.escape(str(plan_id))
+                plan["pl_class"] = _pl_class(plan_data['profit_loss'])
+                html_chunk.append(HTML_PLAN.format_map(plan))
+            if count % WRITE_CHUNK_PLANS == 0:
+                md.write("".join(md_chunk))
+                html_out.write("".join(html_chunk))
+                md_chunk.clear()
+                html_chunk.clear()
+        md.write("".join(md_chunk))
+        html_out.write("".join(html_chunk))
+
+        md.write(MD_FOOTER.format_map(self.status))
+        html_out.write(HTML_FOOTER.format_map(self.status))
+        message.append(WA_FOOTER.format_map(self.status))
+        return "".join(message)
+
+    def _render_rolling(self, md, html_out, message: List[str]):
+        """قسم الأداء التراكمي: المحفظة في الصيغ الثلاث، والخطط في Markdown وHTML فقط"""
+        portfolio = rolling_fields(dict(self.rolling_data['portfolio'], as_of=self.rolling_data['as_of']))
+        md.write(MD_ROLLING_HEADER.format_map(portfolio))
+        html_out.write(HTML_ROLLING_HEADER.format_map(portfolio))
+        message.append(WA_ROLLING.format_map(portfolio))
+
+        if isinstance(md, _NullWriter) and isinstance(html_out, _NullWriter):
+            return
+        md_chunk: List[str] = []
+        html_chunk: List[str] = []
+        for count, (plan_id, figures) in enumerate(self.rolling_data['plans'].items(), 1):
+            plan = rolling_fields(dict(figures, plan_id=plan_id))
+            md_chunk.append(MD_ROLLING_PLAN.format_map(plan))
+            plan["name"] = html.escape(str(plan["name"]))
+            plan["plan_id"] = html.escape(str(plan_id))
+            html_chunk.append(HTML_ROLLING_PLAN.format_map(plan))
+            if count % WRITE_CHUNK_PLANS == 0:
+                md.write("".join(md_chunk))
+                html_out.write("".join(html_chunk))
+                md_chunk.clear()
+                html_chunk.clear()
+        md.write("".join(md_chunk))
+        html_out.write("".join(html_chunk) + HTML_TABLE_END)
@@ -0,0 +1,413 @@
+#!/usr/bin/env python3
+"""
+الاحتفاظ بملفات التقارير والتحليلات وضغطها
+تبقى الملفات الحديثة كما هي (30 يوماً افتراضياً)، وتُجمع الأقدم منها في أرشيف مضغوط لكل شهر
+مع فهرس (manifest) لكل أرشيف يسمح باسترجاع أي ملف واحد بدون فك الأرشيف كاملاً
+"""
+
+import os
+import re
+import sys
+import json
+import zlib
+import shutil
+import fnmatch
+import hashlib
+import logging
+import zipfile
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+RETENTION_CONFIG_FILE = "/home/ubuntu/bitfufu_retention.json"
+RETENTION_ARCHIVE_DIR = "/home/ubuntu/bitfufu_archive"
+
+DEFAULT_KEEP_DAYS = 30
+
+# السياسات الافتراضية: (الاسم، المجلد، أنماط أسماء الملفات)
+DEFAULT_POLICIES = [
+    {"name": "reports", "directory": "/home/ubuntu/bitfufu_reports",
+     "patterns": ["bitfufu_report_*.md", "bitfufu_report_*.html", "bitfufu_report_*.pdf"]},
+    {"name": "analyses", "directory": "/home/ubuntu",
+     "patterns": ["roi_analysis_*.json"]},
+    {"name": "metrics", "directory": "/home/ubuntu/bitfufu_metrics",
+     "patterns": ["run_*.json"]},
+]
+
+# تاريخ الملف من اسمه (bitfufu_report_20251007_160500.md) وإلا من وقت التعديل
+_NAME_DATE_RE = re.compile(r'_(\d{8})_(\d{6})')
+
+_READ_CHUNK = 1024 * 1024
+
+
+def _file_date(entry: os.DirEntry) -> datetime:
+    match = _NAME_DATE_RE.search(entry.name)
+    if match:
+        try:
+            return datetime.strptime(match.group(1) + match.group(2), "%Y%m%d%H%M%S")
+        except ValueError:
+            pass
+    return datetime.fromtimestamp(entry.stat().st_mtime)
+
+
+def _sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(_READ_CHUNK), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _member_sha256(archive: zipfile.ZipFile, name: str) -> str:
+    digest = hashlib.sha256()
+    with archive.open(name) as f:
+        for chunk in iter(lambda: f.read(_READ_CHUNK), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _compressed_size(path: str) -> int:
+    """حجم الملف بعد الضغط (نفس ضغط ZIP_DEFLATED) بدون كتابة أي شيء"""
+    compressor = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, -15)
+    size = 0
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(_READ_CHUNK), b""):
+            size += len(compressor.compress(chunk))
+    return size + len(compressor.flush())
+
+
+def _write_json(path: str, data: Dict):
+    tmp_file = f"{path}.tmp"
+    with open(tmp_file, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_file, path)
+
+
+class RetentionPolicy:
+    """سياسة احتفاظ لمجموعة ملفات في مجلد واحد"""
+
+    def __init__(self, name: str, directory: str, patterns: List[str],
+                 keep_days: int = DEFAULT_KEEP_DAYS, archive: bool = True,
+                 archive_keep_days: Optional[int] = None):
+        self.name = name
+        self.directory = directory
+        self.patterns = patterns
+        # الملفات الأحدث من keep_days تبقى كما هي
+        self.keep_days = keep_days
+        # archive=False: حذف الملفات القديمة بدلاً من أرشفتها
+        self.archive = archive
+        # حذف الأرشيفات الشهرية الأقدم من هذه المدة (None: الاحتفاظ بها دائماً)
+        self.archive_keep_days = archive_keep_days
+
+    @classmethod
+    def from_dict(cls, data: Dict, default_keep_days: int = DEFAULT_KEEP_DAYS) -> 'RetentionPolicy':
+        return cls(
+            name=data["name"],
+            directory=data["directory"],
+            patterns=data.get("patterns", ["*"]),
+            keep_days=data.get("keep_days", default_keep_days),
+            archive=data.get("archive", True),
+            archive_keep_days=data.get("archive_keep_days")
+        )
+
+    def matches(self, name: str) -> bool:
+        return any(fnmatch.fnmatch(name, pattern) for pattern in self.patterns)
+
+
+class RetentionEngine:
+    """تطبيق سياسات الاحتفاظ: أرشفة شهرية مضغوطة مع فهرس، أو حذف، مع وضع التجربة"""
+
+    def __init__(self, policies: Optional[List[RetentionPolicy]] = None,
+                 archive_dir: str = RETENTION_ARCHIVE_DIR,
+                 clock: Optional[Callable[[], datetime]] = None):
+        self.policies = policies if policies is not None else [
+            RetentionPolicy.from_dict(policy) for policy in DEFAULT_POLICIES
+        ]
+        self.archive_dir = archive_dir
+        self.clock = clock or datetime.now
+
+    @classmethod
+    def from_config(cls, config: Optional[Dict] = None, **kwargs) -> 'RetentionEngine':
+        """من إعداد بصيغة {"archive_dir", "keep_days", "policies": [...]} (الافتراضي لما لم يُحدد)"""
+        config = config or {}
+        keep_days = config.get("keep_days", DEFAULT_KEEP_DAYS)
+        policies = [
+            RetentionPolicy.from_dict(policy, keep_days)
+            for policy in config.get("policies", DEFAULT_POLICIES)
+        ]
+        return cls(policies, config.get("archive_dir", RETENTION_ARCHIVE_DIR), **kwargs)
+
+    @classmethod
+    def load(cls, config_file: str = RETENTION_CONFIG_FILE, **kwargs) -> 'RetentionEngine':
+        """من ملف الإعداد إن وجد، وإلا السياسات الافتراضية"""
+        config = {}
+        if os.path.exists(config_file):
+            with open(config_file, 'r', encoding='utf-8') as f:
+                config = json.load(f)
+        return cls.from_config(config, **kwargs)
+
+    # ------------------------------------------------------------------
+    # التطبيق
+    # ------------------------------------------------------------------
+
+    def _expired_files(self, policy: RetentionPolicy) -> Dict[str, List[Dict]]:
+        """الملفات الأقدم من مدة الاحتفاظ مجمعة حسب الشهر"""
+        cutoff = self.clock() - timedelta(days=policy.keep_days)
+        by_month: Dict[str, List[Dict]] = {}
+        if not os.path.isdir(policy.directory):
+            return by_month
+        for entry in os.scandir(policy.directory):
+            if not entry.is_file() or not policy.matches(entry.name):
+                continue
+            file_date = _file_date(entry)
+            if file_date >= cutoff:
+                continue
+            by_month.setdefault(file_date.strftime("%Y-%m"), []).append({
+                "name": entry.name,
+                "path": entry.path,
+                "size": entry.stat().st_size,
+                "modified": file_date.isoformat()
+            })
+        return by_month
+
+    def run(self, dry_run: bool = False) -> Dict:
+        """تطبيق جميع السياسات، ويعيد ما تم (أو ما سيتم في وضع التجربة) والمساحة المستعادة"""
+        stats = {"dry_run": dry_run, "files": 0, "bytes": 0, "archived_bytes": 0,
+                 "reclaimed_bytes": 0, "policies": {}}
+        for policy in self.policies:
+            try:
+                policy_stats = self._apply_policy(policy, dry_run)
+            except Exception as e:
+                logger.error(f"خطأ في تطبيق سياسة الاحتفاظ {policy.name}: {str(e)}")
+                policy_stats = {"error": str(e)}
+            stats["policies"][policy.name] = policy_stats
+            for key in ("files", "bytes", "archived_bytes", "reclaimed_bytes"):
+                stats[key] += policy_stats.get(key, 0)
+
+        logger.info(
+            f"{'(تجربة) ' if dry_run else ''}الاحتفاظ: {stats['files']} ملف، "
+            f"المساحة المستعادة {stats['reclaimed_bytes'] / 1024 / 1024:.2f}MB"
+        )
+        return stats
+
+    def _apply_policy(self, policy: RetentionPolicy, dry_run: bool) -> Dict:
+        stats = {"files": 0, "bytes": 0, "archived_bytes": 0, "reclaimed_bytes": 0,
+                 "archives": [], "deleted_archives": []}
+        for month, files in sorted(self._expired_files(policy).items()):
+            size = sum(item["size"] for item in files)
+            if not policy.archive:
+                archived = 0
+                if not dry_run:
+                    for item in files:
+                        os.remove(item["path"])
+            elif dry_run:
+                archived = sum(_compressed_size(item["path"]) for item in files)
+            else:
+                archived = self._archive_month(policy, month, files)
+            stats["files"] += len(files)
+            stats["bytes"] += size
+            stats["archived_bytes"] += archived
+            stats["reclaimed_bytes"] += size - archived
+            if policy.archive:
+                stats["archives"].append(self._archive_path(policy.name, month))
+
+        if policy.archive_keep_days is not None:
+            stats["deleted_archives"] = self._expire_archives(policy, dry_run)
+            stats["reclaimed_bytes"] += sum(item["size"] for item in stats["deleted_archives"])
+        return stats
+
+    def _archive_path(self, policy_name: str, month: str) -> str:
+        return os.path.join(self.archive_dir, f"{policy_name}_{month}.zip")
+
+    def _manifest_path(self, archive_path: str) -> str:
+        return archive_path[:-len(".zip")] + ".manifest.json"
+
+    def _load_manifest(self, archive_path: str, policy_name: str, month: str) -> Dict:
+        manifest_path = self._manifest_path(archive_path)
+        if os.path.exists(manifest_path):
+            with open(manifest_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        return {"archive": os.path.basename(archive_path), "policy": policy_name,
+                "month": month, "files": {}}
+
+    def _archive_month(self, policy: RetentionPolicy, month: str, files: List[Dict]) -> int:
+        """إضافة ملفات شهر إلى أرشيفه ثم حذفها، ويعيد الحجم المضاف إلى الأرشيف
+
+        يُكتب الأرشيف في نسخة مؤقتة ويُتحقق من كل ملف فيه قبل استبدال الأرشيف وتحديث الفهرس،
+        ولا تُحذف الملفات الأصلية إلا بعد ذلك
+        """
+        os.makedirs(self.archive_dir, exist_ok=True)
+        archive_path = self._archive_path(policy.name, month)
+        manifest = self._load_manifest(archive_path, policy.name, month)
+        tmp_path = f"{archive_path}.tmp"
+        if os.path.exists(archive_path):
+            shutil.copyfile(archive_path, tmp_path)
+
+        added: Dict[str, Dict] = {}
+        archived_files: List[str] = []
+        written_bytes = 0
+        try:
+            with zipfile.ZipFile(tmp_path, 'a', compression=zipfile.ZIP_DEFLATED) as archive:
+                members = set(archive.namelist())
+                for item in files:
+                    name = item["name"]
+                    digest = _sha256(item["path"])
+                    if name in members:
+                        # مؤرشف سابقاً (مثلاً انقطع تشغيل سابق قبل حذف الأصل)
+                        if _member_sha256(archive, name) != digest:
+                            logger.warning(f"يوجد ملف مختلف بنفس الاسم في {archive_path}: {name} - تم تخطيه")
+                            continue
+                    else:
+                        archive.write(item["path"], arcname=name)
+                        written_bytes += archive.getinfo(name).compress_size
+                    info = archive.getinfo(name)
+                    added[name] = {
+                        "size": info.file_size,
+                        "compressed_size": info.compress_size,
+                        "modified": item["modified"],
+                        "sha256": digest,
+                        "source": item["path"]
+                    }
+                    archived_files.append(item["path"])
+
+            # التحقق من الأرشيف قبل حذف الأصول
+            with zipfile.ZipFile(tmp_path, 'r') as archive:
+                for name, entry in added.items():
+                    if _member_sha256(archive, name) != entry["sha256"]:
+                        raise IOError(f"فشل التحقق من {name} في الأرشيف")
+
+            os.replace(tmp_path, archive_path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+        manifest["files"].update(added)
+        manifest["updated_at"] = self.clock().isoformat()
+        _write_json(self._manifest_path(archive_path), manifest)
+        for path in archived_files:
+            os.remove(path)
+
+        logger.info(f"تمت أرشفة {len(added)} ملف في {archive_path}")
+        return written_bytes
+
+    def _expire_archives(self, policy: RetentionPolicy, dry_run: bool) -> List[Dict]:
+        """حذف الأرشيفات الشهرية (مع فهارسها) التي انتهت مدة الاحتفاظ بها"""
+        cutoff = (self.clock() - timedelta(days=policy.archive_keep_days)).strftime("%Y-%m")
+        expired = []
+        for manifest in self.list_archives(policy.name):
+            if manifest["month"] >= cutoff:
+                continue
+            archive_path = os.path.join(self.archive_dir, manifest["archive"])
+            size = os.path.getsize(archive_path) if os.path.exists(archive_path) else 0
+            expired.append({"archive": archive_path, "size": size})
+            if not dry_run:
+                for path in (archive_path, self._manifest_path(archive_path)):
+                    if os.path.exists(path):
+                        os.remove(path)
+        return expired
+
+    # ------------------------------------------------------------------
+    # الاسترجاع
+    # ------------------------------------------------------------------
+
+    def list_archives(self, policy_name: Optional[str] = None) -> List[Dict]:
+        """فهارس الأرشيفات (واحد لكل سياسة وشهر) مرتبة حسب الشهر"""
+        manifests = []
+        if not os.path.isdir(self.archive_dir):
+            return manifests
+        for entry in os.scandir(self.archive_dir):
+            if not entry.name.endswith(".manifest.json"):
+                continue
+            if policy_name and not entry.name.startswith(f"{policy_name}_"):
+                continue
+            with open(entry.path, 'r', encoding='utf-8') as f:
+                manifests.append(json.load(f))
+        return sorted(manifests, key=lambda manifest: (manifest["month"], manifest["policy"]))
+
+    def find(self, name: str) -> Optional[Dict]:
+        """موقع ملف مؤرشف: {"archive", "name", ...بيانات الفهرس}، أو None
+
+        الشهر يُعرف من تاريخ اسم الملف فيُقرأ فهرس واحد فقط، وإلا يُبحث في جميع الفهارس
+        """
+        match = _NAME_DATE_RE.search(name)
+        if match:
+            month = f"{match.group(1)[:4]}-{match.group(1)[4:6]}"
+            for policy in self.policies:
+                if not policy.matches(name):
+                    continue
+                archive_path = self._archive_path(policy.name, month)
+                manifest_path = self._manifest_path(archive_path)
+                if os.path.exists(manifest_path):
+                    with open(manifest_path, 'r', encoding='utf-8') as f:
+                        entry = json.load(f)["files"].get(name)
+                    if entry:
+                        return dict(entry, archive=archive_path, name=name)
+
+        for manifest in self.list_archives():
+            entry = manifest["files"].get(name)
+            if entry:
+                return dict(entry, archive=os.path.join(self.archive_dir, manifest["archive"]), name=name)
+        return None
+
+    def retrieve(self, name: str, output_dir: Optional[str] = None) -> Optional[str]:
+        """استخراج ملف واحد من أرشيفه (الافتراضي: مكانه الأصلي)، ويعيد مساره"""
+        try:
+            entry = self.find(name)
+            if entry is None:
+                logger.warning(f"الملف غير موجود في الأرشيفات: {name}")
+                return None
+            target = os.path.join(output_dir, name) if output_dir else entry["source"]
+            os.makedirs(os.path.dirname(target) or ".", exist_ok=True)
+            with zipfile.ZipFile(entry["archive"], 'r') as archive, \
+                    archive.open(name) as source, open(target, 'wb') as f:
+                shutil.copyfileobj(source, f, _READ_CHUNK)
+            logger.info(f"تم استرجاع {name} من {entry['archive']}")
+            return target
+        except Exception as e:
+            logger.error(f"خطأ في استرجاع {name}: {str(e)}")
+            return None
+
+
+def main():
+    """الاحتفاظ: bitfufu_retention.py run [--dry-run] | get <اسم الملف> [--output DIR] | list [سياسة]"""
+    args = sys.argv[1:]
+    if not args or args[0] not in ("run", "get", "list"):
+        print("الاستخدام: python3 bitfufu_retention.py run [--dry-run] [--config FILE]")
+        print("          python3 bitfufu_retention.py get <اسم الملف> [--output DIR]")
+        print("          python3 bitfufu_retention.py list [السياسة]")
+        sys.exit(1)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    config_file = args[args.index("--config") + 1] if "--config" in args else RETENTION_CONFIG_FILE
+    engine = RetentionEngine.load(config_file)
+
+    if args[0] == "run":
+        stats = engine.run(dry_run="--dry-run" in args)
+        for name, policy_stats in stats["policies"].items():
+            if "error" in policy_stats:
+                print(f"❌ {name}: {policy_stats['error']}")
+                continue
+            print(f"{name}: {policy_stats['files']} ملف ({policy_stats['bytes'] / 1024 / 1024:.2f}MB) ← "
+                  f"{policy_stats['archived_bytes'] / 1024 / 1024:.2f}MB في الأرشيف، "
+                  f"{len(policy_stats['deleted_archives'])} أرشيف منتهي")
+        label = "المساحة التي ستُستعاد" if stats["dry_run"] else "المساحة المستعادة"
+        print(f"{'🔍' if stats['dry_run'] else '✅'} {label}: {stats['reclaimed_bytes'] / 1024 / 1024:.2f}MB")
+        sys.exit(0 if all("error" not in s for s in stats["policies"].values()) else 1)
+
+    if args[0] == "get":
+        if len(args) < 2:
+            print("الاستخدام: python3 bitfufu_retention.py get <اسم الملف> [--output DIR]")
+            sys.exit(1)
+        output_dir = args[args.index("--output") + 1] if "--output" in args else None
+        path = engine.retrieve(args[1], output_dir)
+        print(f"✅ {path}" if path else f"❌ لم يتم العثور على {args[1]}")
+        sys.exit(0 if path else 1)
+
+    for manifest in engine.list_archives(args[1] if len(args) > 1 else None):
+        size = sum(entry["size"] for entry in manifest["files"].values())
+        print(f"{manifest['archive']}: {len(manifest['files'])} ملف ({size / 1024 / 1024:.2f}MB)")
+
+
+if __name__ == "__main__":
+    main()
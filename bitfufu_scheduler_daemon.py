@@ -0,0 +1,369 @@
+#!/usr/bin/env python3
+"""
+خدمة الجدولة الدائمة لنظام مراقبة BitFuFu
+تبقى العملية تعمل وتنفذ التقارير حسب جداول بتوقيت محلي، مع تعويض التشغيلات الفائتة
+والحفاظ على الاعتمادات وعميل Gmail والسجل جاهزة بين التشغيلات
+"""
+
+import os
+import sys
+import json
+import argparse
+import fcntl
+import signal
+import logging
+import threading
+from datetime import datetime, date, time as dt_time, timedelta, timezone
+from typing import Callable, Dict, List, Optional
+from zoneinfo import ZoneInfo
+
+from bitfufu_whatsapp_automation import BitFuFuAutomation, run_lock
+from bitfufu_accounts import load_accounts
+from bitfufu_retention import RetentionEngine
+
+logger = logging.getLogger(__name__)
+
+SCHEDULER_CONFIG_FILE = "/home/ubuntu/bitfufu_scheduler.json"
+SCHEDULER_STATE_FILE = "/home/ubuntu/bitfufu_scheduler_state.json"
+
+# قفل الخدمة نفسها: نسخة واحدة فقط من الخدمة تعمل
+DAEMON_LOCK_FILE = "/home/ubuntu/bitfufu_scheduler.lock"
+
+DEFAULT_TIMEZONE = "Asia/Dubai"
+
+# تعويض التشغيل الفائت فقط إذا لم يمر عليه أكثر من هذه المدة
+DEFAULT_CATCH_UP_HOURS = 12
+
+# مهلة إعادة محاولة تشغيل فاشل (ضمن مدة التعويض)
+RETRY_DELAY_MINUTES = 15
+
+# أقصى مدة انتظار قبل إعادة فحص الجداول (لاكتشاف تغير ساعة النظام أو الإسبات)
+MAX_SLEEP_SECONDS = 60
+
+# مفتاح آخر تطبيق لسياسات الاحتفاظ في ملف الحالة
+RETENTION_STATE_KEY = "_retention"
+
+WEEKDAYS = ["mon", "tue", "wed", "thu", "fri", "sat", "sun"]
+
+
+class Schedule:
+    """جدول تشغيل يومي في وقت محلي محدد، واختيارياً في أيام معينة من الأسبوع"""
+
+    def __init__(self, name: str, at: str, tz: str = DEFAULT_TIMEZONE,
+                 weekdays: Optional[List[str]] = None,
+                 whatsapp_recipients: Optional[List[str]] = None):
+        hour, minute = (int(part) for part in at.split(":"))
+        self.name = name
+        self.at = dt_time(hour, minute)
+        self.tz = ZoneInfo(tz)
+        self.weekdays = {WEEKDAYS.index(day.lower()[:3]) for day in weekdays} if weekdays else None
+        # مستلمون خاصون بهذا الجدول (الافتراضي: مستلمو ملف الإعداد)
+        self.whatsapp_recipients = whatsapp_recipients
+
+    @classmethod
+    def from_dict(cls, data: Dict, default_tz: str = DEFAULT_TIMEZONE) -> 'Schedule':
+        return cls(
+            name=data["name"],
+            at=data["time"],
+            tz=data.get("timezone", default_tz),
+            weekdays=data.get("weekdays"),
+            whatsapp_recipients=data.get("whatsapp_recipients")
+        )
+
+    def _slot(self, day: date) -> Optional[datetime]:
+        """موعد التشغيل في يوم محلي معين (بتوقيت UTC)، أو None إذا لم يكن يوم تشغيل"""
+        if self.weekdays is not None and day.weekday() not in self.weekdays:
+            return None
+        # zoneinfo يعالج التوقيت الصيفي: الوقت غير الموجود يُزاح والمكرر يُؤخذ أوله
+        return datetime.combine(day, self.at, tzinfo=self.tz).astimezone(timezone.utc)
+
+    def last_slot(self, now: datetime) -> Optional[datetime]:
+        """آخر موعد تشغيل في أو قبل الآن"""
+        today = now.astimezone(self.tz).date()
+        for days_back in range(8):
+            slot = self._slot(today - timedelta(days=days_back))
+            if slot is not None and slot <= now:
+                return slot
+        return None
+
+    def next_slot(self, now: datetime) -> Optional[datetime]:
+        """أول موعد تشغيل بعد الآن"""
+        today = now.astimezone(self.tz).date()
+        for days_ahead in range(8):
+            slot = self._slot(today + timedelta(days=days_ahead))
+            if slot is not None and slot > now:
+                return slot
+        return None
+
+
+class SchedulerConfig:
+    """إعدادات خدمة الجدولة من ملف JSON"""
+
+    def __init__(self, schedules: List[Schedule], whatsapp_recipients: Optional[List[str]] = None,
+                 incremental_sync: bool = True, accounts_file: Optional[str] = None,
+                 catch_up_hours: float = DEFAULT_CATCH_UP_HOURS, retention=None):
+        self.schedules = schedules
+        self.whatsapp_recipients = whatsapp_recipients or []
+        self.incremental_sync = incremental_sync
+        self.accounts_file = accounts_file
+        self.catch_up = timedelta(hours=catch_up_hours)
+        # سياسات الاحتفاظ بعد التشغيل: True (ملف bitfufu_retention.json أو الافتراضي)، إعداد مباشر، أو تعطيل
+        self.retention = retention
+
+    @classmethod
+    def load(cls, config_file: str = SCHEDULER_CONFIG_FILE) -> 'SchedulerConfig':
+        with open(config_file, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+
+        default_tz = data.get("timezone", DEFAULT_TIMEZONE)
+        schedules = [Schedule.from_dict(entry, default_tz) for entry in data.get("schedules", [])]
+        if not schedules:
+            raise ValueError("لا توجد جداول في ملف الإعداد")
+        names = [schedule.name for schedule in schedules]
+        if len(set(names)) != len(names):
+            raise ValueError("أسماء الجداول مكررة في ملف الإعداد")
+
+        return cls(
+            schedules=schedules,
+            whatsapp_recipients=data.get("whatsapp_recipients"),
+            incremental_sync=data.get("incremental_sync", True),
+            accounts_file=data.get("accounts_file"),
+            catch_up_hours=data.get("catch_up_hours", DEFAULT_CATCH_UP_HOURS),
+            retention=data.get("retention", True)
+        )
+
+
+class BitFuFuSchedulerDaemon:
+    """تنفيذ الجداول داخل عملية واحدة دائمة"""
+
+    def __init__(self, config: SchedulerConfig, state_file: str = SCHEDULER_STATE_FILE,
+                 automation_factory: Optional[Callable[[], BitFuFuAutomation]] = None,
+                 clock: Optional[Callable[[], datetime]] = None):
+        self.config = config
+        self.state_file = state_file
+        self.automation_factory = automation_factory or self._create_automation
+        self.clock = clock or (lambda: datetime.now(timezone.utc))
+        self.state = self._load_state()
+        self._automation = None
+        self._stop = threading.Event()
+
+    def _create_automation(self) -> BitFuFuAutomation:
+        accounts = load_accounts(self.config.accounts_file) if self.config.accounts_file else None
+        return BitFuFuAutomation(
+            whatsapp_recipients=self.config.whatsapp_recipients,
+            incremental_sync=self.config.incremental_sync,
+            accounts=accounts
+        )
+
+    @property
+    def automation(self) -> BitFuFuAutomation:
+        """كائن التشغيل الدافئ: مراقب Gmail (الاعتمادات والعميل) والسجل يبقون بين التشغيلات"""
+        if self._automation is None:
+            self._automation = self.automation_factory()
+        return self._automation
+
+    # ------------------------------------------------------------------
+    # حالة الجداول
+    # ------------------------------------------------------------------
+
+    def _load_state(self) -> Dict:
+        try:
+            if os.path.exists(self.state_file):
+                with open(self.state_file, 'r', encoding='utf-8') as f:
+                    return json.load(f)
+            return {}
+        except Exception as e:
+            logger.error(f"خطأ في تحميل حالة الجدولة: {str(e)}")
+            return {}
+
+    def _save_state(self):
+        try:
+            tmp_file = f"{self.state_file}.tmp"
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump(self.state, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_file, self.state_file)
+        except Exception as e:
+            logger.error(f"خطأ في حفظ حالة الجدولة: {str(e)}")
+
+    def _last_run(self, schedule: Schedule) -> Optional[datetime]:
+        value = self.state.get(schedule.name, {}).get("last_slot")
+        return datetime.fromisoformat(value) if value else None
+
+    def due_slot(self, schedule: Schedule, now: datetime) -> Optional[datetime]:
+        """الموعد المستحق الآن، مع تعويض موعد فائت واحد خلال مدة التعويض
+
+        عند أول تشغيل للخدمة تُسجل نقطة البداية فقط بدون تعويض المواعيد السابقة،
+        والمواعيد الفائتة المتعددة تُدمج في تشغيل واحد (التزامن التدريجي يجلب كل الجديد)
+        """
+        slot = schedule.last_slot(now)
+        if slot is None:
+            return None
+
+        last_run = self._last_run(schedule)
+        if last_run is None:
+            self.state[schedule.name] = {"last_slot": slot.isoformat(), "status": "baseline"}
+            self._save_state()
+            return None
+
+        if slot <= last_run:
+            return None
+        if now - slot > self.config.catch_up:
+            logger.warning(f"[{schedule.name}] تم تخطي موعد فائت أقدم من مدة التعويض: {slot.isoformat()}")
+            self.state[schedule.name] = {"last_slot": slot.isoformat(), "status": "skipped"}
+            self._save_state()
+            return None
+
+        # تشغيل فاشل لهذا الموعد: يُعاد بعد مهلة إعادة المحاولة
+        retry_at = self.state.get(schedule.name, {}).get("retry_at")
+        if retry_at and now < datetime.fromisoformat(retry_at):
+            return None
+        return slot
+
+    # ------------------------------------------------------------------
+    # التشغيل
+    # ------------------------------------------------------------------
+
+    def run_schedule(self, schedule: Schedule, slot: datetime) -> bool:
+        """تنفيذ تشغيل واحد مع قفل يمنع التداخل مع أي تشغيل آخر"""
+        now = self.clock()
+        if now - slot > timedelta(minutes=5):
+            logger.info(f"[{schedule.name}] تعويض موعد فائت: {slot.astimezone(schedule.tz).isoformat()}")
+
+        with run_lock() as acquired:
+            if not acquired:
+                logger.warning(f"[{schedule.name}] يوجد تشغيل آخر جارٍ - سيُعاد المحاولة لاحقاً")
+                return False
+
+            automation = self.automation
+            automation.whatsapp_recipients = schedule.whatsapp_recipients or self.config.whatsapp_recipients
+            # نقطة تزامن مستقلة لكل جدول: بريد اليوم جديد لكل جدول حتى لو عالجه جدول آخر،
+            # وسجل الرسائل المعالجة يمنع تكرار الإرسال لمن وصله التقرير
+            automation.sync_scope = schedule.name
+            try:
+                success = automation.run_complete_automation()
+            except Exception as e:
+                logger.error(f"[{schedule.name}] خطأ في التشغيل: {str(e)}")
+                success = False
+            self.apply_retention()
+
+        finished_at = self.clock()
+        if success:
+            self.state[schedule.name] = {
+                "last_slot": slot.isoformat(),
+                "status": "succeeded",
+                "finished_at": finished_at.isoformat()
+            }
+        else:
+            # لا يتقدم last_slot عند الفشل حتى يُعاد التشغيل خلال مدة التعويض
+            previous = self.state.get(schedule.name, {})
+            attempts = previous.get("attempts", 0) + 1 if previous.get("failed_slot") == slot.isoformat() else 1
+            retry_at = finished_at + timedelta(minutes=RETRY_DELAY_MINUTES)
+            self.state[schedule.name] = {
+                "last_slot": previous.get("last_slot"),
+                "status": "failed",
+                "failed_slot": slot.isoformat(),
+                "attempts": attempts,
+                "retry_at": retry_at.isoformat(),
+                "finished_at": finished_at.isoformat()
+            }
+            logger.warning(f"[{schedule.name}] فشل التشغيل (المحاولة {attempts}) - "
+                           f"إعادة المحاولة بعد {retry_at.astimezone(schedule.tz).isoformat()}")
+        self._save_state()
+        return success
+
+    def apply_retention(self):
+        """أرشفة التقارير والتحليلات القديمة بعد التشغيل (مرة واحدة في اليوم، داخل قفل التشغيل)"""
+        retention = self.config.retention
+        if not retention:
+            return
+        today = self.clock().date().isoformat()
+        if self.state.get(RETENTION_STATE_KEY, {}).get("last_day") == today:
+            return
+        try:
+            engine = RetentionEngine.from_config(retention) if isinstance(retention, dict) else RetentionEngine.load()
+            stats = engine.run()
+        except Exception as e:
+            logger.error(f"خطأ في تطبيق سياسات الاحتفاظ: {str(e)}")
+            return
+        self.state[RETENTION_STATE_KEY] = {
+            "last_day": today,
+            "files": stats["files"],
+            "reclaimed_bytes": stats["reclaimed_bytes"]
+        }
+
+    def run_pending(self) -> Dict[str, bool]:
+        """تنفيذ الجداول المستحقة الآن"""
+        results = {}
+        for schedule in self.config.schedules:
+            if self._stop.is_set():
+                break
+            slot = self.due_slot(schedule, self.clock())
+            if slot is not None:
+                results[schedule.name] = self.run_schedule(schedule, slot)
+        return results
+
+    def seconds_until_next(self) -> float:
+        now = self.clock()
+        upcoming = [slot for slot in (s.next_slot(now) for s in self.config.schedules) if slot]
+        if not upcoming:
+            return MAX_SLEEP_SECONDS
+        return max(0.0, min((min(upcoming) - now).total_seconds(), MAX_SLEEP_SECONDS))
+
+    def run_forever(self):
+        """حلقة الخدمة حتى الإيقاف"""
+        for schedule in self.config.schedules:
+            next_slot = schedule.next_slot(self.clock())
+            if next_slot:
+                logger.info(f"[{schedule.name}] الموعد التالي: {next_slot.astimezone(schedule.tz).isoformat()}")
+
+        while not self._stop.is_set():
+            self.run_pending()
+            self._stop.wait(self.seconds_until_next())
+
+        logger.info("تم إيقاف خدمة الجدولة")
+
+    def stop(self):
+        self._stop.set()
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="خدمة الجدولة الدائمة لنظام مراقبة BitFuFu")
+    parser.add_argument("--config", default=SCHEDULER_CONFIG_FILE,
+                        help="مسار ملف إعداد الجدولة")
+    parser.add_argument("--once", action="store_true",
+                        help="تنفيذ الجداول المستحقة ثم الخروج")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None):
+    """تشغيل خدمة الجدولة: --config ملف الإعداد، --once لتنفيذ المستحق ثم الخروج"""
+    args = parse_args(argv)
+    config_file = args.config
+
+    try:
+        config = SchedulerConfig.load(config_file)
+    except Exception as e:
+        logger.error(f"خطأ في ملف إعداد الجدولة {config_file}: {str(e)}")
+        sys.exit(1)
+
+    daemon = BitFuFuSchedulerDaemon(config)
+    if args.once:
+        results = daemon.run_pending()
+        sys.exit(0 if all(results.values()) else 1)
+
+    # نسخة واحدة فقط من الخدمة (يمكن تشغيلها من cron دورياً لإعادة التشغيل بعد توقفها)
+    lock = open(DAEMON_LOCK_FILE, 'a')
+    try:
+        fcntl.flock(lock.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        logger.info("خدمة الجدولة تعمل بالفعل")
+        sys.exit(0)
+
+    signal.signal(signal.SIGTERM, lambda *_: daemon.stop())
+    signal.signal(signal.SIGINT, lambda *_: daemon.stop())
+    logger.info(f"بدء خدمة الجدولة ({len(config.schedules)} جدول)")
+    daemon.run_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""
+منفذ مراحل متزامن على شكل رسم اعتماديات
+كل مرحلة تبدأ فور نجاح المراحل التي تعتمد عليها، والمراحل المستقلة تعمل معاً على خيوط
+"""
+
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+# حالات المراحل
+PENDING = "pending"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+
+class Stage:
+    """مرحلة واحدة: دالة تستقبل نتائج اعتمادياتها وتعيد نتيجتها
+
+    تُعتبر المرحلة فاشلة إذا رفعت استثناء أو أعادت None/False.
+    فشل مرحلة مطلوبة (required) يلغي جميع المراحل التي لم تبدأ بعد،
+    أما فشل مرحلة اختيارية فيمرر None لمن يعتمد عليها.
+    المراحل الجارية لا تُقاطع قسراً، لكن on_cancel يُستدعى لها لتتوقف بنفسها
+    """
+
+    def __init__(self, name: str, func: Callable[[Dict[str, Any]], Any],
+                 deps: Sequence[str] = (), required: bool = True,
+                 on_cancel: Optional[Callable[[], None]] = None):
+        self.name = name
+        self.func = func
+        self.deps = list(deps)
+        self.required = required
+        # يُستدعى إذا أُلغيت العملية أثناء تنفيذ المرحلة (لإيقافها مبكراً)
+        self.on_cancel = on_cancel
+        self.status = PENDING
+        self.result = None
+        self.error: Optional[str] = None
+        self.started = None
+        self.finished = None
+
+
+class StageScheduler:
+    """تنفيذ المراحل حسب الاعتماديات مع الإلغاء عند الفشل"""
+
+    def __init__(self, max_workers: int = 4):
+        self.max_workers = max_workers
+        self.stages: Dict[str, Stage] = {}
+        # يُضبط عند فشل مرحلة مطلوبة؛ يمكن للمراحل الطويلة مراقبته للتوقف مبكراً
+        self.cancel_event = threading.Event()
+        # إنهاء مبكر ناجح طلبته إحدى المراحل (لا يوجد عمل للمراحل التالية)
+        self.stopped = False
+        self._start = None
+
+    def add(self, name: str, func: Callable[[Dict[str, Any]], Any],
+            deps: Sequence[str] = (), required: bool = True,
+            on_cancel: Optional[Callable[[], None]] = None) -> Stage:
+        """إضافة مرحلة؛ يجب إضافة الاعتماديات قبلها (مما يمنع الحلقات)"""
+        if name in self.stages:
+            raise ValueError(f"مرحلة مكررة: {name}")
+        for dep in deps:
+            if dep not in self.stages:
+                raise ValueError(f"اعتمادية غير معروفة للمرحلة {name}: {dep}")
+        stage = Stage(name, func, deps, required, on_cancel)
+        self.stages[name] = stage
+        return stage
+
+    def cancel(self):
+        """إلغاء المراحل التي لم تبدأ بعد وإبلاغ المراحل الجارية"""
+        if self.cancel_event.is_set():
+            return
+        self.cancel_event.set()
+        for stage in self.stages.values():
+            if stage.status == RUNNING and stage.on_cancel:
+                try:
+                    stage.on_cancel()
+                except Exception as e:
+                    logger.warning(f"خطأ في إيقاف المرحلة {stage.name}: {str(e)}")
+
+    def stop(self):
+        """إنهاء مبكر ناجح من داخل مرحلة: تُلغى المراحل المتبقية دون اعتبار ذلك فشلاً"""
+        logger.info("إنهاء مبكر: لا حاجة لبقية المراحل")
+        self.stopped = True
+        self.cancel()
+
+    # ------------------------------------------------------------------
+    # التنفيذ
+    # ------------------------------------------------------------------
+
+    def _is_blocked(self, stage: Stage) -> bool:
+        return any(
+            self.stages[dep].status in (FAILED, CANCELLED) and self.stages[dep].required
+            for dep in stage.deps
+        )
+
+    def _is_ready(self, stage: Stage) -> bool:
+        return all(self.stages[dep].status in (SUCCEEDED, FAILED) for dep in stage.deps)
+
+    def _run_stage(self, stage: Stage):
+        inputs = {dep: self.stages[dep].result for dep in stage.deps}
+        return stage.func(inputs)
+
+    def _finish(self, stage: Stage, status: str, result: Any = None, error: Optional[str] = None):
+        stage.status = status
+        stage.result = result
+        stage.error = error
+        stage.finished = time.perf_counter()
+
+        if status == FAILED:
+            logger.error(f"فشلت المرحلة {stage.name}" + (f": {error}" if error else ""))
+            if stage.required:
+                self.cancel()
+        elif status == CANCELLED:
+            logger.info(f"تم إلغاء المرحلة {stage.name}")
+
+    def _collect(self, stage: Stage, future):
+        error = future.exception()
+        if error is not None:
+            self._finish(stage, FAILED, error=str(error))
+            return
+        result = future.result()
+        if result is None or result is False:
+            self._finish(stage, FAILED, result)
+        else:
+            self._finish(stage, SUCCEEDED, result)
+
+    def run(self) -> bool:
+        """تنفيذ جميع المراحل، ويعيد True إذا نجحت كل المراحل المطلوبة
+        (أو عند الإنهاء المبكر عبر stop إذا لم تفشل أي مرحلة مطلوبة)"""
+        self._start = time.perf_counter()
+        pending = [stage for stage in self.stages.values() if stage.status == PENDING]
+        running = {}
+
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="stage") as pool:
+            while pending or running:
+                for stage in list(pending):
+                    if self.cancel_event.is_set() or self._is_blocked(stage):
+                        pending.remove(stage)
+                        self._finish(stage, CANCELLED)
+                    elif self._is_ready(stage):
+                        pending.remove(stage)
+                        stage.status = RUNNING
+                        stage.started = time.perf_counter()
+                        running[pool.submit(self._run_stage, stage)] = stage
+
+                if not running:
+                    break
+
+                # انتظار اكتمال أي مرحلة جارية ثم جدولة ما أصبح جاهزاً
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    self._collect(running.pop(future), future)
+
+        if self.stopped:
+            return not any(stage.status == FAILED for stage in self.stages.values() if stage.required)
+        return all(stage.status == SUCCEEDED for stage in self.stages.values() if stage.required)
+
+    # ------------------------------------------------------------------
+    # النتائج
+    # ------------------------------------------------------------------
+
+    def result(self, name: str) -> Any:
+        return self.stages[name].result
+
+    def status(self, name: str) -> str:
+        return self.stages[name].status
+
+    def timeline(self) -> List[Dict]:
+        """بداية ونهاية كل مرحلة بالنسبة لبداية التنفيذ"""
+        timeline = []
+        for stage in self.stages.values():
+            entry = {"stage": stage.name, "status": stage.status}
+            if stage.started is not None and self._start is not None:
+                entry["start"] = round(stage.started - self._start, 3)
+                entry["seconds"] = round((stage.finished or stage.started) - stage.started, 3)
+            if stage.error:
+                entry["error"] = stage.error
+            timeline.append(entry)
+        return timeline
+
+    def wall_seconds(self) -> float:
+        """الزمن الكلي من بداية التنفيذ حتى انتهاء آخر مرحلة"""
+        finished = [stage.finished for stage in self.stages.values() if stage.finished]
+        if not finished or self._start is None:
+            return 0.0
+        return max(finished) - self._start
@@ -7,13 +7,32 @@
 import os
 import sys
 import json
+import time
+import fcntl
+import hashlib
+import io
 import logging
+from contextlib import contextmanager
 from datetime import datetime
-from typing import Dict, Optional
+from typing import Callable, Dict, List, Optional
 
-# استيراد الوحدات المساعدة
+_MODULE_START = time.perf_counter()
+
+# استيراد الوحدات المساعدة (وحدات WhatsApp تُستورد عند مرحلة الإرسال فقط)
 from gmail_bitfufu_monitor import BitFuFuGmailMonitor, ROIAnalyzer, MINING_PLANS
-from whatsapp_web_sender import WhatsAppWebSender
+from roi_history_store import ROIHistoryStore, snapshot_timestamp
+from roi_rolling_analytics import update_rolling_analytics, invalidate_rolling_analytics
+from bitfufu_stage_scheduler import StageScheduler
+from bitfufu_metrics import REGISTRY, METRICS_DIR
+from bitfufu_gmail_client import open_connections
+from bitfufu_report_writer import ReportWriter, classify_roi
+from bitfufu_accounts import (
+    BitFuFuAccount, MultiAccountCollector, combine_email_data, summarize_accounts, backlog_rounds,
+    load_accounts, ACCOUNTS_FILE, MAX_ACCOUNT_WORKERS, ACCOUNT_SEPARATOR
+)
+
+# زمن استيراد الوحدات المساعدة عند تحميل هذه الوحدة
+MODULE_IMPORT_SECONDS = time.perf_counter() - _MODULE_START
 
 # إعداد السجلات
 logging.basicConfig(
@@ -26,65 +45,287 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# قفل التشغيل: تشغيل واحد فقط في نفس الوقت (cron، يدوي، أو خدمة الجدولة)
+RUN_LOCK_FILE = "/home/ubuntu/bitfufu_run.lock"
+
+
+@contextmanager
+def run_lock(lock_file: str = RUN_LOCK_FILE):
+    """قفل fcntl غير حاجز؛ يعيد False إذا كان هناك تشغيل آخر جارٍ (يُحرر تلقائياً عند انتهاء العملية)"""
+    lock = open(lock_file, 'a')
+    try:
+        try:
+            fcntl.flock(lock.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            acquired = True
+        except OSError:
+            acquired = False
+        yield acquired
+    finally:
+        lock.close()
+
 
 class BitFuFuAutomation:
     """نظام المراقبة التلقائي المتكامل"""
     
-    def __init__(self, whatsapp_group_name: str = ""):
+    def __init__(self, whatsapp_group_name: str = "", incremental_sync: bool = False,
+                 whatsapp_recipients: Optional[List[str]] = None,
+                 gmail_monitor: Optional[BitFuFuGmailMonitor] = None,
+                 whatsapp_sender=None,
+                 history_store: Optional[ROIHistoryStore] = None,
+                 report_dir: str = "/home/ubuntu/bitfufu_reports",
+                 legacy_json_dir: Optional[str] = "/home/ubuntu",
+                 use_sender_daemon: bool = True,
+                 accounts: Optional[List[BitFuFuAccount]] = None,
+                 account_workers: int = MAX_ACCOUNT_WORKERS):
+        # يمكن تمرير مراقب Gmail ومرسل WhatsApp وسجل بديلة (مثل الكائنات الوهمية للاختبار)
         self.whatsapp_group_name = whatsapp_group_name
-        self.gmail_monitor = BitFuFuGmailMonitor()
-        self.whatsapp_sender = WhatsAppWebSender()
+        # قائمة المجموعات المستلمة (الافتراضي: المجموعة الواحدة المحددة)
+        self.whatsapp_recipients = whatsapp_recipients or (
+            [whatsapp_group_name] if whatsapp_group_name else []
+        )
+        self.whatsapp_results = []
+        self.incremental_sync = incremental_sync
+        self.gmail_monitor = gmail_monitor or BitFuFuGmailMonitor()
+        self._whatsapp_sender = whatsapp_sender
+        self.use_sender_daemon = use_sender_daemon
+        # وضع الحسابات المتعددة: تقرير واحد مدمج لجميع الحسابات
+        self.accounts = accounts or []
+        self.account_workers = account_workers
+        # يُنشأ مرة واحدة فتبقى مراقبات الحسابات دافئة بين التشغيلات في خدمة الجدولة
+        self.account_collector = None
+        # نطاق نقطة التزامن التدريجي (None: المشتركة)؛ خدمة الجدولة تستخدم نقطة لكل جدول
+        self.sync_scope: Optional[str] = None
+        self._pdf_renderer = None
+        # زمن كل مرحلة وعدد الوحدات التي حُمّلت خلالها
+        self.stage_timings: List[Dict] = []
+        self.scheduler = None
         self.analysis_data = None
         self.comparison_data = None
-        self.report_dir = "/home/ubuntu/bitfufu_reports"
+        # المؤشرات التراكمية والمتحركة (roi_rolling_analytics)
+        self.rolling_data = None
+        self.no_new_messages = False
+        # سجل الرسائل المعالجة: مفتاح الرسالة وبصمتها، ونتائج معالجة سابقة لنفس المحتوى
+        self.ledger_key = None
+        self.ledger_hash = None
+        self.ledger_entry = None
+        self.replaced_snapshot_id = None
+        self.snapshot_id = None
+        # رسائل جديدة أقدم من رسالة التقرير (بعد انقطاع التشغيل): تُحفظ لقطاتها قبلها بالترتيب
+        self.backlog: List[Dict] = []
+        # المستلمون الذين وصلهم تقرير رسالة هذا التشغيل (بما في ذلك التشغيلات السابقة)
+        self.sent_to: List[str] = []
+        self.report_dir = report_dir
+        # مجلد ملفات roi_analysis_*.json القديمة التي تُستورد للسجل مرة واحدة (None: بدون استيراد)
+        self.legacy_json_dir = legacy_json_dir
+        self.metrics_dir = METRICS_DIR
+        self.history_store = history_store or ROIHistoryStore()
         
         # إنشاء مجلد التقارير
         os.makedirs(self.report_dir, exist_ok=True)
     
+    @property
+    def whatsapp_sender(self):
+        """مرسل WhatsApp Web (يُنشأ عند أول استخدام)"""
+        if self._whatsapp_sender is None:
+            from whatsapp_web_sender import WhatsAppWebSender
+            self._whatsapp_sender = WhatsAppWebSender()
+        return self._whatsapp_sender
+    
+    @whatsapp_sender.setter
+    def whatsapp_sender(self, sender):
+        self._whatsapp_sender = sender
+    
+    def _run_stage(self, stage: str, func: Callable, *args):
+        """تنفيذ مرحلة مع تسجيل زمنها والوحدات المستوردة خلالها"""
+        modules_before = len(sys.modules)
+        start = time.perf_counter()
+        status = "failed"
+        try:
+            result = func(*args)
+            if result is not None and result is not False:
+                status = "succeeded"
+            return result
+        finally:
+            seconds = time.perf_counter() - start
+            self.stage_timings.append({
+                "stage": stage,
+                "seconds": round(seconds, 3),
+                "modules_loaded": len(sys.modules) - modules_before
+            })
+            REGISTRY.observe("stage_seconds", seconds, stage=stage)
+            REGISTRY.inc("stage_runs_total", stage=stage, status=status)
+    
+    def get_startup_report(self) -> Dict:
+        """تقرير زمن البدء: الاستيراد، كل مرحلة، وخطوات تشغيل المتصفح"""
+        browser_steps = []
+        if self._whatsapp_sender is not None and hasattr(self._whatsapp_sender, "get_step_timings"):
+            browser_steps = [
+                step for step in self._whatsapp_sender.get_step_timings()
+                if step["step"] in ("import_selenium", "resolve_chromedriver", "launch_browser")
+            ]
+        return {
+            "module_import_seconds": round(MODULE_IMPORT_SECONDS, 3),
+            "stages": [dict(stage) for stage in self.stage_timings],
+            "browser_steps": browser_steps,
+            "timeline": self.scheduler.timeline() if self.scheduler else [],
+            "wall_seconds": round(self.scheduler.wall_seconds(), 3) if self.scheduler else None
+        }
+    
+    def write_metrics(self) -> Dict[str, str]:
+        """حفظ مقاييس هذا التشغيل (Prometheus + JSON)"""
+        return REGISTRY.write_run(self.metrics_dir)
+    
+    def log_startup_report(self):
+        """عرض تقرير زمن البدء في السجل"""
+        report = self.get_startup_report()
+        logger.info(f"⏱ زمن استيراد الوحدات: {report['module_import_seconds']:.3f}s")
+        for stage in report["stages"]:
+            logger.info(f"⏱ {stage['stage']}: {stage['seconds']:.3f}s "
+                        f"({stage['modules_loaded']} وحدة محمّلة)")
+        for step in report["browser_steps"]:
+            logger.info(f"⏱   {step['step']}: {step['seconds']:.3f}s")
+        for entry in report["timeline"]:
+            if "start" in entry:
+                logger.info(f"⏱ [{entry['status']}] {entry['stage']}: "
+                            f"+{entry['start']:.3f}s → {entry['seconds']:.3f}s")
+        if report["wall_seconds"] is not None:
+            logger.info(f"⏱ الزمن الكلي: {report['wall_seconds']:.3f}s")
+    
     def run_complete_automation(self) -> bool:
-        """تشغيل العملية الكاملة"""
+        """تشغيل العملية الكاملة كرسم مراحل متزامن
+        
+        gmail ──► analysis ──┬─► report ─┬─► whatsapp
+                             └─► pdf ────┤
+        warm_browser ────────────────────┘
+        
+        (في التزامن التدريجي يبدأ warm_browser بعد gmail، ولا يعمل إذا لم يوجد بريد جديد)
+        """
+        REGISTRY.reset()
+        self._reset_run_state()
+        start = time.perf_counter()
+        outcome = "failed"
         try:
             logger.info("=" * 60)
             logger.info("بدء نظام مراقبة BitFuFu التلقائي")
             logger.info("=" * 60)
             
-            # المرحلة 1: جمع البيانات من Gmail
-            logger.info("\n[المرحلة 1/4] جمع البيانات من Gmail...")
-            email_data = self._collect_gmail_data()
-            if not email_data:
-                logger.error("فشل جمع البيانات من Gmail")
-                return False
+            self.scheduler = self._build_pipeline()
+            success = self.scheduler.run()
+            self._record_processed()
+            self._commit_sync_state()
             
-            # المرحلة 2: تحليل ROI
-            logger.info("\n[المرحلة 2/4] تحليل ROI والأداء المالي...")
-            if not self._analyze_roi(email_data):
-                logger.error("فشل تحليل ROI")
-                return False
+            # التزامن التدريجي بدون رسائل جديدة ليس فشلاً
+            if self.scheduler.stopped and self.no_new_messages:
+                logger.info("لا يوجد بريد Revenue Journal جديد - لا حاجة لإرسال تقرير")
+                outcome = "no_new_messages"
+                return True
             
-            # المرحلة 3: إنشاء التقرير
-            logger.info("\n[المرحلة 3/4] إنشاء التقرير المفصل...")
-            report_files = self._generate_report()
-            if not report_files:
-                logger.error("فشل إنشاء التقرير")
-                return False
-            
-            # المرحلة 4: إرسال عبر WhatsApp
-            logger.info("\n[المرحلة 4/4] إرسال التقرير عبر WhatsApp Web...")
-            if not self._send_whatsapp_report(report_files):
-                logger.error("فشل إرسال التقرير عبر WhatsApp")
+            if not success:
+                failed = [t["stage"] for t in self.scheduler.timeline() if t["status"] == "failed"]
+                logger.error(f"فشلت العملية في المراحل: {', '.join(failed)}")
                 return False
             
             logger.info("\n" + "=" * 60)
-            logger.info("✅ تم إكمال العملية بنجاح!")
+            logger.info(f"✅ تم إكمال العملية بنجاح! ({self.scheduler.wall_seconds():.2f}s)")
             logger.info("=" * 60)
+            outcome = "succeeded"
             return True
             
         except Exception as e:
             logger.error(f"خطأ في العملية التلقائية: {str(e)}")
             return False
+        finally:
+            # إغلاق متصفح تم تجهيزه مسبقاً إذا أُلغي الإرسال
+            if self._whatsapp_sender is not None:
+                self._whatsapp_sender.close_browser()
+            self.log_startup_report()
+            
+            REGISTRY.observe("run_seconds", time.perf_counter() - start)
+            REGISTRY.inc("runs_total", result=outcome)
+            REGISTRY.set_gauge("last_run_timestamp_seconds", time.time())
+            REGISTRY.set_gauge("gmail_http_connections", open_connections())
+            self.write_metrics()
+    
+    def _reset_run_state(self):
+        """مسح نتائج التشغيل السابق (عند إعادة استخدام نفس الكائن في خدمة الجدولة)"""
+        self.whatsapp_results = []
+        self.stage_timings = []
+        self.scheduler = None
+        self.analysis_data = None
+        self.comparison_data = None
+        self.rolling_data = None
+        self.no_new_messages = False
+        self.gmail_monitor.pending_sync_state = None
+        self.ledger_key = None
+        self.ledger_hash = None
+        self.ledger_entry = None
+        self.replaced_snapshot_id = None
+        self.snapshot_id = None
+        self.backlog = []
+        self.sent_to = []
+    
+    def _build_pipeline(self) -> StageScheduler:
+        """بناء رسم المراحل: تجهيز المتصفح مع Gmail، وPDF مع رسالة WhatsApp"""
+        scheduler = StageScheduler(max_workers=4)
+        report_paths = self._new_report_paths()
+        
+        def stage(name: str, func: Callable, args: Callable[[Dict], tuple] = lambda inputs: ()):
+            def run(inputs):
+                logger.info(f"\n[{name}] بدء المرحلة...")
+                return self._run_stage(name, func, *args(inputs))
+            return run
+        
+        def collect_gmail() -> Optional[Dict]:
+            # التزامن التدريجي بدون رسائل جديدة: نهاية ناجحة للتشغيل بدون تقرير
+            email_data = self._collect_gmail_data()
+            if email_data is None and self.no_new_messages:
+                scheduler.stop()
+                return {}
+            return email_data
+        
+        scheduler.add("gmail", stage("gmail", collect_gmail))
+        
+        whatsapp_deps = ["report", "pdf"]
+        if self._should_warm_browser():
+            # فشل التجهيز المسبق لا يوقف العملية، فالإرسال يفتح جلسة جديدة عند الحاجة؛
+            # وعند الإلغاء يُغلق المتصفح فتتوقف انتظارات تسجيل الدخول فوراً.
+            # في التزامن التدريجي قد لا يوجد بريد جديد، فلا يُفتح المتصفح قبل وصول البيانات
+            scheduler.add("warm_browser", stage("warm_browser", self._warm_browser),
+                          deps=["gmail"] if self.incremental_sync else [],
+                          required=False, on_cancel=self.whatsapp_sender.abort_session)
+            whatsapp_deps.append("warm_browser")
+        
+        scheduler.add("analysis", stage("analysis", self._analyze_roi,
+                                        lambda inputs: (inputs["gmail"],)), deps=["gmail"])
+        # Markdown وHTML ونص WhatsApp في مرور واحد
+        scheduler.add("report", stage("report", self._write_reports,
+                                      lambda inputs: (report_paths,)), deps=["analysis"])
+        scheduler.add("pdf", stage("pdf", self._render_pdf_file,
+                                   lambda inputs: (report_paths["pdf"],)),
+                      deps=["analysis"], required=False)
+        scheduler.add("whatsapp", stage("whatsapp", self._send_whatsapp_report, lambda inputs: (
+            {"markdown": inputs["report"]["markdown"], "pdf": inputs["pdf"]}, inputs["report"]["message"]
+        )), deps=whatsapp_deps)
+        
+        return scheduler
+    
+    def _should_warm_browser(self) -> bool:
+        """تجهيز المتصفح مسبقاً فقط عند الإرسال بدون الخدمة الدائمة"""
+        if not self.whatsapp_recipients:
+            return False
+        if not self.use_sender_daemon:
+            return True
+        from whatsapp_sender_daemon import SOCKET_PATH
+        return not os.path.exists(SOCKET_PATH)
+    
+    def _warm_browser(self) -> bool:
+        """فتح جلسة WhatsApp Web وتسجيل الدخول أثناء جلب بيانات Gmail"""
+        return self.whatsapp_sender.start_session(headless=False)
     
     def _collect_gmail_data(self) -> Optional[Dict]:
         """جمع البيانات من Gmail"""
+        if self.accounts:
+            return self._collect_accounts_data()
         try:
             # المصادقة مع Gmail
             if not self.gmail_monitor.authenticate_gmail():
@@ -94,11 +335,31 @@ class BitFuFuAutomation:
                 return self._get_mock_data()
             
             # البحث عن آخر بريد
-            message = self.gmail_monitor.search_latest_bitfufu_email()
+            if self.incremental_sync:
+                # التزامن التدريجي: الرسائل الجديدة فقط منذ آخر تشغيل
+                # (نقطة التزامن تُحفظ في _commit_sync_state بعد الإرسال لجميع المستلمين)
+                messages = self.gmail_monitor.sync_bitfufu_emails(commit=False, scope=self.sync_scope)
+                if not messages:
+                    logger.info("لا توجد رسائل جديدة منذ آخر تشغيل")
+                    self.no_new_messages = True
+                    return None
+                # التقرير للأحدث، والأقدم منها تُحفظ في السجل أولاً (تُعتبر مُعالجة مع نقطة التزامن)
+                message = messages[0]
+                for older in reversed(messages[1:]):
+                    self._queue_backlog(older['id'], self.gmail_monitor.message_fingerprint(older),
+                                        lambda older=older: self.gmail_monitor.extract_email_data(older))
+            else:
+                message = self.gmail_monitor.search_latest_bitfufu_email()
             if not message:
                 logger.warning("لم يتم العثور على رسائل، استخدام بيانات تجريبية")
                 return self._get_mock_data()
             
+            # رسالة تمت معالجتها سابقاً بنفس المحتوى: إعادة استخدام اللقطة بدون تحليل
+            if message.get('id'):
+                snapshot = self._check_processed(message['id'], self.gmail_monitor.message_fingerprint(message))
+                if snapshot:
+                    return snapshot
+            
             # استخراج البيانات
             email_data = self.gmail_monitor.extract_email_data(message)
             if not email_data:
@@ -112,12 +373,182 @@ class BitFuFuAutomation:
             logger.error(f"خطأ في جمع البيانات: {str(e)}")
             return self._get_mock_data()
     
+    def _collect_accounts_data(self) -> Optional[Dict]:
+        """جمع بيانات جميع الحسابات بالتوازي ودمجها (بدون بيانات تجريبية)"""
+        try:
+            if self.account_collector is None:
+                self.account_collector = MultiAccountCollector(
+                    self.accounts,
+                    max_workers=self.account_workers,
+                    incremental_sync=self.incremental_sync
+                )
+            self.account_collector.sync_scope = self.sync_scope
+            account_data = self.account_collector.collect()
+            
+            statuses = self.account_collector.statuses
+            if not account_data:
+                if self.incremental_sync and all(
+                    statuses.get(account.name) == "no_new_messages" for account in self.accounts
+                ):
+                    self.no_new_messages = True
+                    logger.info("لا توجد رسائل جديدة لأي حساب منذ آخر تشغيل")
+                    return None
+                logger.error("لم يتم جمع بيانات أي حساب")
+                return None
+            
+            failed = [name for name, status in statuses.items() if status == "failed"]
+            if failed:
+                logger.warning(f"التقرير لا يشمل الحسابات: {', '.join(failed)}")
+            
+            # أيام سابقة لم تُعالج (بعد انقطاع التشغيل): لقطة مدمجة لكل يوم قبل التقرير
+            for entries in backlog_rounds(self.account_collector.messages):
+                ledger = self._accounts_ledger_key(entries)
+                if ledger:
+                    self._queue_backlog(*ledger, lambda entries=entries: combine_email_data(
+                        {name: entry["email_data"] for name, entry in entries.items()}
+                    ))
+            
+            ledger = self._accounts_ledger_key({
+                name: self.account_collector.fingerprints.get(name, {}) for name in account_data
+            })
+            if ledger:
+                snapshot = self._check_processed(*ledger)
+                if snapshot:
+                    return snapshot
+            
+            email_data = combine_email_data(account_data)
+            logger.info(f"✓ تم جمع بيانات {len(email_data['plans'])} خطط من {len(account_data)} حساب")
+            return email_data
+            
+        except Exception as e:
+            logger.error(f"خطأ في جمع بيانات الحسابات: {str(e)}")
+            return None
+    
+    @staticmethod
+    def _accounts_ledger_key(fingerprints: Dict[str, Dict]):
+        """مفتاح سجل المعالجة وبصمة المحتوى لرسائل عدة حسابات مدمجة، أو None"""
+        names = sorted(fingerprints)
+        if not all(fingerprints[name].get("message_id") for name in names):
+            return None
+        message_key = ",".join(f"{name}{ACCOUNT_SEPARATOR}{fingerprints[name]['message_id']}" for name in names)
+        content_hash = hashlib.sha256("".join(
+            fingerprints[name]["content_hash"] for name in names
+        ).encode('utf-8')).hexdigest()
+        return message_key, content_hash
+    
+    def _queue_backlog(self, message_key: str, content_hash: str, extract: Callable[[], Optional[Dict]]):
+        """إضافة رسالة أقدم من رسالة التقرير إلى ما يُحفظ في السجل (إن لم تُحفظ بنفس المحتوى سابقاً)"""
+        entry = self.history_store.get_processed(message_key)
+        if entry and entry["snapshot_id"] is not None and entry["content_hash"] == content_hash:
+            return
+        email_data = extract()
+        if not email_data:
+            logger.warning(f"تعذر استخراج بيانات الرسالة {message_key} - لن تُحفظ في السجل")
+            return
+        self.backlog.append({
+            "message_key": message_key,
+            "content_hash": content_hash,
+            "email_data": email_data,
+            "replaced": entry["snapshot_id"] if entry else None
+        })
+    
+    def _check_processed(self, message_key: str, content_hash: str) -> Optional[Dict]:
+        """اللقطة المحفوظة إذا عولجت نفس الرسالة بنفس المحتوى سابقاً، وإلا None"""
+        self.ledger_key = message_key
+        self.ledger_hash = content_hash
+        entry = self.history_store.get_processed(message_key)
+        if not entry or entry["snapshot_id"] is None:
+            return None
+        
+        if entry["content_hash"] != content_hash:
+            # تغير المحتوى أو إعداد الخطط: تحليل جديد يحل محل اللقطة السابقة لنفس الرسالة
+            logger.info(f"تغير محتوى الرسالة {message_key} منذ آخر معالجة - إعادة التحليل")
+            self.replaced_snapshot_id = entry["snapshot_id"]
+            return None
+        
+        snapshot = self.history_store.get_snapshot(entry["snapshot_id"])
+        if not snapshot:
+            return None
+        snapshot.pop("snapshot_id", None)
+        
+        self.ledger_entry = entry
+        REGISTRY.inc("processed_messages_reused_total")
+        logger.info(f"✓ تمت معالجة الرسالة {message_key} سابقاً ({entry['processed_at']}) - إعادة استخدام النتائج")
+        
+        # لا حاجة لتجهيز المتصفح إذا أُرسل التقرير لجميع المستلمين
+        if not self._pending_recipients() and self._whatsapp_sender is not None:
+            self._whatsapp_sender.abort_session()
+        return snapshot
+    
+    def _cached_result(self, name: str):
+        """نتيجة مرحلة من معالجة سابقة لنفس الرسالة (الملفات فقط إذا كانت لا تزال موجودة)"""
+        if not self.ledger_entry:
+            return None
+        value = self.ledger_entry["results"].get(name)
+        if name in ("markdown", "html", "pdf") and value and not os.path.exists(value):
+            return None
+        return value
+    
+    def _pending_recipients(self) -> List[str]:
+        """المستلمون الذين لم يصلهم تقرير هذه الرسالة بعد"""
+        sent_to = set(self.ledger_entry["results"].get("sent_to", [])) if self.ledger_entry else set()
+        return [contact for contact in self.whatsapp_recipients if contact not in sent_to]
+    
+    def _record_processed(self):
+        """حفظ نتائج معالجة الرسالة لإعادة استخدامها إذا أُعيد التشغيل لنفس الرسالة"""
+        if not self.ledger_key or self.snapshot_id is None:
+            return
+        
+        previous = self.ledger_entry["results"] if self.ledger_entry else {}
+        report = self.scheduler.result("report") or {}
+        sent_to = set(previous.get("sent_to", []))
+        sent_to.update(result["contact"] for result in self.whatsapp_results if result["success"])
+        # نتيجة غير معروفة: يُتحقق من المحادثة قبل الإرسال في التشغيل التالي
+        attempted = {result["contact"] for result in self.whatsapp_results}
+        unconfirmed = set(previous.get("unconfirmed", [])) - attempted
+        unconfirmed.update(result["contact"] for result in self.whatsapp_results if result.get("unknown"))
+        results = {
+            "comparison": self.comparison_data or {},
+            "rolling": self.rolling_data or {},
+            "markdown": report.get("markdown") or previous.get("markdown"),
+            "html": report.get("html") or previous.get("html"),
+            "pdf": self.scheduler.result("pdf") or previous.get("pdf"),
+            "message": report.get("message") or previous.get("message"),
+            "sent_to": sorted(sent_to),
+            "unconfirmed": sorted(unconfirmed - sent_to)
+        }
+        self.sent_to = results["sent_to"]
+        self.history_store.record_processed(self.ledger_key, self.ledger_hash, self.snapshot_id, results)
+    
+    def _commit_sync_state(self):
+        """حفظ نقطة التزامن التدريجي فقط بعد حفظ التحليل وإرسال التقرير لجميع المستلمين
+        
+        وإلا تُجلب نفس الرسالة في التشغيل التالي، فيُعاد استخدام تحليلها من السجل
+        ويُرسل التقرير للمستلمين الذين لم يصلهم فقط
+        """
+        if not self.incremental_sync:
+            return
+        if not self.no_new_messages:
+            if self.snapshot_id is None:
+                return
+            pending = [contact for contact in self.whatsapp_recipients if contact not in self.sent_to]
+            if pending:
+                logger.warning(f"لم يصل التقرير إلى: {', '.join(pending)} - ستُعاد معالجة الرسالة في التشغيل التالي")
+                return
+        if self.accounts:
+            if self.account_collector is not None:
+                self.account_collector.commit_sync_state()
+        else:
+            self.gmail_monitor.commit_sync_state()
+    
     def _get_mock_data(self) -> Dict:
-        """الحصول على بيانات تجريبية للاختبار"""
+        """الحصول على بيانات تجريبية للاختبار (mock: لا تُحفظ في السجل ولا تُرسل)"""
         logger.info("استخدام بيانات تجريبية")
         return {
+            "mock": True,
             "timestamp": datetime.now().isoformat(),
             "btc_price": 62500.0,
+            "btc_price_source": "default",
             "plans": {
                 "95936": {"name": "خطة 3 أيام", "cost": 63.00, "duration": 3, "btc_earned": 0.00015},
                 "95735": {"name": "خطة 10 أيام", "cost": 63.00, "duration": 10, "btc_earned": 0.00048},
@@ -129,6 +560,22 @@ class BitFuFuAutomation:
     def _analyze_roi(self, email_data: Dict) -> bool:
         """تحليل ROI"""
         try:
+            # استيراد ملفات roi_analysis_*.json القديمة عند أول استخدام للسجل
+            if self.legacy_json_dir and self.history_store.ensure_legacy_import(self.legacy_json_dir):
+                invalidate_rolling_analytics(self.history_store)
+            
+            # رسائل الأيام السابقة أولاً حتى تبقى اللقطات والمؤشرات المتحركة بالترتيب الزمني
+            self._ingest_backlog()
+            
+            # رسالة معالجة سابقاً: اللقطة والمقارنة محفوظتان
+            if self.ledger_entry:
+                self.analysis_data = email_data
+                self.snapshot_id = self.ledger_entry["snapshot_id"]
+                self.comparison_data = self.ledger_entry["results"].get("comparison") or {}
+                self.rolling_data = self.ledger_entry["results"].get("rolling") or {}
+                logger.info(f"✓ إعادة استخدام التحليل المحفوظ: لقطة #{self.snapshot_id}")
+                return True
+            
             # إنشاء المحلل
             analyzer = ROIAnalyzer(email_data)
             
@@ -137,20 +584,27 @@ class BitFuFuAutomation:
             if not self.analysis_data:
                 return False
             
+            # البيانات التجريبية (عند تعذر الوصول إلى Gmail) لا تدخل السجل ولا المؤشرات المتحركة
+            if self.analysis_data.get("mock"):
+                logger.warning("تحليل بيانات تجريبية - لن يُحفظ في السجل")
+                self.comparison_data = {}
+                self.rolling_data = {}
+                return True
+            
+            # اللقطة السابقة من السجل المفهرس (قبل حفظ اللقطة الحالية)
+            previous = self.history_store.previous_snapshot(snapshot_timestamp(self.analysis_data))
+            
             # حفظ التحليل
-            analysis_file = analyzer.save_analysis()
-            logger.info(f"✓ تم حفظ التحليل: {analysis_file}")
+            self.snapshot_id = self._save_analysis(self.analysis_data, self.replaced_snapshot_id)
+            logger.info(f"✓ تم حفظ التحليل في السجل: لقطة #{self.snapshot_id}")
+            
+            # تحديث المؤشرات التراكمية باللقطة الجديدة فقط
+            self.rolling_data = update_rolling_analytics(self.history_store, self.analysis_data)
             
             # مقارنة مع اليوم السابق
-            previous_files = sorted([
-                f for f in os.listdir("/home/ubuntu")
-                if f.startswith("roi_analysis_") and f.endswith(".json")
-            ])
-            
-            if len(previous_files) > 1:
-                previous_file = f"/home/ubuntu/{previous_files[-2]}"
-                self.comparison_data = analyzer.compare_with_previous(previous_file)
-                logger.info(f"✓ تمت المقارنة مع: {previous_files[-2]}")
+            if previous:
+                self.comparison_data = analyzer.compare_with_snapshot(previous)
+                logger.info(f"✓ تمت المقارنة مع لقطة: {previous['timestamp']}")
             else:
                 logger.info("لا يوجد تحليل سابق للمقارنة")
                 self.comparison_data = {}
@@ -167,237 +621,174 @@ class BitFuFuAutomation:
             logger.error(f"خطأ في تحليل ROI: {str(e)}")
             return False
     
+    def _save_analysis(self, analysis: Dict, replaced: Optional[int] = None) -> Optional[int]:
+        """حفظ لقطة التحليل؛ تحليل جديد لرسالة محفوظة مسبقاً يحل محل لقطتها بدلاً من تكرارها"""
+        if replaced is None and analysis.get("message_id"):
+            replaced = self.history_store.snapshot_id_for_message(analysis["message_id"])
+        if replaced is not None:
+            self.history_store.delete_snapshot(replaced)
+        return self.history_store.save_snapshot(analysis)
+    
+    def _ingest_backlog(self):
+        """حفظ لقطات الرسائل الأقدم من رسالة التقرير وتحديث المؤشرات بكل منها (بدون تقرير)"""
+        for entry in self.backlog:
+            analysis = ROIAnalyzer(entry["email_data"]).calculate_roi()
+            if not analysis:
+                continue
+            snapshot_id = self._save_analysis(analysis, entry["replaced"])
+            if snapshot_id is None:
+                continue
+            rolling = update_rolling_analytics(self.history_store, analysis)
+            self.history_store.record_processed(entry["message_key"], entry["content_hash"], snapshot_id,
+                                                {"rolling": rolling, "sent_to": []})
+            logger.info(f"✓ تم حفظ رسالة سابقة في السجل: {entry['message_key']} (لقطة #{snapshot_id})")
+        self.backlog = []
+    
+    def _new_report_paths(self) -> Dict[str, str]:
+        """مسارات ملفات التقرير لهذا التشغيل"""
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        return {
+            "markdown": f"{self.report_dir}/bitfufu_report_{timestamp}.md",
+            "html": f"{self.report_dir}/bitfufu_report_{timestamp}.html",
+            "pdf": f"{self.report_dir}/bitfufu_report_{timestamp}.pdf"
+        }
+    
     def _generate_report(self) -> Optional[Dict]:
         """إنشاء التقرير المفصل"""
         try:
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            md_file = f"{self.report_dir}/bitfufu_report_{timestamp}.md"
-            pdf_file = f"{self.report_dir}/bitfufu_report_{timestamp}.pdf"
-            
-            # إنشاء محتوى التقرير
-            report_content = self._create_report_content()
-            
-            # حفظ التقرير Markdown
-            with open(md_file, 'w', encoding='utf-8') as f:
-                f.write(report_content)
-            logger.info(f"✓ تم إنشاء التقرير: {md_file}")
-            
-            # تحويل إلى PDF
-            try:
-                import subprocess
-                result = subprocess.run(
-                    ['manus-md-to-pdf', md_file, pdf_file],
-                    capture_output=True,
-                    text=True,
-                    timeout=30
-                )
-                if result.returncode == 0 and os.path.exists(pdf_file):
-                    logger.info(f"✓ تم تحويل التقرير إلى PDF: {pdf_file}")
-                else:
-                    logger.warning(f"فشل تحويل PDF: {result.stderr}")
-                    pdf_file = None
-            except Exception as e:
-                logger.warning(f"خطأ في تحويل PDF: {str(e)}")
-                pdf_file = None
-            
-            return {
-                "markdown": md_file,
-                "pdf": pdf_file
-            }
+            report_files = self._new_report_paths()
+            
+            reports = self._write_reports(report_files)
+            if not reports:
+                return None
+            
+            report_files.update(markdown=reports["markdown"], html=reports["html"])
+            report_files["pdf"] = self._render_pdf_file(report_files["pdf"])
+            return report_files
             
         except Exception as e:
             logger.error(f"خطأ في إنشاء التقرير: {str(e)}")
             return None
     
-    def _create_report_content(self) -> str:
-        """إنشاء محتوى التقرير"""
-        now = datetime.now()
-        date_str = now.strftime("%d/%m/%Y")
-        time_str = now.strftime("%H:%M:%S")
-        
-        # تحديد الحالة والرموز
-        roi = self.analysis_data['overall_roi']
-        if roi > 5:
-            status_emoji = "🟢 📈"
-            status_text = "أداء ممتاز"
-            recommendation = "مواصلة الاستثمار في الخطط ذات الأداء العالي"
-        elif roi > 0:
-            status_emoji = "🟡 📊"
-            status_text = "أداء مقبول"
-            recommendation = "مراجعة استراتيجية الاستثمار وتحسين التوزيع"
-        elif roi > -50:
-            status_emoji = "🔴 📉"
-            status_text = "خسائر محدودة"
-            recommendation = "مراقبة دقيقة للأداء وإعادة تقييم الخطط"
-        else:
-            status_emoji = "🚨 ⚠️"
-            status_text = "خسائر كبيرة"
-            recommendation = "إعادة تقييم فوري للاستراتيجية الاستثمارية"
-        
-        # بناء التقرير
-        report = f"""# تقرير BitFuFu اليومي {status_emoji}
-
-**التاريخ:** {date_str}  
-**الوقت:** {time_str}  
-**الحالة:** {status_text}
-
----
-
-## 💰 الملخص المالي
-
-| المؤشر | القيمة |
-|--------|--------|
-| إجمالي الاستثمار | ${self.analysis_data['total_investment']:,.2f} |
-| إجمالي العوائد | ${self.analysis_data['total_returns']:,.2f} |
-| صافي الربح/الخسارة | ${self.analysis_data['total_profit_loss']:,.2f} |
-| العائد الإجمالي (ROI) | {self.analysis_data['overall_roi']:.2f}% |
-| سعر BTC الحالي | ${self.analysis_data['btc_price']:,.2f} |
-
----
-
-## 📊 مقارنة مع اليوم السابق
-
-"""
-        
-        if self.comparison_data:
-            roi_change = self.comparison_data.get('roi_change', 0)
-            pl_change = self.comparison_data.get('profit_loss_change', 0)
-            btc_change = self.comparison_data.get('btc_price_change', 0)
-            
-            roi_arrow = "📈" if roi_change > 0 else "📉" if roi_change < 0 else "➡️"
-            pl_arrow = "📈" if pl_change > 0 else "📉" if pl_change < 0 else "➡️"
-            btc_arrow = "📈" if btc_change > 0 else "📉" if btc_change < 0 else "➡️"
-            
-            report += f"""| المؤشر | التغيير |
-|--------|---------|
-| تغير ROI | {roi_arrow} {roi_change:+.2f}% |
-| تغير الربح/الخسارة | {pl_arrow} ${pl_change:+.2f} |
-| تغير سعر BTC | {btc_arrow} ${btc_change:+.2f} |
-"""
-        else:
-            report += "*لا توجد بيانات سابقة للمقارنة*\n"
-        
-        report += "\n---\n\n## 📈 تفاصيل الخطط\n\n"
-        
-        # تفاصيل كل خطة
-        for plan_id, plan_data in self.analysis_data['plans'].items():
-            roi_plan = plan_data['roi_percentage']
-            plan_emoji = "✅" if roi_plan > 0 else "⚠️" if roi_plan > -50 else "❌"
+    def _report_writer(self) -> ReportWriter:
+        accounts_summary = summarize_accounts(self.analysis_data) if self.accounts else []
+        return ReportWriter(self.analysis_data, self.comparison_data, accounts_summary,
+                            rolling_data=self.rolling_data)
+    
+    def _write_reports(self, report_paths: Dict[str, str]) -> Optional[Dict]:
+        """كتابة Markdown وHTML ونص WhatsApp؛ يعيد {"markdown", "html", "message"}"""
+        cached = {name: self._cached_result(name) for name in ("markdown", "html", "message")}
+        if all(cached.values()):
+            logger.info(f"✓ إعادة استخدام التقرير: {cached['markdown']}")
+            return cached
+        try:
+            message = self._report_writer().write_files(report_paths["markdown"], report_paths["html"])
+            logger.info(f"✓ تم إنشاء التقرير: {report_paths['markdown']}")
+            return {"markdown": report_paths["markdown"], "html": report_paths["html"], "message": message}
             
-            report += f"""### {plan_emoji} {plan_data['name']} (#{plan_id})
-
-| المؤشر | القيمة |
-|--------|--------|
-| التكلفة | ${plan_data['cost']:.2f} |
-| المدة | {plan_data['duration']} يوم |
-| BTC المكتسبة | {plan_data['btc_earned']:.8f} BTC |
-| العائد بالدولار | ${plan_data['usd_earned']:.2f} |
-| الربح/الخسارة | ${plan_data['profit_loss']:.2f} |
-| ROI | {plan_data['roi_percentage']:.2f}% |
-
-"""
-        
-        report += f"""---
-
-## 💡 التوصية
-
-**{recommendation}**
-
----
-
-## 📝 ملاحظات
-
-- هذا التقرير تم إنشاؤه تلقائياً بواسطة نظام مراقبة BitFuFu
-- البيانات مستخرجة من آخر بريد Revenue Journal
-- يتم تحديث التقرير يومياً في الساعة 16:05 بتوقيت أبوظبي
-
----
-
-*تم الإنشاء بواسطة نظام المراقبة التلقائي* 🤖
-"""
-        
-        return report
+        except Exception as e:
+            logger.error(f"خطأ في إنشاء التقرير: {str(e)}")
+            return None
+    
+    def _render_pdf_file(self, pdf_file: str) -> Optional[str]:
+        """إنشاء PDF؛ يعيد المسار أو None (يُرسل التقرير بدون مرفق)"""
+        cached = self._cached_result("pdf")
+        if cached:
+            logger.info(f"✓ إعادة استخدام التقرير PDF: {cached}")
+            return cached
+        if self._render_pdf(pdf_file):
+            logger.info(f"✓ تم إنشاء التقرير PDF: {pdf_file}")
+            return pdf_file
+        logger.warning("فشل إنشاء PDF، سيتم إرسال الرسالة بدون مرفق")
+        return None
+    
+    def _render_pdf(self, pdf_file: str) -> bool:
+        """رسم التقرير PDF داخل العملية (المحرك والخطوط تُجهز مرة واحدة)"""
+        try:
+            if self._pdf_renderer is None:
+                from bitfufu_pdf_report import BitFuFuPDFRenderer
+                self._pdf_renderer = BitFuFuPDFRenderer()
+            
+            _, status_text, recommendation = self._report_status()
+            return self._pdf_renderer.render(
+                self.analysis_data, self.comparison_data, pdf_file,
+                status_text=status_text, recommendation=recommendation
+            )
+        except Exception as e:
+            logger.warning(f"خطأ في إنشاء PDF: {str(e)}")
+            return False
+    
+    def _report_status(self):
+        """رمز الحالة ونصها والتوصية حسب ROI الإجمالي"""
+        status = classify_roi(self.analysis_data['overall_roi'])
+        return status["emoji"], status["text"], status["recommendation"]
+    
+    def _create_report_content(self) -> str:
+        """إنشاء محتوى التقرير (Markdown)"""
+        content = io.StringIO()
+        self._report_writer().render(content)
+        return content.getvalue()
     
     def _create_whatsapp_message(self) -> str:
         """إنشاء رسالة WhatsApp المختصرة"""
-        now = datetime.now()
-        date_str = now.strftime("%d/%m/%Y")
-        
-        # تحديد الحالة والرموز
-        roi = self.analysis_data['overall_roi']
-        if roi > 5:
-            status_emoji = "🟢 📈"
-        elif roi > 0:
-            status_emoji = "🟡 📊"
-        elif roi > -50:
-            status_emoji = "🔴 📉"
-        else:
-            status_emoji = "🚨 ⚠️"
-        
-        # بناء الرسالة
-        message = f"""🤖 *تقرير BitFuFu اليومي* {status_emoji}
-📅 التاريخ: {date_str}
-
-💰 *الملخص المالي:*
-• إجمالي الاستثمار: ${self.analysis_data['total_investment']:,.2f}
-• إجمالي العوائد: ${self.analysis_data['total_returns']:,.2f}
-• صافي الخسارة: ${self.analysis_data['total_profit_loss']:,.2f}
-• العائد الإجمالي: {self.analysis_data['overall_roi']:.2f}%"""
-        
-        # إضافة المقارنة
-        if self.comparison_data:
-            roi_change = self.comparison_data.get('roi_change', 0)
-            pl_change = self.comparison_data.get('profit_loss_change', 0)
-            
-            message += f"""
-
-📊 *مقارنة مع اليوم السابق:*
-• تغير ROI: {roi_change:+.2f}%
-• تغير الخسائر: ${pl_change:+.2f}"""
-        
-        # إضافة حالة الخطط
-        message += "\n\n📈 *حالة الخطط:*"
-        for plan_id, plan_data in self.analysis_data['plans'].items():
-            roi_plan = plan_data['roi_percentage']
-            plan_emoji = "✅" if roi_plan > 0 else "⚠️" if roi_plan > -50 else "❌"
-            message += f"\n• {plan_emoji} {plan_data['name']}: {roi_plan:.2f}%"
-        
-        # إضافة التوصية
-        if roi > 5:
-            recommendation = "مواصلة الاستثمار"
-        elif roi > 0:
-            recommendation = "مراجعة الاستراتيجية"
-        elif roi > -50:
-            recommendation = "مراقبة دقيقة"
-        else:
-            recommendation = "إعادة تقييم فوري"
-        
-        message += f"""
-
-💡 *التوصية:*
-{recommendation}
-
-📎 التقرير المفصل مرفق أعلاه"""
-        
-        return message
+        cached = self._cached_result("message")
+        if cached:
+            return cached
+        return self._report_writer().render()
     
-    def _send_whatsapp_report(self, report_files: Dict) -> bool:
+    def _send_whatsapp_report(self, report_files: Dict, message: Optional[str] = None) -> bool:
         """إرسال التقرير عبر WhatsApp"""
         try:
-            if not self.whatsapp_group_name:
+            if not self.whatsapp_recipients:
                 logger.error("لم يتم تحديد اسم مجموعة WhatsApp")
                 return False
             
-            # إنشاء الرسالة
-            message = self._create_whatsapp_message()
+            if self.analysis_data and self.analysis_data.get("mock"):
+                logger.error("لن يُرسل تقرير مبني على بيانات تجريبية (تعذر جلب بريد Revenue Journal)")
+                return False
             
-            # إرسال الرسالة مع الملف
+            # عند إعادة التشغيل لنفس الرسالة: المستلمون الذين لم يصلهم التقرير فقط
+            recipients = self._pending_recipients()
+            if not recipients:
+                logger.info("✓ تم إرسال تقرير هذه الرسالة سابقاً لجميع المستلمين")
+                self.whatsapp_results = []
+                return True
+            
+            # إنشاء الرسالة (إن لم تُجهز في مرحلة سابقة)
+            message = message or self._create_whatsapp_message()
             pdf_file = report_files.get('pdf')
-            success = self.whatsapp_sender.send_complete_message(
-                self.whatsapp_group_name,
-                message,
-                pdf_file
-            )
+            
+            # المستلمون بنتيجة غير معروفة في تشغيل سابق: التحقق من المحادثة قبل الإعادة
+            unconfirmed = set(self.ledger_entry["results"].get("unconfirmed", [])) if self.ledger_entry else set()
+            
+            # إرسال الرسالة مع الملف عبر الخدمة الدائمة إن كانت تعمل
+            self.whatsapp_results = []
+            if self.use_sender_daemon:
+                from whatsapp_sender_daemon import send_via_daemon
+                for contact_name in recipients:
+                    result = send_via_daemon(contact_name, message, pdf_file,
+                                             skip_if_sent=contact_name in unconfirmed)
+                    if result is None:
+                        break
+                    self.whatsapp_results.append(result)
+            
+            # والمستلمون الذين لم تصلهم الخدمة: متصفح واحد لهم جميعاً؛ من وصلت مهمته للخدمة
+            # لا يُعاد إرساله هنا حتى بنتيجة غير معروفة (قد تكون أُرسلت أو ما زالت في طابور الخدمة)
+            attempted = {result["contact"] for result in self.whatsapp_results}
+            remaining = [contact_name for contact_name in recipients if contact_name not in attempted]
+            if remaining:
+                self.whatsapp_results += self.whatsapp_sender.send_to_recipients([
+                    {"contact": contact_name, "message": message, "pdf_file": pdf_file,
+                     "skip_if_sent": contact_name in unconfirmed}
+                    for contact_name in remaining
+                ])
+            
+            for result in self.whatsapp_results:
+                if result.get("unknown"):
+                    logger.warning(f"نتيجة الإرسال إلى {result['contact']} غير معروفة - سيُتحقق منها في التشغيل التالي")
+                elif not result["success"]:
+                    logger.error(f"فشل الإرسال إلى: {result['contact']}")
+            success = all(r["success"] for r in self.whatsapp_results)
             
             if success:
                 logger.info("✓ تم إرسال التقرير عبر WhatsApp بنجاح")
@@ -417,8 +808,9 @@ def main():
     print("نظام مراقبة BitFuFu المتكامل مع WhatsApp Web")
     print("=" * 60 + "\n")
     
-    # طلب اسم المجموعة
-    group_name = input("أدخل اسم مجموعة WhatsApp (أو اتركه فارغاً للتخطي): ").strip()
+    # طلب اسم المجموعة (أو عدة مجموعات مفصولة بفواصل)
+    group_name = input("أدخل اسم مجموعة WhatsApp (أو عدة أسماء مفصولة بفواصل، أو اتركه فارغاً للتخطي): ").strip()
+    recipients = [name.strip() for name in group_name.split(",") if name.strip()]
     
     if not group_name:
         print("\n⚠️ تحذير: لن يتم إرسال التقرير عبر WhatsApp")
@@ -427,9 +819,30 @@ def main():
             print("تم الإلغاء")
             return
     
+    # وضع الحسابات المتعددة: --accounts [ملف الإعداد]
+    accounts = None
+    if "--accounts" in sys.argv:
+        index = sys.argv.index("--accounts") + 1
+        accounts_file = ACCOUNTS_FILE
+        if index < len(sys.argv) and not sys.argv[index].startswith("--"):
+            accounts_file = sys.argv[index]
+        accounts = load_accounts(accounts_file)
+        if not accounts:
+            print("❌ لم يتم تحميل أي حساب من ملف الإعداد")
+            sys.exit(1)
+    
     # إنشاء وتشغيل النظام
-    automation = BitFuFuAutomation(whatsapp_group_name=group_name)
-    success = automation.run_complete_automation()
+    automation = BitFuFuAutomation(
+        whatsapp_group_name=recipients[0] if recipients else "",
+        incremental_sync="--incremental" in sys.argv,
+        whatsapp_recipients=recipients,
+        accounts=accounts
+    )
+    with run_lock() as acquired:
+        if not acquired:
+            print("\n⚠️ يوجد تشغيل آخر جارٍ - تم التخطي")
+            sys.exit(1)
+        success = automation.run_complete_automation()
     
     if success:
         print("\n✅ تم إكمال العملية بنجاح!")
@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+"""
+سلسلة أسعار BTC/USD محلية من ملفات CSV
+تقدّر السعر في أي وقت بالاستيفاء الخطي بين أقرب نقطتين مع حفظ نتائج الاستعلامات المتكررة،
+وتعيد تقييم جميع لقطات سجل التحليلات بالأسعار الصحيحة في مرور واحد
+"""
+
+import os
+import sys
+import csv
+import bisect
+import logging
+from datetime import datetime
+from functools import lru_cache
+from typing import Dict, List, Optional, Sequence, Union
+
+import numpy as np
+
+from roi_history_store import ROIHistoryStore, snapshot_timestamp
+
+logger = logging.getLogger(__name__)
+
+# مجلد ملفات الأسعار (أي ملف .csv فيه يُحمّل)
+PRICE_SERIES_DIR = "/home/ubuntu/btc_prices"
+
+# أسماء الأعمدة المقبولة (بدون حساسية لحالة الأحرف)
+TIME_COLUMNS = ("timestamp", "time", "date", "datetime", "unix", "open_time")
+PRICE_COLUMNS = ("price", "close", "btc_usd", "usd", "value", "rate")
+
+# أقصى مسافة خارج نطاق السلسلة يُستخدم فيها أقرب سعر (بدلاً من عدم وجود سعر)
+MAX_EDGE_SECONDS = 24 * 3600
+
+# عدد الاستعلامات المحفوظة
+LOOKUP_CACHE_SIZE = 4096
+
+# مصدر سعر اللقطة: من البريد، من السلسلة المحلية، أو القيمة الافتراضية (يجب تصحيحه)
+PRICE_SOURCE_EMAIL = "email"
+PRICE_SOURCE_SERIES = "series"
+PRICE_SOURCE_DEFAULT = "default"
+
+TimeLike = Union[str, int, float, datetime]
+
+
+def to_epoch(value: TimeLike) -> float:
+    """وقت بالثواني منذ 1970؛ الأوقات بدون منطقة زمنية بالتوقيت المحلي (مثل email_date)"""
+    if isinstance(value, datetime):
+        return value.timestamp()
+    if isinstance(value, (int, float)):
+        # الأرقام الكبيرة بالملي ثانية (مثل internalDate أو ملفات Binance)
+        return value / 1000.0 if value > 1e11 else float(value)
+    text = value.strip()
+    try:
+        return to_epoch(float(text))
+    except ValueError:
+        pass
+    if text.endswith("Z"):
+        text = text[:-1] + "+00:00"
+    return datetime.fromisoformat(text).timestamp()
+
+
+def _find_column(header: List[str], names: Sequence[str]) -> Optional[int]:
+    lowered = [column.strip().lower() for column in header]
+    for name in names:
+        if name in lowered:
+            return lowered.index(name)
+    return None
+
+
+class BTCPriceSeries:
+    """أسعار BTC/USD مرتبة زمنياً مع استعلام بالبحث الثنائي والاستيفاء"""
+
+    def __init__(self, times: Sequence[float] = (), prices: Sequence[float] = ()):
+        order = np.argsort(np.asarray(times, dtype=float), kind="stable")
+        times_array = np.asarray(times, dtype=float)[order]
+        prices_array = np.asarray(prices, dtype=float)[order]
+        # عند تكرار نفس الوقت تُعتمد آخر قيمة
+        if len(times_array) > 1:
+            keep = np.append(times_array[1:] != times_array[:-1], True)
+            times_array, prices_array = times_array[keep], prices_array[keep]
+        self.times = times_array
+        self.prices = prices_array
+        self._times_list = times_array.tolist()
+        self._prices_list = prices_array.tolist()
+        # الاستعلامات المتكررة (نفس النص أو الوقت) تُعاد من الذاكرة بدون تحويل أو بحث
+        self._lookup = lru_cache(maxsize=LOOKUP_CACHE_SIZE)(self._price_at)
+
+    @classmethod
+    def from_csv(cls, paths: Union[str, Sequence[str]]) -> 'BTCPriceSeries':
+        """تحميل ملف CSV أو عدة ملفات (أعمدة الوقت والسعر تُكتشف من العناوين)"""
+        if isinstance(paths, str):
+            paths = [paths]
+        times: List[float] = []
+        prices: List[float] = []
+        for path in paths:
+            loaded = 0
+            try:
+                with open(path, 'r', encoding='utf-8', newline='') as f:
+                    reader = csv.reader(f)
+                    header = next(reader, [])
+                    time_column = _find_column(header, TIME_COLUMNS)
+                    price_column = _find_column(header, PRICE_COLUMNS)
+                    if time_column is None or price_column is None:
+                        logger.warning(f"تعذر تحديد أعمدة الوقت والسعر في {path}: {header}")
+                        continue
+                    for row in reader:
+                        try:
+                            price = float(row[price_column].replace(",", "").replace("$", ""))
+                            times.append(to_epoch(row[time_column]))
+                        except (ValueError, IndexError):
+                            continue
+                        prices.append(price)
+                        loaded += 1
+            except Exception as e:
+                logger.error(f"خطأ في تحميل ملف الأسعار {path}: {str(e)}")
+                continue
+            logger.info(f"تم تحميل {loaded} سعر من {path}")
+        return cls(times, prices)
+
+    @classmethod
+    def from_directory(cls, directory: str = PRICE_SERIES_DIR) -> 'BTCPriceSeries':
+        """تحميل جميع ملفات CSV في مجلد (سلسلة فارغة إذا لم يوجد)"""
+        if not os.path.isdir(directory):
+            return cls()
+        paths = sorted(
+            entry.path for entry in os.scandir(directory)
+            if entry.is_file() and entry.name.lower().endswith(".csv")
+        )
+        return cls.from_csv(paths)
+
+    def __len__(self) -> int:
+        return len(self._times_list)
+
+    # ------------------------------------------------------------------
+    # الاستعلام
+    # ------------------------------------------------------------------
+
+    def _interpolate(self, epoch: float) -> Optional[float]:
+        times, prices = self._times_list, self._prices_list
+        if not times:
+            return None
+        index = bisect.bisect_left(times, epoch)
+        if index < len(times) and times[index] == epoch:
+            return prices[index]
+        if index == 0:
+            return prices[0] if times[0] - epoch <= MAX_EDGE_SECONDS else None
+        if index == len(times):
+            return prices[-1] if epoch - times[-1] <= MAX_EDGE_SECONDS else None
+        t0, t1 = times[index - 1], times[index]
+        p0, p1 = prices[index - 1], prices[index]
+        return p0 + (p1 - p0) * (epoch - t0) / (t1 - t0)
+
+    def _price_at(self, when: TimeLike) -> Optional[float]:
+        price = self._interpolate(to_epoch(when))
+        return round(price, 2) if price is not None else None
+
+    def price_at(self, when: TimeLike) -> Optional[float]:
+        """سعر BTC في وقت معين، أو None إذا كان خارج نطاق السلسلة"""
+        return self._lookup(when)
+
+    def prices_at(self, epochs: Sequence[float]) -> np.ndarray:
+        """أسعار عدة أوقات دفعة واحدة (NaN خارج نطاق السلسلة)"""
+        epochs = np.asarray(epochs, dtype=float)
+        if not len(self.times):
+            return np.full(epochs.shape, np.nan)
+        prices = np.round(np.interp(epochs, self.times, self.prices), 2)
+        outside = (epochs < self.times[0] - MAX_EDGE_SECONDS) | (epochs > self.times[-1] + MAX_EDGE_SECONDS)
+        prices[outside] = np.nan
+        return prices
+
+
+# ----------------------------------------------------------------------
+# إعادة تقييم سجل التحليلات
+# ----------------------------------------------------------------------
+
+def _needs_revaluation(snapshot: Dict, default_price: float) -> bool:
+    """لقطة بسعر غير مأخوذ من البريد (اللقطات القديمة بدون مصدر: إذا كان سعرها هو الافتراضي)"""
+    source = snapshot.get("btc_price_source")
+    if source is None:
+        return snapshot.get("btc_price") == default_price
+    return source != PRICE_SOURCE_EMAIL
+
+
+def revalue_history(history_store: ROIHistoryStore, series: BTCPriceSeries,
+                    revalue_all: bool = False) -> Dict:
+    """إعادة حساب لقطات السجل بأسعار السلسلة في مرور واحد، ويعيد إحصائيات التحديث
+
+    الافتراضي: اللقطات التي لم يُؤخذ سعرها من البريد فقط؛ revalue_all لجميع اللقطات
+    """
+    from gmail_bitfufu_monitor import DEFAULT_BTC_PRICE
+    from roi_batch_engine import BatchROIEngine
+    from roi_rolling_analytics import invalidate_rolling_analytics
+
+    stats = {"snapshots": 0, "candidates": 0, "revalued": 0, "missing_price": 0}
+    try:
+        snapshots = history_store.all_snapshots()
+        stats["snapshots"] = len(snapshots)
+        candidates = [s for s in snapshots if revalue_all or _needs_revaluation(s, DEFAULT_BTC_PRICE)]
+        stats["candidates"] = len(candidates)
+        if not candidates:
+            return stats
+
+        # الأسعار والحساب لجميع اللقطات المرشحة في مرور واحد
+        epochs = [to_epoch(snapshot_timestamp(s)) for s in candidates]
+        prices = series.prices_at(epochs)
+        priced = ~np.isnan(prices)
+        stats["missing_price"] = int((~priced).sum())
+        candidates = [s for s, ok in zip(candidates, priced) if ok]
+        if not candidates:
+            return stats
+
+        result = BatchROIEngine(candidates).compute(btc_price=prices[priced])
+        updates = []
+        for i, snapshot in enumerate(candidates):
+            revalued = result.to_analysis(i)
+            analysis = dict(snapshot)
+            snapshot_id = analysis.pop("snapshot_id")
+            for key in ("btc_price", "total_investment", "total_returns", "total_profit_loss",
+                        "overall_roi", "plans"):
+                analysis[key] = revalued[key]
+            analysis["btc_price_source"] = PRICE_SOURCE_SERIES
+            updates.append((snapshot_id, analysis))
+
+        stats["revalued"] = history_store.update_snapshots(updates)
+        if stats["revalued"]:
+            invalidate_rolling_analytics(history_store)
+
+    except Exception as e:
+        logger.error(f"خطأ في إعادة تقييم السجل: {str(e)}")
+        stats["error"] = str(e)
+
+    logger.info(
+        f"تمت إعادة تقييم {stats['revalued']} لقطة من {stats['candidates']} "
+        f"({stats['missing_price']} بدون سعر في السلسلة)"
+    )
+    return stats
+
+
+def main():
+    """إعادة تقييم السجل: btc_price_series.py revalue [--all] [--prices DIR] [--db FILE]"""
+    args = sys.argv[1:]
+    if not args or args[0] != "revalue":
+        print("الاستخدام: python3 btc_price_series.py revalue [--all] [--prices DIR] [--db FILE]")
+        sys.exit(1)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    directory = args[args.index("--prices") + 1] if "--prices" in args else PRICE_SERIES_DIR
+    store = ROIHistoryStore(args[args.index("--db") + 1]) if "--db" in args else ROIHistoryStore()
+
+    series = BTCPriceSeries.from_directory(directory)
+    if not len(series):
+        print(f"❌ لا توجد أسعار في {directory}")
+        sys.exit(1)
+
+    stats = revalue_history(store, series, revalue_all="--all" in args)
+    print(f"✅ {stats['revalued']} لقطة أُعيد تقييمها ({stats['missing_price']} بدون سعر في السلسلة)")
+    sys.exit(0 if "error" not in stats else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -6,11 +6,19 @@
 
 import os
 import json
-import re
-from datetime import datetime
-from typing import Dict, List, Optional
+import time
+import random
+import hashlib
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
 import logging
 
+from bitfufu_email_parser import RevenueJournalParser
+from bitfufu_mime import get_body_text
+from bitfufu_plan_registry import PlanRegistry, PLAN_REGISTRY_FILE
+from bitfufu_metrics import REGISTRY, SIZE_BUCKETS
+
 # إعداد السجلات
 logging.basicConfig(
     level=logging.INFO,
@@ -22,7 +30,8 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# بيانات خطط التعدين
+# خطط التعدين المعروفة مسبقاً (تُكمل ما لا يظهر في البريد من اسم وتكلفة ومدة؛
+# الخطط الجديدة تُكتشف من البريد نفسه وتُحفظ في سجل الخطط)
 MINING_PLANS = {
     "95936": {"name": "خطة 3 أيام", "cost": 63.00, "duration": 3},
     "95735": {"name": "خطة 10 أيام", "cost": 63.00, "duration": 10},
@@ -30,28 +39,162 @@ MINING_PLANS = {
     "95736": {"name": "خطة 30 يوم", "cost": 439.93, "duration": 30}
 }
 
+# سعر BTC عند غيابه من البريد ومن سلسلة الأسعار المحلية (تُعلَّم اللقطة لتصحيحها لاحقاً
+# عبر btc_price_series.py revalue)
+DEFAULT_BTC_PRICE = 62000.0
+
+# ملف اعتمادات OAuth الافتراضي (حساب واحد)
+TOKEN_FILE = "/home/ubuntu/token.json"
+
+# استعلام رسائل Revenue Journal
+BITFUFU_QUERY = 'from:noreply@e.bitfufu.com subject:"Revenue Journal"'
+
+# الحقول المطلوبة فقط من الرسالة (partial response) - أجزاء MIME التي يحتاجها المحلل
+# حتى MESSAGE_PART_DEPTH مستويات متداخلة (مثل multipart/mixed ← multipart/related ← multipart/alternative)؛
+# محتوى المرفقات لا يُعاد هنا بل attachmentId وحجمه فقط
+MESSAGE_PART_DEPTH = 4
+_PART_FIELDS = 'mimeType,filename,headers,body(data,attachmentId,size)'
+
+
+def _message_fields(depth: int) -> str:
+    fields = _PART_FIELDS
+    for _ in range(depth):
+        fields = f'{_PART_FIELDS},parts({fields})'
+    return f'id,threadId,historyId,internalDate,payload({fields})'
+
+
+MESSAGE_FIELDS = _message_fields(MESSAGE_PART_DEPTH)
+
+# رؤوس الرسالة فقط (format='metadata') لتصفية بريد سجل التغييرات قبل جلب المحتوى الكامل
+METADATA_HEADERS = ['From', 'Subject']
+METADATA_FIELDS = 'id,internalDate,payload/headers'
+
+# حدود Gmail للطلبات المجمعة (الحد الأقصى 100، والموصى به 50)
+BATCH_SIZE = 50
+PAGE_SIZE = 100
+
+# ملف نقطة التزامن التدريجي (historyId ومعرفات الرسائل المعالجة)
+SYNC_STATE_FILE = "/home/ubuntu/gmail_sync_state.json"
+SYNC_SEEN_LIMIT = 500
+SYNC_FALLBACK_MESSAGES = 10
+
+# تكلفة كل طريقة بوحدات حصة Gmail (الحد 250 وحدة/ثانية لكل مستخدم)
+QUOTA_UNITS = {
+    "messages.list": 5,
+    "messages.get": 5,
+    "messages.attachments.get": 5,
+    "history.list": 2,
+    "getProfile": 1
+}
+GMAIL_QUOTA_UNITS_PER_SECOND = 250
+
+# إعادة المحاولة عند تجاوز الحصة أو أخطاء الخادم المؤقتة
+MAX_RETRIES = 5
+BACKOFF_BASE_SECONDS = 1.0
+BACKOFF_MAX_SECONDS = 32.0
+RETRYABLE_STATUSES = (429, 500, 502, 503, 504)
+
+
+def _is_retryable_error(error: Exception) -> bool:
+    """تجاوز الحصة (429 أو 403 rateLimitExceeded) أو خطأ خادم مؤقت"""
+    status = getattr(getattr(error, 'resp', None), 'status', None)
+    if status in RETRYABLE_STATUSES:
+        return True
+    return status == 403 and 'ratelimitexceeded' in str(error).lower()
+
+
+def _backoff_delay(attempt: int, error: Optional[Exception] = None) -> float:
+    """تأخير أسي مع عشوائية، مع احترام Retry-After إن وُجد"""
+    headers = getattr(error, 'resp', None)
+    retry_after = headers.get('retry-after') if hasattr(headers, 'get') else None
+    if retry_after:
+        try:
+            return min(float(retry_after), BACKOFF_MAX_SECONDS)
+        except ValueError:
+            pass
+    delay = min(BACKOFF_BASE_SECONDS * (2 ** attempt), BACKOFF_MAX_SECONDS)
+    return delay * random.uniform(0.5, 1.0)
+
+
+class QuotaRateLimiter:
+    """محدد معدل (token bucket) بوحدات حصة Gmail، آمن للاستخدام من عدة خيوط"""
+    
+    def __init__(self, units_per_second: float = GMAIL_QUOTA_UNITS_PER_SECOND,
+                 burst: Optional[float] = None):
+        self.rate = units_per_second
+        self.capacity = burst or units_per_second
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.waited_seconds = 0.0
+        self._lock = threading.Lock()
+    
+    def acquire(self, units: float = 1):
+        """الانتظار حتى تتوفر الوحدات المطلوبة"""
+        units = min(units, self.capacity)
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= units:
+                    self.tokens -= units
+                    return
+                delay = (units - self.tokens) / self.rate
+                self.waited_seconds += delay
+            time.sleep(delay)
+
 
 class BitFuFuGmailMonitor:
     """مراقب Gmail لبيانات BitFuFu"""
     
-    def __init__(self):
-        self.gmail_service = None
+    def __init__(self, sync_state_file: str = SYNC_STATE_FILE, gmail_service=None,
+                 token_file: str = TOKEN_FILE, mining_plans: Optional[Dict] = None,
+                 rate_limiter: Optional[QuotaRateLimiter] = None,
+                 plan_registry: Optional[PlanRegistry] = None,
+                 price_series=None):
+        # خدمة Gmail جاهزة اختيارية (مثل FakeGmailService للاختبار بدون اتصال)
+        self.gmail_service = gmail_service
+        self._injected_service = gmail_service is not None
+        # اعتمادات وخطط الحساب (الافتراضي: الحساب الواحد في MINING_PLANS)
+        self.token_file = token_file
+        self.mining_plans = mining_plans or MINING_PLANS
+        # سجل الخطط المكتشفة من البريد (مع الخطط المعروفة من الإعداد)
+        self.plan_registry = plan_registry or PlanRegistry(PLAN_REGISTRY_FILE)
+        self.plan_registry.seed(self.mining_plans)
+        # سلسلة أسعار BTC المحلية (تُحمّل فقط عند أول بريد بدون سعر)
+        self._price_series = price_series
+        self.rate_limiter = rate_limiter
+        self._credentials = None
         self.latest_email_data = None
+        self.last_backfill_stats = {}
+        self.sync_state_file = sync_state_file
+        # (ملف، نقطة تزامن) لم تُحفظ بعد (تُحفظ بـ commit_sync_state بعد نجاح معالجة الرسائل)
+        self.pending_sync_state = None
+        self.parser = RevenueJournalParser()
         
     def authenticate_gmail(self):
         """المصادقة مع Gmail API"""
+        if self._injected_service:
+            return True
+        # في العمليات الدائمة: الاعتمادات السابقة ما زالت صالحة
+        if self.gmail_service is not None and self._credentials is not None and self._credentials.valid:
+            return True
+        with REGISTRY.timer("gmail_auth_seconds"):
+            return self._authenticate_gmail()
+    
+    def _authenticate_gmail(self):
         try:
             from google.oauth2.credentials import Credentials
             from google_auth_oauthlib.flow import InstalledAppFlow
             from google.auth.transport.requests import Request
-            from googleapiclient.discovery import build
+            from bitfufu_gmail_client import build_gmail_service
             
             SCOPES = ['https://www.googleapis.com/auth/gmail.readonly']
             creds = None
             
             # تحميل الاعتمادات المحفوظة
-            if os.path.exists('/home/ubuntu/token.json'):
-                creds = Credentials.from_authorized_user_file('/home/ubuntu/token.json', SCOPES)
+            if os.path.exists(self.token_file):
+                creds = Credentials.from_authorized_user_file(self.token_file, SCOPES)
             
             # تحديث أو إنشاء اعتمادات جديدة
             if not creds or not creds.valid:
@@ -62,10 +205,12 @@ class BitFuFuGmailMonitor:
                     return False
                     
                 # حفظ الاعتمادات
-                with open('/home/ubuntu/token.json', 'w') as token:
+                with open(self.token_file, 'w') as token:
                     token.write(creds.to_json())
             
-            self.gmail_service = build('gmail', 'v1', credentials=creds)
+            # عميل من وثيقة discovery محفوظة واتصال HTTP دائم لهذا الحساب
+            self.gmail_service = build_gmail_service(creds, cache_key=self.token_file)
+            self._credentials = creds
             logger.info("تم الاتصال بـ Gmail API بنجاح")
             return True
             
@@ -73,6 +218,23 @@ class BitFuFuGmailMonitor:
             logger.error(f"خطأ في المصادقة مع Gmail: {str(e)}")
             return False
     
+    def _execute(self, request, method: str, units: Optional[float] = None):
+        """تنفيذ طلب Gmail API مع قياس زمنه وعدده، وإعادة المحاولة عند تجاوز الحصة"""
+        for attempt in range(MAX_RETRIES + 1):
+            if self.rate_limiter:
+                self.rate_limiter.acquire(units if units is not None else QUOTA_UNITS.get(method, 5))
+            REGISTRY.inc("gmail_api_requests_total", method=method)
+            try:
+                with REGISTRY.timer("gmail_api_seconds", method=method):
+                    return request.execute()
+            except Exception as e:
+                if attempt >= MAX_RETRIES or not _is_retryable_error(e):
+                    raise
+                delay = _backoff_delay(attempt, e)
+                REGISTRY.inc("gmail_api_retries_total", method=method)
+                logger.warning(f"تجاوز حصة Gmail ({method})، إعادة المحاولة بعد {delay:.1f}s")
+                time.sleep(delay)
+    
     def search_latest_bitfufu_email(self) -> Optional[Dict]:
         """البحث عن آخر بريد من BitFuFu"""
         try:
@@ -81,12 +243,11 @@ class BitFuFuGmailMonitor:
                 return None
             
             # البحث عن رسائل من noreply@e.bitfufu.com
-            query = 'from:noreply@e.bitfufu.com subject:"Revenue Journal"'
-            results = self.gmail_service.users().messages().list(
+            results = self._execute(self.gmail_service.users().messages().list(
                 userId='me',
-                q=query,
+                q=BITFUFU_QUERY,
                 maxResults=1
-            ).execute()
+            ), "messages.list")
             
             messages = results.get('messages', [])
             if not messages:
@@ -95,11 +256,11 @@ class BitFuFuGmailMonitor:
             
             # جلب تفاصيل الرسالة
             message_id = messages[0]['id']
-            message = self.gmail_service.users().messages().get(
+            message = self._execute(self.gmail_service.users().messages().get(
                 userId='me',
                 id=message_id,
                 format='full'
-            ).execute()
+            ), "messages.get")
             
             logger.info(f"تم العثور على بريد BitFuFu: {message_id}")
             return message
@@ -108,8 +269,275 @@ class BitFuFuGmailMonitor:
             logger.error(f"خطأ في البحث عن البريد: {str(e)}")
             return None
     
-    def extract_email_data(self, message: Dict) -> Optional[Dict]:
-        """استخراج البيانات من البريد"""
+    def list_bitfufu_message_ids(self, max_messages: Optional[int] = None,
+                                 page_size: int = PAGE_SIZE) -> List[str]:
+        """سرد معرفات جميع رسائل BitFuFu مع تتبع nextPageToken"""
+        message_ids = []
+        page_token = None
+        
+        while max_messages is None or len(message_ids) < max_messages:
+            page_limit = page_size
+            if max_messages is not None:
+                page_limit = min(page_size, max_messages - len(message_ids))
+            
+            results = self._execute(self.gmail_service.users().messages().list(
+                userId='me',
+                q=BITFUFU_QUERY,
+                maxResults=page_limit,
+                pageToken=page_token,
+                fields='messages/id,nextPageToken'
+            ), "messages.list")
+            
+            message_ids.extend(m['id'] for m in results.get('messages', []))
+            page_token = results.get('nextPageToken')
+            
+            if not page_token:
+                break
+        
+        return message_ids
+    
+    def fetch_messages_batch(self, message_ids: List[str],
+                             batch_size: int = BATCH_SIZE,
+                             metadata_only: bool = False) -> List[Dict]:
+        """جلب الرسائل عبر طلبات Gmail المجمعة مع الحقول المطلوبة فقط
+
+        metadata_only: رؤوس From وSubject فقط بدون أجزاء الرسالة
+        """
+        if metadata_only:
+            request_args = {"format": 'metadata', "metadataHeaders": METADATA_HEADERS, "fields": METADATA_FIELDS}
+        else:
+            request_args = {"format": 'full', "fields": MESSAGE_FIELDS}
+        fetched = {}
+        throttled = []
+        
+        def _on_response(request_id, response, exception):
+            if exception is not None:
+                # الرسائل المرفوضة بسبب الحصة تُعاد في دفعة لاحقة
+                if _is_retryable_error(exception):
+                    throttled.append(request_id)
+                    return
+                logger.error(f"فشل جلب الرسالة {request_id}: {str(exception)}")
+                return
+            fetched[request_id] = response
+        
+        messages_api = self.gmail_service.users().messages()
+        pending = list(message_ids)
+        for attempt in range(MAX_RETRIES + 1):
+            for start in range(0, len(pending), batch_size):
+                chunk = pending[start:start + batch_size]
+                batch = self.gmail_service.new_batch_http_request(callback=_on_response)
+                for message_id in chunk:
+                    batch.add(
+                        messages_api.get(userId='me', id=message_id, **request_args),
+                        request_id=message_id
+                    )
+                REGISTRY.inc("gmail_batch_messages_total", len(chunk))
+                self._execute(batch, "batch", units=QUOTA_UNITS["messages.get"] * len(chunk))
+            
+            if not throttled:
+                break
+            pending, throttled[:] = list(throttled), []
+            if attempt < MAX_RETRIES:
+                delay = _backoff_delay(attempt)
+                REGISTRY.inc("gmail_api_retries_total", len(pending), method="batch")
+                logger.warning(f"تجاوز حصة Gmail لـ {len(pending)} رسالة، إعادة المحاولة بعد {delay:.1f}s")
+                time.sleep(delay)
+            else:
+                logger.error(f"تعذر جلب {len(pending)} رسالة بعد {MAX_RETRIES} محاولات")
+        
+        # الحفاظ على ترتيب القائمة الأصلي (الأحدث أولاً)
+        return [fetched[mid] for mid in message_ids if mid in fetched]
+    
+    def backfill_bitfufu_emails(self, max_messages: Optional[int] = None,
+                                page_size: int = PAGE_SIZE,
+                                batch_size: int = BATCH_SIZE) -> List[Dict]:
+        """إعادة بناء سجل Revenue Journal التاريخي بالكامل"""
+        try:
+            if not self.gmail_service:
+                logger.error("Gmail service غير متصل")
+                return []
+            
+            start_time = time.perf_counter()
+            message_ids = self.list_bitfufu_message_ids(max_messages, page_size)
+            list_seconds = time.perf_counter() - start_time
+            
+            messages = self.fetch_messages_batch(message_ids, batch_size)
+            
+            history = []
+            for message in messages:
+                email_data = self.extract_email_data(message, save_registry=False)
+                if email_data:
+                    history.append(email_data)
+            self.plan_registry.save()
+            
+            elapsed = time.perf_counter() - start_time
+            self.last_backfill_stats = {
+                "messages_listed": len(message_ids),
+                "messages_fetched": len(messages),
+                "snapshots_extracted": len(history),
+                "list_seconds": round(list_seconds, 3),
+                "total_seconds": round(elapsed, 3),
+                "messages_per_second": round(len(messages) / elapsed, 2) if elapsed > 0 else 0.0
+            }
+            
+            logger.info(
+                f"تمت إعادة بناء السجل: {len(history)} رسالة "
+                f"({self.last_backfill_stats['messages_per_second']} رسالة/ثانية)"
+            )
+            return history
+            
+        except Exception as e:
+            logger.error(f"خطأ في إعادة بناء السجل: {str(e)}")
+            return []
+    
+    def sync_state_path(self, scope: Optional[str] = None) -> str:
+        """ملف نقطة التزامن: الافتراضي، أو ملف مستقل لكل نطاق (مثل كل جدول في خدمة الجدولة)"""
+        if not scope:
+            return self.sync_state_file
+        root, ext = os.path.splitext(self.sync_state_file)
+        return f"{root}_{scope}{ext or '.json'}"
+    
+    def sync_bitfufu_emails(self, commit: bool = True, scope: Optional[str] = None) -> List[Dict]:
+        """التزامن التدريجي: جلب رسائل BitFuFu الجديدة فقط منذ آخر historyId
+        
+        يعيد جميع الرسائل الجديدة الأحدث أولاً، وكلها تُعتبر مُعالجة عند حفظ نقطة التزامن
+        commit=False: لا تُحفظ نقطة التزامن حتى يُستدعى commit_sync_state، فإذا فشلت
+        معالجة الرسائل تُجلب نفسها مرة أخرى في التشغيل التالي
+        scope: نقطة تزامن مستقلة (نفس الرسالة تُعتبر جديدة لكل نطاق)
+        """
+        self.pending_sync_state = None
+        try:
+            if not self.gmail_service:
+                logger.error("Gmail service غير متصل")
+                return []
+            
+            state_file = self.sync_state_path(scope)
+            state = self._load_sync_state(state_file)
+            seen_ids = state.get("message_ids", [])
+            
+            new_ids = None
+            if state.get("history_id"):
+                new_ids = self._list_history_message_ids(state)
+            from_history = new_ids is not None
+            
+            if not from_history:
+                # لا توجد نقطة تزامن أو انتهت صلاحيتها - الرجوع إلى البحث الكامل
+                profile = self._execute(self.gmail_service.users().getProfile(
+                    userId='me', fields='historyId'
+                ), "getProfile")
+                state["history_id"] = profile.get("historyId")
+                
+                # في التشغيل الأول نكتفي بآخر رسالة كما في search_latest_bitfufu_email
+                limit = SYNC_FALLBACK_MESSAGES if seen_ids else 1
+                new_ids = self.list_bitfufu_message_ids(max_messages=limit)
+            
+            new_ids = [mid for mid in new_ids if mid not in seen_ids]
+            
+            # سجل التغييرات يشمل كل البريد الوارد، لذا يتم التصفية حسب المرسل والموضوع
+            # من الرؤوس أولاً، ويُجلب المحتوى الكامل لرسائل BitFuFu فقط
+            if from_history and new_ids:
+                headers = self.fetch_messages_batch(new_ids, metadata_only=True)
+                new_ids = [m['id'] for m in headers if self._is_bitfufu_message(m)]
+            messages = self.fetch_messages_batch(new_ids) if new_ids else []
+            
+            # تجاهل الرسائل الأقدم من آخر رسالة تمت معالجتها (عند البحث الكامل بعد انتهاء الصلاحية)
+            latest_date = int(state.get("latest_internal_date", 0))
+            messages = [m for m in messages if int(m.get('internalDate', 0)) > latest_date]
+            if messages:
+                state["latest_internal_date"] = max(int(m.get('internalDate', 0)) for m in messages)
+            # الأحدث أولاً في المسارين (سجل التغييرات والبحث الكامل)
+            messages.sort(key=lambda m: int(m.get('internalDate', 0)), reverse=True)
+            
+            state["message_ids"] = (seen_ids + [m['id'] for m in messages])[-SYNC_SEEN_LIMIT:]
+            state["updated_at"] = datetime.now().isoformat()
+            if commit:
+                self._save_sync_state(state, state_file)
+            else:
+                self.pending_sync_state = (state_file, state)
+            
+            logger.info(f"التزامن التدريجي: {len(messages)} رسالة جديدة")
+            return messages
+            
+        except Exception as e:
+            logger.error(f"خطأ في التزامن التدريجي: {str(e)}")
+            return []
+    
+    def commit_sync_state(self):
+        """حفظ نقطة التزامن المؤجلة من آخر sync_bitfufu_emails(commit=False)"""
+        if self.pending_sync_state is not None:
+            state_file, state = self.pending_sync_state
+            self._save_sync_state(state, state_file)
+            self.pending_sync_state = None
+    
+    def _list_history_message_ids(self, state: Dict) -> Optional[List[str]]:
+        """سرد الرسائل المضافة منذ نقطة التزامن، أو None إذا انتهت صلاحيتها"""
+        message_ids = []
+        page_token = None
+        
+        try:
+            while True:
+                results = self._execute(self.gmail_service.users().history().list(
+                    userId='me',
+                    startHistoryId=state["history_id"],
+                    historyTypes=['messageAdded'],
+                    pageToken=page_token,
+                    fields='history/messagesAdded/message/id,historyId,nextPageToken'
+                ), "history.list")
+                
+                for record in results.get('history', []):
+                    for added in record.get('messagesAdded', []):
+                        message_ids.append(added['message']['id'])
+                
+                page_token = results.get('nextPageToken')
+                if not page_token:
+                    break
+            
+        except Exception as e:
+            # يعيد Gmail الخطأ 404 عندما يكون startHistoryId قديماً جداً
+            if getattr(getattr(e, 'resp', None), 'status', None) == 404:
+                logger.warning("انتهت صلاحية نقطة التزامن، سيتم إجراء بحث كامل")
+                return None
+            raise
+        
+        state["history_id"] = results.get('historyId', state["history_id"])
+        
+        # الأحدث أولاً كما في نتائج البحث
+        return list(reversed(message_ids))
+    
+    def _is_bitfufu_message(self, message: Dict) -> bool:
+        """التحقق من أن الرسالة من BitFuFu وموضوعها Revenue Journal"""
+        headers = {
+            h['name'].lower(): h['value']
+            for h in message.get('payload', {}).get('headers', [])
+        }
+        return ('noreply@e.bitfufu.com' in headers.get('from', '').lower()
+                and 'revenue journal' in headers.get('subject', '').lower())
+    
+    def _load_sync_state(self, state_file: Optional[str] = None) -> Dict:
+        """تحميل نقطة التزامن المحفوظة"""
+        state_file = state_file or self.sync_state_file
+        try:
+            if os.path.exists(state_file):
+                with open(state_file, 'r', encoding='utf-8') as f:
+                    return json.load(f)
+            return {}
+        except Exception as e:
+            logger.error(f"خطأ في تحميل نقطة التزامن: {str(e)}")
+            return {}
+    
+    def _save_sync_state(self, state: Dict, state_file: Optional[str] = None):
+        """حفظ نقطة التزامن"""
+        state_file = state_file or self.sync_state_file
+        try:
+            tmp_file = f"{state_file}.tmp"
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump(state, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_file, state_file)
+        except Exception as e:
+            logger.error(f"خطأ في حفظ نقطة التزامن: {str(e)}")
+    
+    def extract_email_data(self, message: Dict, save_registry: bool = True) -> Optional[Dict]:
+        """استخراج البيانات من البريد (وحفظ سجل الخطط إذا اكتُشف فيه جديد)"""
         try:
             # استخراج نص البريد
             email_body = self._get_email_body(message)
@@ -117,23 +545,69 @@ class BitFuFuGmailMonitor:
                 logger.error("فشل استخراج نص البريد")
                 return None
             
-            # استخراج البيانات
+            # معرف الرسالة وتاريخ استلامها (مطلوبان لإعادة بناء السجل التاريخي)
+            email_date = None
+            if 'internalDate' in message:
+                email_date = datetime.fromtimestamp(int(message['internalDate']) / 1000).isoformat()
+            
+            email_data = self.extract_body_data(email_body, message.get('id'), email_date)
+            if email_data and save_registry:
+                self.plan_registry.save()
+            return email_data
+            
+        except Exception as e:
+            logger.error(f"خطأ في استخراج البيانات: {str(e)}")
+            return None
+    
+    def message_fingerprint(self, message: Dict) -> str:
+        """بصمة محتوى الرسالة مع إعداد الخطط (تتغير إذا تغير أي منهما)"""
+        digest = hashlib.sha256(self._get_email_body(message).encode('utf-8'))
+        digest.update(json.dumps(self.mining_plans, sort_keys=True).encode('utf-8'))
+        return digest.hexdigest()
+    
+    def extract_body_data(self, email_body: str, message_id: Optional[str] = None,
+                          email_date: Optional[str] = None) -> Optional[Dict]:
+        """استخراج البيانات من نص البريد (من Gmail API أو من أرشيف محلي)"""
+        try:
+            # استخراج السعر وجميع صفوف الخطط في مرور واحد
+            REGISTRY.observe("email_body_bytes", len(email_body), buckets=SIZE_BUCKETS)
+            with REGISTRY.timer("email_parse_seconds"):
+                parsed = self.parser.parse(email_body)
+            REGISTRY.inc("emails_parsed_total")
+            
+            timestamp = datetime.now().isoformat()
+            btc_price, price_source = self._extract_btc_price(parsed, email_date or timestamp)
             data = {
-                "timestamp": datetime.now().isoformat(),
-                "btc_price": self._extract_btc_price(email_body),
+                "timestamp": timestamp,
+                "btc_price": btc_price,
+                "btc_price_source": price_source,
                 "plans": {}
             }
             
-            # استخراج بيانات كل خطة
-            for plan_id, plan_info in MINING_PLANS.items():
-                btc_earned = self._extract_plan_btc(email_body, plan_id)
-                if btc_earned is not None:
-                    data["plans"][plan_id] = {
-                        "name": plan_info["name"],
-                        "cost": plan_info["cost"],
-                        "duration": plan_info["duration"],
-                        "btc_earned": btc_earned
-                    }
+            if message_id:
+                data["message_id"] = message_id
+            if email_date:
+                data["email_date"] = email_date
+            
+            # جميع الخطط الموجودة في البريد، مع تسجيلها وتفاصيلها في سجل الخطط
+            seen_at = email_date or data["timestamp"]
+            details = parsed.get("plan_details", {})
+            unknown_cost = []
+            for plan_id, btc_earned in parsed["plans"].items():
+                plan = self.plan_registry.observe(plan_id, seen_at, **details.get(plan_id, {}))
+                if plan.get("cost") is None:
+                    unknown_cost.append(plan_id)
+                    continue
+                data["plans"][plan_id] = {
+                    "name": plan.get("name") or f"خطة {plan_id}",
+                    "cost": plan["cost"],
+                    "duration": plan.get("duration") or 0,
+                    "btc_earned": btc_earned
+                }
+            
+            if unknown_cost:
+                logger.warning(f"خطط بدون تكلفة معروفة (أضفها إلى MINING_PLANS): {', '.join(unknown_cost)}")
+            self._log_missing_plans(parsed["plans"], seen_at)
             
             logger.info(f"تم استخراج البيانات: {len(data['plans'])} خطط")
             self.latest_email_data = data
@@ -144,88 +618,63 @@ class BitFuFuGmailMonitor:
             return None
     
     def _get_email_body(self, message: Dict) -> str:
-        """استخراج نص البريد"""
+        """استخراج نص البريد من أي مستوى في شجرة الأجزاء (يُجلب المرفق فقط إذا كان هو النص)"""
         try:
-            import base64
-            
-            if 'payload' in message:
-                payload = message['payload']
-                
-                # محاولة الحصول على النص من parts
-                if 'parts' in payload:
-                    for part in payload['parts']:
-                        if part['mimeType'] == 'text/plain':
-                            data = part['body'].get('data', '')
-                            return base64.urlsafe_b64decode(data).decode('utf-8')
-                        elif part['mimeType'] == 'text/html':
-                            data = part['body'].get('data', '')
-                            return base64.urlsafe_b64decode(data).decode('utf-8')
-                
-                # محاولة الحصول على النص مباشرة
-                if 'body' in payload and 'data' in payload['body']:
-                    data = payload['body']['data']
-                    return base64.urlsafe_b64decode(data).decode('utf-8')
-            
-            return ""
+            if 'payload' not in message:
+                return ""
+            return get_body_text(
+                message['payload'],
+                lambda attachment_id: self._fetch_attachment(message.get('id'), attachment_id)
+            )
             
         except Exception as e:
             logger.error(f"خطأ في استخراج نص البريد: {str(e)}")
             return ""
     
-    def _extract_btc_price(self, email_body: str) -> float:
-        """استخراج سعر BTC"""
-        try:
-            # البحث عن سعر BTC في النص
-            patterns = [
-                r'BTC[:/\s]+\$?([\d,]+\.?\d*)',
-                r'Bitcoin[:/\s]+\$?([\d,]+\.?\d*)',
-                r'Price[:/\s]+\$?([\d,]+\.?\d*)'
-            ]
-            
-            for pattern in patterns:
-                match = re.search(pattern, email_body, re.IGNORECASE)
-                if match:
-                    price_str = match.group(1).replace(',', '')
-                    return float(price_str)
-            
-            # إذا لم يتم العثور على السعر، استخدم قيمة افتراضية
-            logger.warning("لم يتم العثور على سعر BTC، استخدام قيمة افتراضية")
-            return 62000.0
-            
-        except Exception as e:
-            logger.error(f"خطأ في استخراج سعر BTC: {str(e)}")
-            return 62000.0
+    def _fetch_attachment(self, message_id: Optional[str], attachment_id: str) -> str:
+        """جلب محتوى مرفق (بترميز base64url) من Gmail"""
+        if not self.gmail_service or not message_id:
+            raise RuntimeError("لا يمكن جلب المرفق بدون Gmail service ومعرف الرسالة")
+        attachment = self._execute(self.gmail_service.users().messages().attachments().get(
+            userId='me',
+            messageId=message_id,
+            id=attachment_id,
+            fields='data'
+        ), "messages.attachments.get")
+        return attachment.get('data', '')
+    
+    @property
+    def price_series(self):
+        """سلسلة أسعار BTC المحلية (btc_price_series.py)"""
+        if self._price_series is None:
+            from btc_price_series import BTCPriceSeries
+            self._price_series = BTCPriceSeries.from_directory()
+        return self._price_series
     
-    def _extract_plan_btc(self, email_body: str, plan_id: str) -> Optional[float]:
-        """استخراج BTC المكتسبة لخطة معينة"""
+    def _extract_btc_price(self, parsed: Dict, price_time: str) -> Tuple[float, str]:
+        """سعر BTC ومصدره: البريد، ثم سلسلة الأسعار المحلية في وقت البريد، ثم القيمة الافتراضية"""
+        if parsed.get("btc_price") is not None:
+            return parsed["btc_price"], "email"
+        
         try:
-            # البحث عن رقم الخطة والـ BTC المرتبطة
-            patterns = [
-                rf'{plan_id}[^\d]+([\d.]+)\s*BTC',
-                rf'Plan\s*{plan_id}[^\d]+([\d.]+)',
-                rf'{plan_id}.*?(0\.\d+)'
-            ]
-            
-            for pattern in patterns:
-                match = re.search(pattern, email_body, re.IGNORECASE)
-                if match:
-                    btc_str = match.group(1)
-                    return float(btc_str)
-            
-            # قيم افتراضية للاختبار
-            default_values = {
-                "95936": 0.00015,  # 3 أيام
-                "95735": 0.00048,  # 10 أيام
-                "95937": 0.00112,  # 14 يوم
-                "95736": 0.00235   # 30 يوم
-            }
-            
-            logger.warning(f"لم يتم العثور على BTC للخطة {plan_id}، استخدام قيمة افتراضية")
-            return default_values.get(plan_id, 0.0001)
-            
+            price = self.price_series.price_at(price_time)
+            if price is not None:
+                logger.info(f"سعر BTC غير موجود في البريد، من سلسلة الأسعار: ${price:,.2f}")
+                return price, "series"
         except Exception as e:
-            logger.error(f"خطأ في استخراج BTC للخطة {plan_id}: {str(e)}")
-            return None
+            logger.error(f"خطأ في البحث في سلسلة الأسعار: {str(e)}")
+        
+        logger.warning(f"لم يتم العثور على سعر BTC في البريد ولا في سلسلة الأسعار ({price_time})، "
+                       f"استخدام قيمة افتراضية مؤقتة")
+        return DEFAULT_BTC_PRICE, "default"
+    
+    def _log_missing_plans(self, found: Dict, seen_at: str):
+        """الخطط النشطة في اليوم السابق التي لم تظهر في هذا البريد (بدون قيم افتراضية)"""
+        previous_day = (datetime.fromisoformat(seen_at[:10]) - timedelta(days=1)).date()
+        missing = [plan["plan_id"] for plan in self.plan_registry.active_on(previous_day)
+                   if plan["plan_id"] not in found]
+        if missing:
+            logger.info(f"خطط لم تظهر في هذا البريد (ربما انتهت): {', '.join(missing)}")
 
 
 class ROIAnalyzer:
@@ -237,8 +686,12 @@ class ROIAnalyzer:
         
     def calculate_roi(self) -> Dict:
         """حساب ROI لجميع الخطط"""
+        with REGISTRY.timer("roi_calculation_seconds"):
+            return self._calculate_roi()
+    
+    def _calculate_roi(self) -> Dict:
         try:
-            btc_price = self.email_data.get("btc_price", 62000.0)
+            btc_price = self.email_data.get("btc_price", DEFAULT_BTC_PRICE)
             total_investment = 0.0
             total_returns = 0.0
             
@@ -278,6 +731,11 @@ class ROIAnalyzer:
                 "plans": plans_analysis
             }
             
+            # الاحتفاظ بمصدر اللقطة لسجل التحليلات
+            for key in ("message_id", "email_date", "btc_price_source", "mock"):
+                if key in self.email_data:
+                    self.analysis[key] = self.email_data[key]
+            
             logger.info(f"تم حساب ROI: {overall_roi:.2f}%")
             return self.analysis
             
@@ -295,6 +753,15 @@ class ROIAnalyzer:
             with open(previous_file, 'r', encoding='utf-8') as f:
                 previous_data = json.load(f)
             
+            return self.compare_with_snapshot(previous_data)
+            
+        except Exception as e:
+            logger.error(f"خطأ في المقارنة مع البيانات السابقة: {str(e)}")
+            return {}
+    
+    def compare_with_snapshot(self, previous_data: Dict) -> Dict:
+        """مقارنة مع لقطة سابقة من سجل التحليلات"""
+        try:
             comparison = {
                 "roi_change": round(self.analysis["overall_roi"] - previous_data.get("overall_roi", 0), 2),
                 "profit_loss_change": round(self.analysis["total_profit_loss"] - previous_data.get("total_profit_loss", 0), 2),
@@ -353,9 +820,10 @@ def main():
     analyzer = ROIAnalyzer(email_data)
     analysis = analyzer.calculate_roi()
     
-    # حفظ التحليل
-    output_file = analyzer.save_analysis()
-    logger.info(f"تم الانتهاء - الملف: {output_file}")
+    # حفظ التحليل في السجل
+    from roi_history_store import ROIHistoryStore
+    snapshot_id = ROIHistoryStore().save_snapshot(analysis)
+    logger.info(f"تم الانتهاء - اللقطة: {snapshot_id}")
 
 
 if __name__ == "__main__":
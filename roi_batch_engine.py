@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+محرك ROI المجمع (NumPy)
+يحسب العوائد والأرباح/الخسائر وROI لمصفوفة N لقطة × M خطة في مرور واحد
+"""
+
+import logging
+from typing import Dict, List, Optional, Sequence, Union
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class BatchROIResult:
+    """نتائج الحساب المجمع: مصفوفات خام + تحويل إلى صيغة ROIAnalyzer"""
+
+    def __init__(self, engine: 'BatchROIEngine', btc_price: np.ndarray):
+        self.engine = engine
+        self.btc_price = btc_price
+
+        present = engine.present
+        cost = engine.cost
+        btc_earned = engine.btc_earned
+
+        # نفس ترتيب العمليات في ROIAnalyzer.calculate_roi لضمان التطابق التام
+        with np.errstate(divide='ignore', invalid='ignore'):
+            self.usd_earned = btc_earned * btc_price[:, None]
+            self.profit_loss = self.usd_earned - cost
+            self.roi_percentage = ((self.usd_earned - cost) / cost) * 100
+
+        # الإجماليات بالجمع التراكمي عمود بعد عمود (بدون الجمع الزوجي في NumPy)
+        count = len(btc_price)
+        self.total_investment = np.zeros(count)
+        self.total_returns = np.zeros(count)
+        for j in range(len(engine.plan_ids)):
+            self.total_investment += np.where(present[:, j], cost[:, j], 0.0)
+            self.total_returns += np.where(present[:, j], self.usd_earned[:, j], 0.0)
+
+        self.total_profit_loss = self.total_returns - self.total_investment
+        with np.errstate(divide='ignore', invalid='ignore'):
+            self.overall_roi = np.where(
+                self.total_investment > 0,
+                ((self.total_returns - self.total_investment) / self.total_investment) * 100,
+                0.0
+            )
+
+        # التغير اليومي (اللقطة i مقارنة باللقطة i-1)
+        self.deltas = {
+            "roi_change": np.diff(self.overall_roi, prepend=np.nan),
+            "profit_loss_change": np.diff(self.total_profit_loss, prepend=np.nan),
+            "btc_price_change": np.diff(self.btc_price, prepend=np.nan)
+        }
+
+    def __len__(self) -> int:
+        return len(self.btc_price)
+
+    def to_analysis(self, index: int) -> Dict:
+        """لقطة واحدة بنفس صيغة ROIAnalyzer.calculate_roi"""
+        engine = self.engine
+        plans = {}
+        for j, plan_id in enumerate(engine.plan_ids):
+            if not engine.present[index, j]:
+                continue
+            plans[plan_id] = {
+                "name": engine.names[index][plan_id],
+                "cost": float(engine.cost[index, j]),
+                "duration": engine.durations[index][plan_id],
+                "btc_earned": float(engine.btc_earned[index, j]),
+                "usd_earned": round(float(self.usd_earned[index, j]), 2),
+                "profit_loss": round(float(self.profit_loss[index, j]), 2),
+                "roi_percentage": round(float(self.roi_percentage[index, j]), 2)
+            }
+
+        analysis = {
+            "timestamp": engine.timestamps[index],
+            "btc_price": float(self.btc_price[index]),
+            "total_investment": round(float(self.total_investment[index]), 2),
+            "total_returns": round(float(self.total_returns[index]), 2),
+            "total_profit_loss": round(float(self.total_profit_loss[index]), 2),
+            "overall_roi": round(float(self.overall_roi[index]), 2),
+            "plans": plans
+        }
+        analysis.update(engine.sources[index])
+        return analysis
+
+    def to_analyses(self) -> List[Dict]:
+        """جميع اللقطات بصيغة ROIAnalyzer"""
+        return [self.to_analysis(i) for i in range(len(self))]
+
+    def comparison(self, index: int) -> Dict:
+        """المقارنة مع اللقطة السابقة بنفس صيغة ROIAnalyzer.compare_with_snapshot"""
+        if index <= 0:
+            return {}
+        current = self.to_analysis(index)
+        previous = self.to_analysis(index - 1)
+        return {
+            "roi_change": round(current["overall_roi"] - previous["overall_roi"], 2),
+            "profit_loss_change": round(current["total_profit_loss"] - previous["total_profit_loss"], 2),
+            "btc_price_change": round(current["btc_price"] - previous["btc_price"], 2)
+        }
+
+    def portfolio_totals(self) -> Dict[str, np.ndarray]:
+        """سلاسل إجماليات المحفظة عبر الزمن"""
+        return {
+            "total_investment": self.total_investment,
+            "total_returns": self.total_returns,
+            "total_profit_loss": self.total_profit_loss,
+            "overall_roi": self.overall_roi
+        }
+
+
+class BatchROIEngine:
+    """تحويل لقطات متعددة إلى مصفوفات وحساب ROI لها دفعة واحدة
+
+    ترتيب الأعمدة هو ترتيب أول ظهور للخطط، وهو نفس ترتيب MINING_PLANS
+    في البيانات المستخرجة، لذلك تتطابق الإجماليات مع الحساب لكل لقطة على حدة
+    """
+
+    def __init__(self, snapshots: Sequence[Dict], plan_ids: Optional[List[str]] = None):
+        if plan_ids is None:
+            plan_ids = []
+            seen = set()
+            for snapshot in snapshots:
+                for plan_id in snapshot.get("plans", {}):
+                    if plan_id not in seen:
+                        seen.add(plan_id)
+                        plan_ids.append(plan_id)
+
+        self.plan_ids = list(plan_ids)
+        columns = {plan_id: j for j, plan_id in enumerate(self.plan_ids)}
+
+        count, width = len(snapshots), len(self.plan_ids)
+        self.btc_earned = np.zeros((count, width))
+        self.cost = np.ones((count, width))
+        self.present = np.zeros((count, width), dtype=bool)
+        self.btc_price = np.empty(count)
+        self.timestamps = []
+        self.names = []
+        self.durations = []
+        self.sources = []
+
+        for i, snapshot in enumerate(snapshots):
+            self.btc_price[i] = snapshot.get("btc_price", 62000.0)
+            self.timestamps.append(snapshot.get("email_date") or snapshot.get("timestamp"))
+            self.sources.append({
+                key: snapshot[key] for key in ("message_id", "email_date") if key in snapshot
+            })
+            names, durations = {}, {}
+            for plan_id, plan in snapshot.get("plans", {}).items():
+                j = columns.get(plan_id)
+                if j is None:
+                    continue
+                self.btc_earned[i, j] = plan["btc_earned"]
+                self.cost[i, j] = plan["cost"]
+                self.present[i, j] = True
+                names[plan_id] = plan["name"]
+                durations[plan_id] = plan["duration"]
+            self.names.append(names)
+            self.durations.append(durations)
+
+    @classmethod
+    def from_history(cls, store, start=None, end=None) -> 'BatchROIEngine':
+        """تحميل اللقطات من ROIHistoryStore"""
+        if start is not None and end is not None:
+            snapshots = store.snapshots_between(start, end)
+        else:
+            snapshots = store.all_snapshots()
+        return cls(snapshots)
+
+    def compute(self, btc_price: Optional[Union[float, Sequence[float], np.ndarray]] = None) -> BatchROIResult:
+        """حساب المصفوفات؛ يمكن إعادة التقييم بسعر BTC ثابت أو سلسلة أسعار بديلة"""
+        if btc_price is None:
+            prices = self.btc_price
+        else:
+            prices = np.broadcast_to(np.asarray(btc_price, dtype=float), self.btc_price.shape).copy()
+
+        result = BatchROIResult(self, prices)
+        logger.info(f"تم حساب ROI المجمع: {len(prices)} لقطة × {len(self.plan_ids)} خطة")
+        return result
@@ -0,0 +1,405 @@
+#!/usr/bin/env python3
+"""
+مخزن سجل تحليلات ROI (SQLite مدمج)
+يحفظ اللقطات اليومية وصفوف الخطط مع فهارس على التاريخ ورقم الخطة
+"""
+
+import os
+import json
+import sqlite3
+import threading
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Union
+
+logger = logging.getLogger(__name__)
+
+HISTORY_DB_FILE = "/home/ubuntu/bitfufu_history.db"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS snapshots (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    timestamp TEXT NOT NULL,
+    message_id TEXT,
+    source TEXT UNIQUE,
+    btc_price REAL,
+    total_investment REAL,
+    total_returns REAL,
+    total_profit_loss REAL,
+    overall_roi REAL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_snapshots_timestamp ON snapshots(timestamp, id);
+
+CREATE TABLE IF NOT EXISTS plan_snapshots (
+    snapshot_id INTEGER NOT NULL REFERENCES snapshots(id) ON DELETE CASCADE,
+    plan_id TEXT NOT NULL,
+    timestamp TEXT NOT NULL,
+    name TEXT,
+    cost REAL,
+    duration INTEGER,
+    btc_earned REAL,
+    usd_earned REAL,
+    profit_loss REAL,
+    roi_percentage REAL,
+    PRIMARY KEY (snapshot_id, plan_id)
+);
+CREATE INDEX IF NOT EXISTS idx_plan_snapshots_plan ON plan_snapshots(plan_id, timestamp);
+
+CREATE TABLE IF NOT EXISTS processed_messages (
+    message_key TEXT PRIMARY KEY,
+    content_hash TEXT NOT NULL,
+    snapshot_id INTEGER REFERENCES snapshots(id) ON DELETE SET NULL,
+    processed_at TEXT NOT NULL,
+    results TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+DateLike = Union[str, datetime]
+
+
+def _to_timestamp(value: DateLike) -> str:
+    """تحويل التاريخ إلى نص ISO قابل للمقارنة"""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def snapshot_timestamp(analysis: Dict) -> str:
+    """وقت اللقطة: تاريخ البريد إن وجد، وإلا وقت التحليل"""
+    return analysis.get("email_date") or analysis.get("timestamp") or datetime.now().isoformat()
+
+
+class ROIHistoryStore:
+    """سجل تحليلات ROI مع استعلامات مفهرسة"""
+
+    def __init__(self, db_file: str = HISTORY_DB_FILE):
+        self.db_file = db_file
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(db_file, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA foreign_keys = ON")
+        self.conn.execute("PRAGMA journal_mode = WAL")
+        self.conn.executescript(_SCHEMA)
+        self.conn.commit()
+
+    def close(self):
+        """إغلاق قاعدة البيانات"""
+        with self._lock:
+            self.conn.close()
+
+    # ------------------------------------------------------------------
+    # الكتابة
+    # ------------------------------------------------------------------
+
+    def save_snapshot(self, analysis: Dict, source: Optional[str] = None) -> Optional[int]:
+        """حفظ لقطة تحليل مع صفوف الخطط، ويعيد معرف اللقطة"""
+        try:
+            with self._lock, self.conn:
+                return self._insert_snapshot(analysis, source)
+        except Exception as e:
+            logger.error(f"خطأ في حفظ اللقطة: {str(e)}")
+            return None
+
+    def save_snapshots(self, analyses: List[Dict]) -> int:
+        """حفظ مجموعة لقطات في معاملة واحدة"""
+        try:
+            with self._lock, self.conn:
+                for analysis in analyses:
+                    self._insert_snapshot(analysis, None)
+            return len(analyses)
+        except Exception as e:
+            logger.error(f"خطأ في حفظ اللقطات: {str(e)}")
+            return 0
+
+    def delete_snapshot(self, snapshot_id: int) -> bool:
+        """حذف لقطة مع صفوف خططها (عند استبدالها بتحليل أحدث لنفس الرسالة)"""
+        try:
+            with self._lock, self.conn:
+                self.conn.execute("DELETE FROM snapshots WHERE id = ?", (snapshot_id,))
+            return True
+        except Exception as e:
+            logger.error(f"خطأ في حذف اللقطة: {str(e)}")
+            return False
+
+    def update_snapshots(self, updates: List[tuple]) -> int:
+        """تحديث لقطات محفوظة (معرف اللقطة، التحليل الجديد) مع صفوف خططها في معاملة واحدة"""
+        try:
+            with self._lock, self.conn:
+                self.conn.executemany(
+                    """UPDATE snapshots SET btc_price = ?, total_investment = ?, total_returns = ?,
+                                            total_profit_loss = ?, overall_roi = ?, data = ?
+                       WHERE id = ?""",
+                    [
+                        (
+                            analysis.get("btc_price"), analysis.get("total_investment"),
+                            analysis.get("total_returns"), analysis.get("total_profit_loss"),
+                            analysis.get("overall_roi"), json.dumps(analysis, ensure_ascii=False),
+                            snapshot_id
+                        )
+                        for snapshot_id, analysis in updates
+                    ]
+                )
+                self.conn.executemany(
+                    """UPDATE plan_snapshots SET usd_earned = ?, profit_loss = ?, roi_percentage = ?
+                       WHERE snapshot_id = ? AND plan_id = ?""",
+                    [
+                        (plan.get("usd_earned"), plan.get("profit_loss"), plan.get("roi_percentage"),
+                         snapshot_id, plan_id)
+                        for snapshot_id, analysis in updates
+                        for plan_id, plan in analysis.get("plans", {}).items()
+                    ]
+                )
+            return len(updates)
+        except Exception as e:
+            logger.error(f"خطأ في تحديث اللقطات: {str(e)}")
+            return 0
+
+    def _insert_snapshot(self, analysis: Dict, source: Optional[str]) -> int:
+        timestamp = snapshot_timestamp(analysis)
+        cursor = self.conn.execute(
+            """INSERT INTO snapshots (timestamp, message_id, source, btc_price, total_investment,
+                                      total_returns, total_profit_loss, overall_roi, data)
+               VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+            (
+                timestamp,
+                analysis.get("message_id"),
+                source,
+                analysis.get("btc_price"),
+                analysis.get("total_investment"),
+                analysis.get("total_returns"),
+                analysis.get("total_profit_loss"),
+                analysis.get("overall_roi"),
+                json.dumps(analysis, ensure_ascii=False)
+            )
+        )
+        snapshot_id = cursor.lastrowid
+
+        self.conn.executemany(
+            """INSERT INTO plan_snapshots (snapshot_id, plan_id, timestamp, name, cost, duration,
+                                           btc_earned, usd_earned, profit_loss, roi_percentage)
+               VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+            [
+                (
+                    snapshot_id, plan_id, timestamp,
+                    plan.get("name"), plan.get("cost"), plan.get("duration"),
+                    plan.get("btc_earned"), plan.get("usd_earned"),
+                    plan.get("profit_loss"), plan.get("roi_percentage")
+                )
+                for plan_id, plan in analysis.get("plans", {}).items()
+            ]
+        )
+        return snapshot_id
+
+    # ------------------------------------------------------------------
+    # الاستعلامات (جميعها عبر فهرس timestamp)
+    # ------------------------------------------------------------------
+
+    def _query_one(self, sql: str, params: tuple = ()) -> Optional[Dict]:
+        with self._lock:
+            row = self.conn.execute(sql, params).fetchone()
+        return self._row_to_snapshot(row) if row else None
+
+    def _query_all(self, sql: str, params: tuple = ()) -> List[Dict]:
+        with self._lock:
+            rows = self.conn.execute(sql, params).fetchall()
+        return [self._row_to_snapshot(row) for row in rows]
+
+    def _row_to_snapshot(self, row: sqlite3.Row) -> Dict:
+        snapshot = json.loads(row["data"])
+        snapshot["snapshot_id"] = row["id"]
+        return snapshot
+
+    def get_snapshot(self, snapshot_id: int) -> Optional[Dict]:
+        """لقطة حسب معرفها"""
+        return self._query_one("SELECT id, data FROM snapshots WHERE id = ?", (snapshot_id,))
+
+    def snapshot_id_for_message(self, message_id: str) -> Optional[int]:
+        """معرف آخر لقطة محفوظة لرسالة معينة"""
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT id FROM snapshots WHERE message_id = ? ORDER BY id DESC LIMIT 1", (message_id,)
+            ).fetchone()
+        return row["id"] if row else None
+
+    def latest_snapshot(self) -> Optional[Dict]:
+        """آخر لقطة محفوظة"""
+        return self._query_one(
+            "SELECT id, data FROM snapshots ORDER BY timestamp DESC, id DESC LIMIT 1"
+        )
+
+    def previous_snapshot(self, before: DateLike) -> Optional[Dict]:
+        """آخر لقطة قبل وقت معين"""
+        return self._query_one(
+            "SELECT id, data FROM snapshots WHERE timestamp < ? "
+            "ORDER BY timestamp DESC, id DESC LIMIT 1",
+            (_to_timestamp(before),)
+        )
+
+    def snapshot_at(self, date: DateLike) -> Optional[Dict]:
+        """اللقطة السارية في تاريخ معين (آخر لقطة حتى نهاية ذلك اليوم إذا كان التاريخ بدون وقت)"""
+        timestamp = _to_timestamp(date)
+        if len(timestamp) == 10:
+            next_day = datetime.fromisoformat(timestamp) + timedelta(days=1)
+            return self.previous_snapshot(next_day.date().isoformat())
+        return self._query_one(
+            "SELECT id, data FROM snapshots WHERE timestamp <= ? "
+            "ORDER BY timestamp DESC, id DESC LIMIT 1",
+            (timestamp,)
+        )
+
+    def snapshots_between(self, start: DateLike, end: DateLike) -> List[Dict]:
+        """اللقطات ضمن نطاق زمني [start, end) بترتيب زمني"""
+        return self._query_all(
+            "SELECT id, data FROM snapshots WHERE timestamp >= ? AND timestamp < ? "
+            "ORDER BY timestamp, id",
+            (_to_timestamp(start), _to_timestamp(end))
+        )
+
+    def all_snapshots(self) -> List[Dict]:
+        """جميع اللقطات بترتيب زمني"""
+        return self._query_all("SELECT id, data FROM snapshots ORDER BY timestamp, id")
+
+    def plan_history(self, plan_id: str, start: Optional[DateLike] = None,
+                     end: Optional[DateLike] = None) -> List[Dict]:
+        """سجل خطة واحدة عبر الزمن"""
+        sql = "SELECT * FROM plan_snapshots WHERE plan_id = ?"
+        params = [plan_id]
+        if start is not None:
+            sql += " AND timestamp >= ?"
+            params.append(_to_timestamp(start))
+        if end is not None:
+            sql += " AND timestamp < ?"
+            params.append(_to_timestamp(end))
+        sql += " ORDER BY timestamp, snapshot_id"
+
+        with self._lock:
+            rows = self.conn.execute(sql, tuple(params)).fetchall()
+        return [dict(row) for row in rows]
+
+    def known_messages(self) -> Dict[str, set]:
+        """معرفات الرسائل وأوقات اللقطات المحفوظة (لتجنب تكرار الاستيراد)"""
+        with self._lock:
+            rows = self.conn.execute("SELECT message_id, timestamp FROM snapshots").fetchall()
+        return {
+            "message_ids": {row["message_id"] for row in rows if row["message_id"]},
+            "timestamps": {row["timestamp"] for row in rows}
+        }
+
+    def count(self) -> int:
+        """عدد اللقطات المحفوظة"""
+        with self._lock:
+            return self.conn.execute("SELECT COUNT(*) FROM snapshots").fetchone()[0]
+
+    # ------------------------------------------------------------------
+    # سجل الرسائل المعالجة (لتخطي إعادة معالجة نفس البريد)
+    # ------------------------------------------------------------------
+
+    def get_processed(self, message_key: str) -> Optional[Dict]:
+        """سجل معالجة رسالة: بصمة المحتوى واللقطة ونتائج التشغيل، أو None"""
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT * FROM processed_messages WHERE message_key = ?", (message_key,)
+            ).fetchone()
+        if not row:
+            return None
+        entry = dict(row)
+        entry["results"] = json.loads(entry["results"])
+        return entry
+
+    def record_processed(self, message_key: str, content_hash: str, snapshot_id: Optional[int],
+                         results: Dict) -> bool:
+        """تسجيل (أو تحديث) نتائج معالجة رسالة"""
+        try:
+            with self._lock, self.conn:
+                self.conn.execute(
+                    """INSERT INTO processed_messages (message_key, content_hash, snapshot_id, processed_at, results)
+                       VALUES (?, ?, ?, ?, ?)
+                       ON CONFLICT(message_key) DO UPDATE SET
+                           content_hash = excluded.content_hash,
+                           snapshot_id = excluded.snapshot_id,
+                           processed_at = excluded.processed_at,
+                           results = excluded.results""",
+                    (message_key, content_hash, snapshot_id, datetime.now().isoformat(),
+                     json.dumps(results, ensure_ascii=False))
+                )
+            return True
+        except Exception as e:
+            logger.error(f"خطأ في تسجيل الرسالة المعالجة: {str(e)}")
+            return False
+
+    # ------------------------------------------------------------------
+    # استيراد ملفات roi_analysis_*.json القديمة
+    # ------------------------------------------------------------------
+
+    def get_meta(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row["value"] if row else None
+
+    def set_meta(self, key: str, value: str):
+        with self._lock, self.conn:
+            self.conn.execute(
+                "INSERT INTO meta (key, value) VALUES (?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+                (key, value)
+            )
+
+    def import_json_files(self, directory: str = "/home/ubuntu") -> int:
+        """استيراد ملفات roi_analysis_*.json الموجودة (مرة واحدة لكل ملف)"""
+        try:
+            return self._import_json_files(directory)
+        except Exception as e:
+            logger.error(f"خطأ في استيراد ملفات التحليل: {str(e)}")
+            return 0
+
+    def _import_json_files(self, directory: str) -> int:
+        """الاستيراد الفعلي؛ أي خطأ يُلغي المعاملة كاملة ويُرفع للمستدعي"""
+        imported = 0
+        files = sorted(
+            entry.path for entry in os.scandir(directory)
+            if entry.is_file()
+            and entry.name.startswith("roi_analysis_")
+            and entry.name.endswith(".json")
+        )
+
+        with self._lock, self.conn:
+            existing = {
+                row["source"] for row in
+                self.conn.execute("SELECT source FROM snapshots WHERE source IS NOT NULL")
+            }
+            for path in files:
+                source = os.path.basename(path)
+                if source in existing:
+                    continue
+                try:
+                    with open(path, 'r', encoding='utf-8') as f:
+                        analysis = json.load(f)
+                except Exception as e:
+                    logger.warning(f"تعذر قراءة {source}: {str(e)}")
+                    continue
+                self._insert_snapshot(analysis, source)
+                imported += 1
+
+        logger.info(f"تم استيراد {imported} ملف تحليل سابق من {directory}")
+        return imported
+
+    def ensure_legacy_import(self, directory: str = "/home/ubuntu") -> int:
+        """تشغيل الاستيراد لمرة واحدة فقط لكل قاعدة بيانات
+
+        لا يُسجل الاستيراد كمنجز إلا بعد نجاحه، فيُعاد في التشغيل التالي عند الفشل
+        """
+        if self.get_meta("legacy_json_imported"):
+            return 0
+        try:
+            imported = self._import_json_files(directory)
+        except Exception as e:
+            logger.error(f"خطأ في استيراد ملفات التحليل: {str(e)}")
+            return 0
+        self.set_meta("legacy_json_imported", datetime.now().isoformat())
+        return imported
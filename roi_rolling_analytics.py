@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+"""
+تحليلات ROI التراكمية والمتحركة لكل خطة وللمحفظة
+تُحدّث الحالة بكل لقطة يومية جديدة بدون إعادة قراءة الأيام السابقة،
+وتُحفظ في سجل التحليلات بحجم ثابت لكل خطة (آخر 30 يوماً فقط)
+"""
+
+import json
+import math
+import logging
+from datetime import date, timedelta
+from typing import Dict, Iterable, Optional
+
+from roi_history_store import ROIHistoryStore, snapshot_timestamp
+
+logger = logging.getLogger(__name__)
+
+# نوافذ ROI المتحركة بالأيام
+ROLLING_WINDOWS = (7, 30)
+
+# مفتاح الحالة في جدول meta بسجل التحليلات
+ROLLING_STATE_KEY = "rolling_analytics"
+ROLLING_STATE_VERSION = 1
+
+# أقصى تاريخ لاستعلام اللقطات الجديدة
+_END_OF_TIME = "9999-12-31"
+
+
+def _ordinal(day: str) -> int:
+    return date.fromisoformat(day).toordinal()
+
+
+def _day_after(day: str, days: int) -> str:
+    return (date.fromisoformat(day) + timedelta(days=days)).isoformat()
+
+
+def _break_even(remaining_usd: float, daily_usd: Optional[float], as_of: str) -> Dict:
+    """يوم استرداد التكلفة المتوقع بمتوسط العائد اليومي الحالي"""
+    if remaining_usd <= 0:
+        return {"break_even_reached": True, "days_to_break_even": 0, "break_even_day": as_of}
+    if not daily_usd or daily_usd <= 0:
+        return {"break_even_reached": False, "days_to_break_even": None, "break_even_day": None}
+    days = math.ceil(remaining_usd / daily_usd)
+    return {"break_even_reached": False, "days_to_break_even": days, "break_even_day": _day_after(as_of, days)}
+
+
+class RollingAnalytics:
+    """مجاميع متحركة لكل خطة وللمحفظة تُحدّث لقطة بعد لقطة
+
+    btc_earned في اللقطات تراكمي لكل خطة (كما في ROIAnalyzer)، لذلك العائد خلال أي فترة
+    هو الفرق بين قيمتين، ويكفي الاحتفاظ بأول قيمة وآخرها وقيم آخر 30 يوماً
+    """
+
+    def __init__(self, state: Optional[Dict] = None):
+        self.state = state or self._empty_state()
+
+    @staticmethod
+    def _empty_state() -> Dict:
+        return {
+            "version": ROLLING_STATE_VERSION,
+            "last_timestamp": None,
+            "last_day": None,
+            "btc_price": 0.0,
+            "days": 0,
+            "plans": {}
+        }
+
+    # ------------------------------------------------------------------
+    # التحديث
+    # ------------------------------------------------------------------
+
+    def update(self, snapshot: Dict) -> bool:
+        """إضافة لقطة يومية بزمن ثابت لكل خطة
+
+        لقطة لنفس آخر يوم تحل محله، ويعيد False إذا كانت اللقطة أقدم من آخر يوم
+        (يجب إعادة البناء من السجل)
+        """
+        state = self.state
+        timestamp = snapshot_timestamp(snapshot)
+        day = timestamp[:10]
+        if state["last_day"] is not None and day < state["last_day"]:
+            return False
+
+        if day != state["last_day"]:
+            state["days"] += 1
+        state["last_day"] = day
+        state["last_timestamp"] = timestamp
+        state["btc_price"] = snapshot.get("btc_price", state["btc_price"])
+
+        max_window = max(ROLLING_WINDOWS)
+        oldest_needed = _day_after(day, -max_window)
+        for plan_id, plan in snapshot.get("plans", {}).items():
+            btc = plan["btc_earned"]
+            entry = state["plans"].get(plan_id)
+            if entry is None:
+                entry = state["plans"][plan_id] = {
+                    "first_day": day, "first_btc": btc, "last_day": day, "window": []
+                }
+            entry.update(name=plan.get("name"), cost=plan.get("cost"),
+                         duration=plan.get("duration"), btc=btc, last_day=day)
+            if entry["first_day"] == day:
+                entry["first_btc"] = btc
+
+            window = entry["window"]
+            if window and window[-1][0] == day:
+                window[-1][1] = btc
+            else:
+                window.append([day, btc])
+            # يكفي آخر قيمة قبل بداية أطول نافذة
+            while len(window) > 1 and window[1][0] <= oldest_needed:
+                window.pop(0)
+
+        # الخطط التي انتهت قبل أطول نافذة لم تعد تؤثر في أي مؤشر
+        for plan_id in [plan_id for plan_id, entry in state["plans"].items()
+                        if entry["last_day"] < oldest_needed]:
+            del state["plans"][plan_id]
+        return True
+
+    def rebuild(self, snapshots: Iterable[Dict]):
+        """إعادة بناء الحالة من جميع اللقطات بترتيب زمني"""
+        self.state = self._empty_state()
+        for snapshot in snapshots:
+            self.update(snapshot)
+
+    # ------------------------------------------------------------------
+    # المؤشرات
+    # ------------------------------------------------------------------
+
+    def _plan_figures(self, entry: Dict, as_of: str, btc_price: float) -> Dict:
+        elapsed = _ordinal(entry["last_day"]) - _ordinal(entry["first_day"])
+        avg_daily_btc = (entry["btc"] - entry["first_btc"]) / elapsed if elapsed > 0 else None
+        avg_daily_usd = avg_daily_btc * btc_price if avg_daily_btc is not None else None
+        cost = entry["cost"] or 0.0
+        usd_earned = entry["btc"] * btc_price
+
+        figures = {
+            "name": entry["name"],
+            "cumulative_btc": round(entry["btc"], 8),
+            "avg_daily_btc": round(avg_daily_btc, 8) if avg_daily_btc is not None else None,
+            "avg_daily_usd": round(avg_daily_usd, 2) if avg_daily_usd is not None else None,
+            "window_btc": {}
+        }
+        for days in ROLLING_WINDOWS:
+            earned = entry["btc"] - self._window_start_btc(entry, _day_after(as_of, -days))
+            figures["window_btc"][days] = earned
+            figures[f"roi_{days}d"] = round(earned * btc_price / cost * 100, 2) if cost else None
+
+        figures.update(_break_even(cost - usd_earned, avg_daily_usd, as_of))
+        end_day = _day_after(entry["first_day"], entry["duration"] - 1) if entry["duration"] else None
+        figures["end_day"] = end_day
+        figures["break_even_within_duration"] = (
+            figures["break_even_day"] is not None and end_day is not None and figures["break_even_day"] <= end_day
+        )
+        if end_day is not None and avg_daily_btc is not None and cost:
+            remaining_days = max(0, _ordinal(end_day) - _ordinal(as_of))
+            final_usd = (entry["btc"] + avg_daily_btc * remaining_days) * btc_price
+            figures["projected_roi_at_end"] = round((final_usd - cost) / cost * 100, 2)
+        else:
+            figures["projected_roi_at_end"] = None
+        return figures
+
+    @staticmethod
+    def _window_start_btc(entry: Dict, cutoff: str) -> float:
+        """القيمة التراكمية في بداية النافذة
+
+        للخطط التي بدأت متابعتها داخل النافذة تُستخدم أول قيمة مسجلة، لأن ما قبلها
+        (قبل بدء المتابعة أو قبل استيراد السجل) لم يُكسب داخل النافذة
+        """
+        start = entry["first_btc"]
+        for day, btc in entry["window"]:
+            if day > cutoff:
+                break
+            start = btc
+        return start
+
+    def summary(self) -> Dict:
+        """المؤشرات الحالية للخطط النشطة في آخر يوم وللمحفظة"""
+        state = self.state
+        as_of = state["last_day"]
+        if as_of is None:
+            return {}
+        btc_price = state["btc_price"]
+
+        plans = {
+            plan_id: self._plan_figures(entry, as_of, btc_price)
+            for plan_id, entry in state["plans"].items()
+            if entry["last_day"] == as_of
+        }
+        active = [state["plans"][plan_id] for plan_id in plans]
+        total_cost = sum(entry["cost"] or 0.0 for entry in active)
+        cumulative_btc = sum(entry["btc"] for entry in active)
+        daily = [figures["avg_daily_btc"] for figures in plans.values() if figures["avg_daily_btc"] is not None]
+        avg_daily_btc = sum(daily) if daily else None
+        avg_daily_usd = avg_daily_btc * btc_price if avg_daily_btc is not None else None
+
+        portfolio = {
+            "cumulative_btc": round(cumulative_btc, 8),
+            "avg_daily_btc": round(avg_daily_btc, 8) if avg_daily_btc is not None else None,
+            "avg_daily_usd": round(avg_daily_usd, 2) if avg_daily_usd is not None else None
+        }
+        for days in ROLLING_WINDOWS:
+            earned = sum(figures["window_btc"][days] for figures in plans.values())
+            portfolio[f"roi_{days}d"] = round(earned * btc_price / total_cost * 100, 2) if total_cost else None
+        portfolio.update(_break_even(total_cost - cumulative_btc * btc_price, avg_daily_usd, as_of))
+        end_days = [figures["end_day"] for figures in plans.values() if figures["end_day"]]
+        portfolio["end_day"] = max(end_days) if end_days else None
+        portfolio["break_even_within_duration"] = (
+            portfolio["break_even_day"] is not None and portfolio["end_day"] is not None
+            and portfolio["break_even_day"] <= portfolio["end_day"]
+        )
+
+        for figures in plans.values():
+            del figures["window_btc"]
+        return {
+            "as_of": as_of,
+            "btc_price": btc_price,
+            "days": state["days"],
+            "portfolio": portfolio,
+            "plans": plans
+        }
+
+    # ------------------------------------------------------------------
+    # الحفظ في سجل التحليلات
+    # ------------------------------------------------------------------
+
+    @classmethod
+    def load(cls, history_store: ROIHistoryStore) -> Optional['RollingAnalytics']:
+        """الحالة المحفوظة، أو None إذا لم تُحفظ بعد أو أُلغيت"""
+        try:
+            raw = history_store.get_meta(ROLLING_STATE_KEY)
+            if not raw:
+                return None
+            state = json.loads(raw)
+            if state.get("version") != ROLLING_STATE_VERSION:
+                return None
+            return cls(state)
+        except Exception as e:
+            logger.error(f"خطأ في تحميل حالة التحليلات المتحركة: {str(e)}")
+            return None
+
+    def save(self, history_store: ROIHistoryStore):
+        history_store.set_meta(ROLLING_STATE_KEY, json.dumps(self.state, ensure_ascii=False))
+
+
+def invalidate_rolling_analytics(history_store: ROIHistoryStore):
+    """إلغاء الحالة المحفوظة بعد إضافة لقطات قديمة (تُعاد بناؤها مرة واحدة في التشغيل التالي)"""
+    history_store.set_meta(ROLLING_STATE_KEY, "")
+
+
+def update_rolling_analytics(history_store: ROIHistoryStore, snapshot: Optional[Dict] = None) -> Dict:
+    """تحديث الحالة باللقطات الجديدة منذ آخر تحديث وحفظها، ويعيد المؤشرات الحالية
+
+    تُقرأ فقط اللقطات من آخر يوم مُطبّق فصاعداً (عبر فهرس timestamp)؛ وتُعاد قراءة السجل كاملاً
+    فقط عند أول استخدام أو بعد إلغاء الحالة أو عند حفظ لقطة أقدم من آخر يوم
+    """
+    try:
+        analytics = RollingAnalytics.load(history_store)
+        stale = analytics is None or (
+            snapshot is not None and snapshot_timestamp(snapshot)[:10] < analytics.state["last_day"]
+        )
+        if stale:
+            analytics = RollingAnalytics()
+            analytics.rebuild(history_store.all_snapshots())
+            logger.info(f"تمت إعادة بناء التحليلات المتحركة من {analytics.state['days']} يوم")
+        else:
+            start = analytics.state["last_timestamp"] or ""
+            for new_snapshot in history_store.snapshots_between(start, _END_OF_TIME):
+                if not analytics.update(new_snapshot):
+                    analytics.rebuild(history_store.all_snapshots())
+                    break
+        analytics.save(history_store)
+        return analytics.summary()
+
+    except Exception as e:
+        logger.error(f"خطأ في تحديث التحليلات المتحركة: {str(e)}")
+        return {}
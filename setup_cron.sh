@@ -1,39 +1,41 @@
 #!/bin/bash
 # سكريبت إعداد الجدولة اليومية لنظام مراقبة BitFuFu
+# يشغّل خدمة الجدولة الدائمة (bitfufu_scheduler_daemon.py) بدلاً من تشغيل عملية جديدة كل يوم
 
 echo "إعداد الجدولة اليومية..."
 
-# إنشاء سكريبت wrapper للتشغيل
-cat > /home/ubuntu/run_bitfufu_daily.sh << 'EOF'
-#!/bin/bash
-# سكريبت التشغيل اليومي
-
-# تسجيل بداية التشغيل
-echo "========================================" >> /home/ubuntu/bitfufu_cron.log
-echo "بدء التشغيل: $(date)" >> /home/ubuntu/bitfufu_cron.log
-
-# تشغيل السكريبت الرئيسي
-cd /home/ubuntu
-echo "test_group" | python3 /home/ubuntu/bitfufu_whatsapp_automation.py >> /home/ubuntu/bitfufu_cron.log 2>&1
-
-# تسجيل نهاية التشغيل
-echo "انتهى التشغيل: $(date)" >> /home/ubuntu/bitfufu_cron.log
-echo "========================================" >> /home/ubuntu/bitfufu_cron.log
+CONFIG_FILE=/home/ubuntu/bitfufu_scheduler.json
+GROUP_NAME="${1:-test_group}"
+
+# إنشاء ملف الإعداد الافتراضي (يومياً في 16:05 بتوقيت أبوظبي) إن لم يكن موجوداً
+if [ ! -f "$CONFIG_FILE" ]; then
+cat > "$CONFIG_FILE" << EOF
+{
+  "timezone": "Asia/Dubai",
+  "whatsapp_recipients": ["$GROUP_NAME"],
+  "incremental_sync": true,
+  "catch_up_hours": 12,
+  "retention": true,
+  "schedules": [
+    {"name": "daily", "time": "16:05"}
+  ]
+}
 EOF
+echo "✓ تم إنشاء ملف الإعداد: $CONFIG_FILE"
+fi
 
-# جعل السكريبت قابل للتنفيذ
-chmod +x /home/ubuntu/run_bitfufu_daily.sh
-
-# إضافة مهمة cron (يومياً في 12:05 UTC = 16:05 بتوقيت أبوظبي)
-CRON_JOB="5 12 * * * /home/ubuntu/run_bitfufu_daily.sh"
+# إزالة مهمة التشغيل اليومي القديمة وإضافة مراقب الخدمة:
+# كل 10 دقائق يتم تشغيل الخدمة إن لم تكن تعمل (تخرج فوراً إذا كانت نسخة أخرى تعمل)
+DAEMON_JOB="*/10 * * * * cd /home/ubuntu && nohup python3 /home/ubuntu/bitfufu_scheduler_daemon.py --config $CONFIG_FILE >> /home/ubuntu/bitfufu_cron.log 2>&1 &"
 
-# التحقق من وجود المهمة
-(crontab -l 2>/dev/null | grep -v "run_bitfufu_daily.sh"; echo "$CRON_JOB") | crontab -
+(crontab -l 2>/dev/null | grep -v "run_bitfufu_daily.sh" | grep -v "bitfufu_scheduler_daemon.py"; echo "$DAEMON_JOB") | crontab -
+rm -f /home/ubuntu/run_bitfufu_daily.sh
 
 echo "✓ تم إعداد الجدولة اليومية"
-echo "  - الوقت: يومياً في 16:05 بتوقيت أبوظبي (12:05 UTC)"
-echo "  - السكريبت: /home/ubuntu/run_bitfufu_daily.sh"
+echo "  - الإعداد: $CONFIG_FILE"
+echo "  - الخدمة: /home/ubuntu/bitfufu_scheduler_daemon.py"
 echo "  - السجل: /home/ubuntu/bitfufu_cron.log"
 echo ""
 echo "لعرض المهام المجدولة: crontab -l"
+echo "لإيقاف الخدمة: pkill -f bitfufu_scheduler_daemon.py"
 echo "لإلغاء الجدولة: crontab -r"
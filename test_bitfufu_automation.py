@@ -4,15 +4,244 @@
 """
 
 import sys
+import tempfile
 from bitfufu_whatsapp_automation import BitFuFuAutomation
 
+
+def create_offline_automation(**kwargs) -> BitFuFuAutomation:
+    """نظام يعمل بدون اتصال: خدمة Gmail وهمية برسائل اصطناعية وسجل ومجلد مؤقتان"""
+    from bitfufu_fakes import FakeGmailService, make_revenue_journal_history
+    from gmail_bitfufu_monitor import BitFuFuGmailMonitor, MINING_PLANS
+    from bitfufu_plan_registry import PlanRegistry
+    from roi_history_store import ROIHistoryStore
+    
+    work_dir = tempfile.mkdtemp(prefix="bitfufu_offline_")
+    plans = {plan_id: 0.0002 * (i + 1) for i, plan_id in enumerate(MINING_PLANS)}
+    service = FakeGmailService(make_revenue_journal_history(7, plans))
+    
+    automation = BitFuFuAutomation(
+        whatsapp_group_name="",
+        gmail_monitor=BitFuFuGmailMonitor(sync_state_file=f"{work_dir}/sync_state.json",
+                                          gmail_service=service,
+                                          plan_registry=PlanRegistry(f"{work_dir}/plans.json")),
+        history_store=ROIHistoryStore(f"{work_dir}/history.db"),
+        report_dir=work_dir,
+        legacy_json_dir=work_dir,
+        **kwargs
+    )
+    automation.metrics_dir = work_dir
+    return automation
+
+
+def check_mime_fixtures() -> bool:
+    """استخراج نص البريد من أشكال MIME المختلفة: الأجزاء المتداخلة، وجلب المرفق فقط إذا كان هو النص"""
+    from datetime import datetime
+    from bitfufu_fakes import FakeGmailService, make_mime_fixture_message, MIME_FIXTURE_LAYOUTS
+    from gmail_bitfufu_monitor import BitFuFuGmailMonitor, MINING_PLANS
+    from bitfufu_plan_registry import PlanRegistry
+    
+    plans = {plan_id: 0.0001 * (i + 1) for i, plan_id in enumerate(MINING_PLANS)}
+    success = True
+    for layout in MIME_FIXTURE_LAYOUTS:
+        message, attachments = make_mime_fixture_message(
+            layout, f"mime-{layout}", datetime(2025, 10, 7, 12, 0, 0), 61000.0, plans,
+            attachment_bytes=1_000_000
+        )
+        service = FakeGmailService([message], attachments={message["id"]: attachments})
+        monitor = BitFuFuGmailMonitor(gmail_service=service, plan_registry=PlanRegistry(None))
+        
+        email_data = monitor.extract_email_data(message)
+        monitor.message_fingerprint(message)
+        fetched = service.calls['messages.attachments.get']
+        # المرفق يُجلب مرة واحدة فقط وفقط عندما يكون النص نفسه في مرفق
+        expected_fetches = 1 if layout == "body_attachment" else 0
+        ok = bool(email_data) and len(email_data["plans"]) == len(plans) and fetched == expected_fetches
+        success = success and ok
+        print(f"  {'✓' if ok else '❌'} {layout}: {len(email_data['plans']) if email_data else 0} خطط، "
+              f"{fetched} مرفق مجلوب")
+    return success
+
+
+def check_plan_rows() -> bool:
+    """أرقام الخطط تُقرأ من صفوف الجدول فقط، لا من أرقام عابرة في نص الرسالة"""
+    from bitfufu_fakes import make_revenue_journal_body
+    from bitfufu_email_parser import RevenueJournalParser
+    
+    plans = {"95936": 0.00012, "95735": 0.00034}
+    noise = "Block 918234 reward 3.125 BTC\nOrder 123456: paid 0.5 BTC fee\n"
+    parser = RevenueJournalParser()
+    success = True
+    for html in (False, True):
+        body = make_revenue_journal_body(61000.0, plans, html=html)
+        body = body.replace("BitFuFu Revenue Journal", "BitFuFu Revenue Journal\n" + noise, 1)
+        found = parser.parse(body)["plans"]
+        ok = found == plans
+        success = success and ok
+        print(f"  {'✓' if ok else '❌'} {'HTML' if html else 'نص'}: {sorted(found)}")
+    
+    # رقم الخطة في خلية مستقلة دون كلمة Plan
+    found = parser.parse("<table><tr><td>95936</td><td>0.00012 BTC</td></tr></table>")["plans"]
+    ok = found == {"95936": 0.00012}
+    print(f"  {'✓' if ok else '❌'} خلية مستقلة: {sorted(found)}")
+    return success and ok
+
+
+def check_rolling_analytics() -> bool:
+    """ROI المتحرك لخطة بدأت متابعتها وفيها عائد سابق: العائد داخل النافذة فقط"""
+    from datetime import date, timedelta
+    from roi_rolling_analytics import RollingAnalytics
+    
+    # 0.001 BTC قبل بدء المتابعة ثم 0.00001 يومياً لمدة 40 يوماً بسعر 60,000$ وتكلفة 100$
+    analytics = RollingAnalytics()
+    start = date(2026, 1, 1)
+    checks = []
+    for day in range(40):
+        analytics.update({
+            "timestamp": f"{start + timedelta(days=day)}T12:00:00",
+            "btc_price": 60000.0,
+            "plans": {"1": {"name": "خطة", "cost": 100.0, "duration": 60, "btc_earned": 0.001 + 0.00001 * day}}
+        })
+        if day in (2, 39):
+            checks.append(analytics.summary())
+    
+    # بعد 3 أيام: يومان من العائد في النافذتين؛ بعد 40 يوماً: 7 و30 يوماً كاملة
+    expected = [(1.2, 1.2), (4.2, 18.0)]
+    success = True
+    for summary, (roi_7d, roi_30d) in zip(checks, expected):
+        plan = summary["plans"]["1"]
+        portfolio = summary["portfolio"]
+        ok = (plan["roi_7d"] == roi_7d and plan["roi_30d"] == roi_30d
+              and portfolio["roi_7d"] == roi_7d and portfolio["roi_30d"] == roi_30d
+              and plan["avg_daily_btc"] == 0.00001)
+        success = success and ok
+        print(f"  {'✓' if ok else '❌'} {summary['as_of']}: ROI 7 أيام {plan['roi_7d']}% (المتوقع {roi_7d}%)، "
+              f"30 يوماً {plan['roi_30d']}% (المتوقع {roi_30d}%)")
+    return success
+
+
+def check_retention(report_files: dict) -> bool:
+    """أرشفة التقرير المنشأ كأنه أقدم من مدة الاحتفاظ، ثم استرجاعه من الأرشيف بدون فكه كاملاً"""
+    import os
+    from datetime import datetime, timedelta
+    from bitfufu_retention import RetentionEngine, RetentionPolicy, DEFAULT_KEEP_DAYS
+    
+    report_dir = os.path.dirname(report_files['markdown'])
+    name = os.path.basename(report_files['markdown'])
+    with open(report_files['markdown'], 'rb') as f:
+        original = f.read()
+    
+    later = datetime.now() + timedelta(days=DEFAULT_KEEP_DAYS + 1)
+    policy = RetentionPolicy("reports", report_dir, ["bitfufu_report_*.md"])
+    engine = RetentionEngine([policy], os.path.join(report_dir, "archive"), clock=lambda: later)
+    dry = engine.run(dry_run=True)
+    stats = engine.run()
+    restored = engine.retrieve(name, os.path.join(report_dir, "restored"))
+    with open(restored or os.devnull, 'rb') as f:
+        ok = dry["files"] == stats["files"] == 1 and not os.path.exists(report_files['markdown']) and f.read() == original
+    print(f"  {'✓' if ok else '❌'} {stats['files']} ملف مؤرشف، "
+          f"{stats['reclaimed_bytes']} بايت مستعادة (التجربة: {dry['reclaimed_bytes']})")
+    return ok
+
+
+def check_incremental_resend() -> bool:
+    """التزامن التدريجي مع فشل WhatsApp: التشغيل التالي يعيد نفس الرسالة ويرسل للمستلم المتبقي"""
+    from bitfufu_fakes import FakeWebDriver, WebDriverException
+    from whatsapp_web_sender import WhatsAppWebSender
+    
+    def unavailable_browser():
+        raise WebDriverException("chrome not reachable")
+    
+    automation = create_offline_automation(whatsapp_recipients=["BitFuFu"], incremental_sync=True,
+                                           use_sender_daemon=False)
+    automation.whatsapp_sender = WhatsAppWebSender(driver_factory=unavailable_browser)
+    first = automation.run_complete_automation()
+    
+    driver = FakeWebDriver(contacts=["BitFuFu"])
+    launches = []
+    automation.whatsapp_sender = WhatsAppWebSender(driver_factory=lambda: launches.append(driver) or driver)
+    second = automation.run_complete_automation()
+    sent_second = [chat for chat, _ in driver.sent_messages]
+    
+    # بعد الإرسال لجميع المستلمين تُحفظ نقطة التزامن فلا يُعاد الإرسال، ولا يُفتح المتصفح
+    launches_second = len(launches)
+    third = automation.run_complete_automation()
+    gmail_status = automation.scheduler.status("gmail")
+    ok = (not first and second and sent_second == ["BitFuFu"] and third
+          and automation.no_new_messages and len(driver.sent_messages) == 1
+          and gmail_status == "succeeded" and len(launches) == launches_second)
+    print(f"  {'✓' if ok else '❌'} التشغيل الأول: {'نجح' if first else 'فشل'}، "
+          f"الثاني أرسل إلى {sent_second}، الثالث: {'لا جديد' if automation.no_new_messages else 'أعاد المعالجة'}")
+    return ok
+
+
+def check_missed_days() -> bool:
+    """بعد انقطاع التشغيل لعدة أيام: تُحفظ لقطة لكل رسالة جديدة بالترتيب ويُرسل تقرير الأحدث فقط"""
+    from datetime import datetime, timedelta
+    from bitfufu_fakes import FakeWebDriver, make_revenue_journal_message
+    from gmail_bitfufu_monitor import MINING_PLANS
+    from whatsapp_web_sender import WhatsAppWebSender
+    
+    automation = create_offline_automation(whatsapp_recipients=["BitFuFu"], incremental_sync=True,
+                                           use_sender_daemon=False)
+    drivers = []
+    
+    def new_browser():
+        drivers.append(FakeWebDriver(contacts=["BitFuFu"]))
+        return drivers[-1]
+    
+    automation.whatsapp_sender = WhatsAppWebSender(driver_factory=new_browser)
+    first = automation.run_complete_automation()
+    
+    service = automation.gmail_monitor.gmail_service
+    latest = datetime.fromisoformat(automation.analysis_data["email_date"])
+    for day in range(1, 4):
+        plans = {plan_id: 0.001 * (day + 1) for plan_id in MINING_PLANS}
+        service.add_message(make_revenue_journal_message(f"missed{day}", latest + timedelta(days=day),
+                                                         61000.0 + day, plans))
+    second = automation.run_complete_automation()
+    
+    days = [snapshot["email_date"][:10] for snapshot in automation.history_store.all_snapshots()]
+    expected = [(latest + timedelta(days=day)).date().isoformat() for day in range(4)]
+    sent = sum(len(driver.sent_messages) for driver in drivers)
+    ok = (first and second and days[-4:] == expected and days == sorted(days)
+          and automation.analysis_data["email_date"][:10] == expected[-1]
+          and automation.rolling_data.get("as_of") == expected[-1]
+          and sent == 2)
+    print(f"  {'✓' if ok else '❌'} لقطات الأيام: {days[-4:]}، التقرير عن {automation.analysis_data['email_date'][:10]}، "
+          f"{sent} رسائل مرسلة")
+    return ok
+
+
 def main():
+    offline = "--offline" in sys.argv
     print("\n" + "=" * 60)
-    print("اختبار نظام مراقبة BitFuFu")
+    print("اختبار نظام مراقبة BitFuFu" + (" (بدون اتصال)" if offline else ""))
     print("=" * 60 + "\n")
     
     # إنشاء النظام بدون إرسال WhatsApp
-    automation = BitFuFuAutomation(whatsapp_group_name="")
+    if offline:
+        automation = create_offline_automation()
+    else:
+        automation = BitFuFuAutomation(whatsapp_group_name="")
+    
+    if offline:
+        print("[0/3] أشكال رسائل MIME...")
+        if not check_mime_fixtures():
+            print("❌ فشل استخراج نص البريد من أشكال MIME")
+            return False
+        print("✓ تم استخراج نص البريد من جميع الأشكال\n")
+        
+        print("[0/3] صفوف الخطط...")
+        if not check_plan_rows():
+            print("❌ استُخرجت خطط من خارج صفوف الجدول")
+            return False
+        print("✓ الخطط مستخرجة من صفوف الجدول فقط\n")
+        
+        print("[0/3] ROI المتحرك...")
+        if not check_rolling_analytics():
+            print("❌ ROI المتحرك غير صحيح")
+            return False
+        print("✓ ROI المتحرك صحيح\n")
     
     print("تشغيل العملية (بدون إرسال WhatsApp)...\n")
     
@@ -20,7 +249,7 @@ def main():
     try:
         # المرحلة 1: جمع البيانات
         print("[1/3] جمع البيانات...")
-        email_data = automation._collect_gmail_data()
+        email_data = automation._run_stage("gmail", automation._collect_gmail_data)
         if not email_data:
             print("❌ فشل جمع البيانات")
             return False
@@ -28,19 +257,26 @@ def main():
         
         # المرحلة 2: تحليل ROI
         print("[2/3] تحليل ROI...")
-        if not automation._analyze_roi(email_data):
+        if not automation._run_stage("analysis", automation._analyze_roi, email_data):
             print("❌ فشل تحليل ROI")
             return False
         print("✓ تم تحليل ROI\n")
         
         # المرحلة 3: إنشاء التقرير
         print("[3/3] إنشاء التقرير...")
-        report_files = automation._generate_report()
+        report_files = automation._run_stage("report", automation._generate_report)
         if not report_files:
             print("❌ فشل إنشاء التقرير")
             return False
         print("✓ تم إنشاء التقرير\n")
         
+        if offline:
+            print("أرشفة التقرير واسترجاعه...")
+            if not check_retention(report_files):
+                print("❌ فشل أرشفة التقرير أو استرجاعه")
+                return False
+            print("✓ تم استرجاع التقرير من الأرشيف\n")
+        
         # عرض النتائج
         print("=" * 60)
         print("النتائج:")
@@ -59,6 +295,33 @@ def main():
         print(automation._create_whatsapp_message())
         print("-" * 60)
         
+        # تقرير زمن البدء لكل مرحلة
+        report = automation.get_startup_report()
+        print(f"\nزمن استيراد الوحدات: {report['module_import_seconds']:.3f}s")
+        for stage in report["stages"]:
+            print(f"  {stage['stage']}: {stage['seconds']:.3f}s ({stage['modules_loaded']} وحدة محمّلة)")
+        
+        # مسار Gmail/التقارير لا يحتاج Selenium
+        print(f"Selenium محمّل: {'selenium' in sys.modules}")
+        
+        # حفظ مقاييس الأداء
+        metrics_files = automation.write_metrics()
+        print(f"مقاييس Prometheus: {metrics_files.get('prometheus')}")
+        print(f"ملخص JSON: {metrics_files.get('json')}")
+        
+        if offline:
+            print("\nإعادة الإرسال بعد فشل WhatsApp في التزامن التدريجي...")
+            if not check_incremental_resend():
+                print("❌ لم يُرسل التقرير بعد فشل التشغيل الأول")
+                return False
+            print("✓ تم الإرسال في التشغيل التالي بدون تكرار")
+            
+            print("\nالرسائل الفائتة بعد انقطاع التشغيل...")
+            if not check_missed_days():
+                print("❌ لم تُحفظ جميع الرسائل الفائتة في السجل")
+                return False
+            print("✓ حُفظت كل الرسائل الفائتة بالترتيب وأُرسل تقرير الأحدث")
+        
         return True
         
     except Exception as e:
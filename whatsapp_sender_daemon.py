@@ -0,0 +1,344 @@
+#!/usr/bin/env python3
+"""
+خدمة إرسال WhatsApp Web الدائمة
+تحافظ على جلسة متصفح واحدة مسجلة الدخول وتستقبل مهام الإرسال عبر Unix socket محلي
+"""
+
+import os
+import sys
+import json
+import time
+import queue
+import select
+import signal
+import socket
+import logging
+import threading
+import socketserver
+from typing import Callable, Dict, List, Optional
+
+from whatsapp_web_sender import WhatsAppWebSender
+from bitfufu_metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+SOCKET_PATH = "/home/ubuntu/whatsapp_sender.sock"
+HEALTH_CHECK_INTERVAL = 60
+SEND_TIMEOUT = 300
+# الفاصل بين فحوص اتصال العميل أثناء انتظار نتيجة مهمته
+CLIENT_POLL_INTERVAL = 1.0
+
+
+class SendJob:
+    """مهمة إرسال واحدة في طابور الخدمة"""
+
+    def __init__(self, contact_name: str, message: str, pdf_file: Optional[str] = None,
+                 skip_if_sent: bool = False):
+        self.contact_name = contact_name
+        self.message = message
+        self.pdf_file = pdf_file
+        # التحقق من المحادثة قبل الإرسال (محاولة سابقة بنتيجة غير معروفة)
+        self.skip_if_sent = skip_if_sent
+        self.done = threading.Event()
+        self.result = {"success": False}
+        self.started = False
+        self.cancelled = False
+        self._lock = threading.Lock()
+
+    def start(self) -> bool:
+        """بدء التنفيذ، أو False إذا أُلغيت المهمة قبل بدئها"""
+        with self._lock:
+            if self.cancelled:
+                return False
+            self.started = True
+            return True
+
+    def cancel(self) -> bool:
+        """إلغاء مهمة لم يبدأ تنفيذها؛ False إذا كان التنفيذ قد بدأ"""
+        with self._lock:
+            if self.started:
+                return False
+            self.cancelled = True
+            return True
+
+    def finish(self, success: bool, error: Optional[str] = None, seconds: float = 0.0,
+               steps: Optional[List[Dict]] = None):
+        self.result = {"success": success, "seconds": round(seconds, 3), "steps": steps or []}
+        if error:
+            self.result["error"] = error
+        self.done.set()
+
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+    """بروتوكول بسيط: سطر JSON للطلب وسطر JSON للرد"""
+
+    def handle(self):
+        try:
+            request = json.loads(self.rfile.readline().decode('utf-8'))
+            response = self.server.daemon.handle_request(request, self._client_connected)
+        except Exception as e:
+            response = {"success": False, "error": str(e)}
+        try:
+            self.wfile.write((json.dumps(response, ensure_ascii=False) + "\n").encode('utf-8'))
+        except OSError:
+            pass
+
+    def _client_connected(self) -> bool:
+        """العميل ما زال ينتظر الرد (لم يُغلق الاتصال)"""
+        try:
+            readable, _, _ = select.select([self.connection], [], [], 0)
+            return not readable or self.connection.recv(1, socket.MSG_PEEK) != b""
+        except OSError:
+            return False
+
+
+class _UnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+class WhatsAppSenderDaemon:
+    """خدمة إرسال بجلسة WhatsApp Web دافئة"""
+
+    def __init__(self, socket_path: str = SOCKET_PATH,
+                 sender: Optional[WhatsAppWebSender] = None,
+                 headless: bool = False,
+                 health_check_interval: float = HEALTH_CHECK_INTERVAL):
+        self.socket_path = socket_path
+        self.sender = sender or WhatsAppWebSender()
+        self.headless = headless
+        self.health_check_interval = health_check_interval
+        self.jobs = queue.Queue()
+        self.restarts = 0
+        self.sent_count = 0
+        # حالة الجلسة كما فحصها عامل الإرسال آخر مرة (WebDriver لا يُستخدم إلا من خيط العامل)
+        self.healthy = False
+        self.last_health_check = None
+        self._stop = threading.Event()
+        self._server = None
+        self._threads = []
+
+    # ------------------------------------------------------------------
+    # دورة حياة الجلسة
+    # ------------------------------------------------------------------
+
+    def _set_health(self, healthy: bool) -> bool:
+        self.healthy = healthy
+        self.last_health_check = time.time()
+        return healthy
+
+    def _check_health(self) -> bool:
+        """فحص الجلسة وتحديث حالتها (من خيط العامل فقط)"""
+        return self._set_health(self.sender.is_session_healthy())
+
+    def _restart_session(self) -> bool:
+        """إغلاق الجلسة الحالية وفتح جلسة جديدة"""
+        self.sender.close_browser()
+        self.restarts += 1
+        logger.warning(f"إعادة تشغيل جلسة WhatsApp Web (#{self.restarts})")
+        return self._set_health(self.sender.start_session(headless=self.headless))
+
+    def _ensure_session(self) -> bool:
+        """التأكد من وجود جلسة سليمة قبل الإرسال"""
+        if self._check_health():
+            return True
+        return self._restart_session()
+
+    def start(self, serve_socket: bool = True) -> bool:
+        """فتح الجلسة وتشغيل عامل الإرسال والخادم المحلي"""
+        if not self._set_health(self.sender.start_session(headless=self.headless)):
+            logger.error("فشل فتح جلسة WhatsApp Web")
+            return False
+
+        self._stop.clear()
+        self._threads = [
+            threading.Thread(target=self._worker_loop, name="whatsapp-sender", daemon=True)
+        ]
+
+        if serve_socket:
+            if os.path.exists(self.socket_path):
+                os.remove(self.socket_path)
+            self._server = _UnixServer(self.socket_path, _RequestHandler)
+            self._server.daemon = self
+            os.chmod(self.socket_path, 0o600)
+            self._threads.append(threading.Thread(
+                target=self._server.serve_forever, name="whatsapp-socket", daemon=True
+            ))
+
+        for thread in self._threads:
+            thread.start()
+
+        logger.info(f"خدمة إرسال WhatsApp جاهزة: {self.socket_path if serve_socket else 'داخل العملية'}")
+        return True
+
+    def stop(self):
+        """إيقاف الخدمة وإغلاق المتصفح"""
+        self._stop.set()
+        self.jobs.put(None)
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+            if os.path.exists(self.socket_path):
+                os.remove(self.socket_path)
+        for thread in self._threads:
+            thread.join(timeout=10)
+        self._threads = []
+        self.sender.close_browser()
+        logger.info("تم إيقاف خدمة إرسال WhatsApp")
+
+    # ------------------------------------------------------------------
+    # المهام
+    # ------------------------------------------------------------------
+
+    def submit(self, contact_name: str, message: str, pdf_file: Optional[str] = None,
+               timeout: float = SEND_TIMEOUT, skip_if_sent: bool = False,
+               client_connected: Optional[Callable[[], bool]] = None) -> Dict:
+        """إضافة مهمة إرسال وانتظار نتيجتها
+
+        إذا انتهت المهلة أو أغلق العميل الاتصال تُلغى المهمة إن لم يبدأ تنفيذها، حتى لا تُرسل
+        لاحقاً بعد أن يكون العميل قد اعتبرها فاشلة؛ وإن بدأ تنفيذها فالنتيجة غير معروفة
+        """
+        job = SendJob(contact_name, message, pdf_file, skip_if_sent)
+        self.jobs.put(job)
+        deadline = time.monotonic() + timeout
+        while not job.done.wait(max(0.0, min(CLIENT_POLL_INTERVAL, deadline - time.monotonic()))):
+            gone = client_connected is not None and not client_connected()
+            if not gone and time.monotonic() < deadline:
+                continue
+            reason = "client disconnected" if gone else "timeout"
+            if job.cancel():
+                logger.warning(f"تم إلغاء مهمة الإرسال إلى {contact_name} قبل تنفيذها ({reason})")
+                return {"success": False, "error": reason, "cancelled": True}
+            logger.warning(f"مهمة الإرسال إلى {contact_name} قيد التنفيذ ({reason}) - النتيجة غير معروفة")
+            return {"success": False, "error": reason, "unknown": True}
+        return job.result
+
+    def handle_request(self, request: Dict,
+                       client_connected: Optional[Callable[[], bool]] = None) -> Dict:
+        """معالجة طلب وارد من الـ socket"""
+        action = request.get("action", "send")
+        if action == "ping":
+            # من حالة العامل بدون لمس المتصفح (WebDriver غير آمن للاستخدام من عدة خيوط)
+            return {
+                "success": True,
+                "healthy": self.healthy,
+                "last_health_check": self.last_health_check,
+                "queued": self.jobs.qsize(),
+                "sent": self.sent_count,
+                "restarts": self.restarts
+            }
+        if action == "send":
+            return self.submit(
+                request["contact"],
+                request["message"],
+                request.get("pdf_file"),
+                timeout=request.get("timeout", SEND_TIMEOUT),
+                skip_if_sent=request.get("skip_if_sent", False),
+                client_connected=client_connected
+            )
+        if action == "metrics":
+            # مقاييس خطوات الإرسال منذ بدء الخدمة
+            return {"success": True, "metrics": REGISTRY.to_dict()}
+        return {"success": False, "error": f"unknown action: {action}"}
+
+    def _worker_loop(self):
+        """تنفيذ المهام بالتسلسل على الجلسة الدافئة مع فحص دوري للصحة"""
+        while not self._stop.is_set():
+            try:
+                job = self.jobs.get(timeout=self.health_check_interval)
+            except queue.Empty:
+                # فحص الصحة أثناء الخمول
+                if not self._check_health():
+                    self._restart_session()
+                continue
+
+            if job is None:
+                break
+            self._run_job(job)
+
+    def _run_job(self, job: SendJob):
+        if not job.start():
+            logger.info(f"تخطي مهمة ملغاة: {job.contact_name}")
+            return
+        start = time.perf_counter()
+        self.sender.reset_step_timings()
+        try:
+            # محاولة واحدة إضافية إذا كان الفشل بسبب الجلسة نفسها؛ قبل إعادة المحاولة يُتحقق
+            # من آخر رسالة في المحادثة لأن المحاولة الأولى قد تكون أرسلتها قبل توقف الجلسة
+            for attempt in range(2):
+                if not self._ensure_session():
+                    continue
+                if self.sender.send_in_session(job.contact_name, job.message, job.pdf_file,
+                                               skip_if_sent=job.skip_if_sent or attempt > 0):
+                    self.sent_count += 1
+                    job.finish(True, seconds=time.perf_counter() - start,
+                               steps=self.sender.get_step_timings())
+                    return
+                if self._check_health():
+                    break
+
+            job.finish(False, "send failed", time.perf_counter() - start,
+                       self.sender.get_step_timings())
+
+        except Exception as e:
+            logger.error(f"خطأ في تنفيذ مهمة الإرسال: {str(e)}")
+            job.finish(False, str(e), time.perf_counter() - start)
+
+
+def send_via_daemon(contact_name: str, message: str, pdf_file: Optional[str] = None,
+                    socket_path: str = SOCKET_PATH, timeout: float = SEND_TIMEOUT,
+                    skip_if_sent: bool = False) -> Optional[Dict]:
+    """إرسال عبر الخدمة الدائمة؛ يعيد نتيجة الإرسال، أو None إذا كانت الخدمة غير متاحة
+    
+    إذا انقطع الاتصال بعد وصول الطلب للخدمة تكون النتيجة {"success": False, "unknown": True}:
+    المهمة قد تكون أُرسلت أو ما زالت في طابور الخدمة، فلا يجب إرسالها بطريقة أخرى
+    """
+    if not os.path.exists(socket_path):
+        return None
+
+    request = {
+        "action": "send",
+        "contact": contact_name,
+        "message": message,
+        "pdf_file": os.path.abspath(pdf_file) if pdf_file else None,
+        "timeout": timeout,
+        "skip_if_sent": skip_if_sent
+    }
+
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+        client.settimeout(timeout + 10)
+        try:
+            client.connect(socket_path)
+        except OSError as e:
+            # يشمل رفض الاتصال، والمقبس المحذوف أو القديم (ENOTSOCK)، ومقبس مستخدم آخر (PermissionError)
+            logger.warning(f"خدمة إرسال WhatsApp غير متاحة: {str(e)}")
+            return None
+
+        try:
+            client.sendall((json.dumps(request, ensure_ascii=False) + "\n").encode('utf-8'))
+            response = json.loads(client.makefile('rb').readline().decode('utf-8'))
+        except (OSError, ValueError) as e:
+            logger.warning(f"لم يصل رد خدمة الإرسال لـ {contact_name} (نتيجة غير معروفة): {str(e)}")
+            return {"contact": contact_name, "success": False, "error": "no response", "unknown": True}
+
+    if not response.get("success"):
+        logger.error(f"فشل الإرسال عبر الخدمة: {response.get('error')}")
+    return dict(response, contact=contact_name, success=bool(response.get("success")))
+
+
+def main():
+    """تشغيل الخدمة في المقدمة حتى الإيقاف"""
+    daemon = WhatsAppSenderDaemon(headless="--headless" in sys.argv)
+    if not daemon.start():
+        sys.exit(1)
+
+    stop_event = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stop_event.set())
+    signal.signal(signal.SIGINT, lambda *_: stop_event.set())
+    stop_event.wait()
+
+    daemon.stop()
+
+
+if __name__ == "__main__":
+    main()
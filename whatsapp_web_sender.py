@@ -7,15 +7,14 @@ import os
 import time
 import json
 import logging
-from typing import Optional
-from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.common.keys import Keys
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.chrome.options import Options
-from webdriver_manager.chrome import ChromeDriverManager
+import functools
+import importlib
+from typing import Callable, Dict, List, Optional
+
+from bitfufu_metrics import REGISTRY
+
+# ملاحظة: Selenium وwebdriver_manager يُستوردان داخل الدوال عند الحاجة فقط،
+# حتى لا يتحمل مسار Gmail/التقارير زمن تحميلهما عند استيراد هذه الوحدة
 
 # إعداد السجلات
 logging.basicConfig(
@@ -28,13 +27,89 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# محددات عناصر واجهة WhatsApp Web
+SEARCH_BOX_XPATH = '//div[@contenteditable="true"][@data-tab="3"]'
+MESSAGE_BOX_XPATH = '//div[@contenteditable="true"][@data-tab="10"]'
+CONTACT_XPATH = '//span[@title="{contact_name}"]'
+ATTACH_BUTTON_XPATH = '//div[@title="Attach"]'
+FILE_INPUT_XPATH = '//input[@accept="*"]'
+SEND_BUTTON_XPATH = '//span[@data-icon="send"]'
+QR_CODE_XPATH = '//div[@data-ref]//canvas | //canvas[@aria-label]'
+OUTGOING_MESSAGE_XPATH = '//div[contains(@class,"message-out")]'
+LAST_OUTGOING_SENT_XPATH = (
+    '(//div[contains(@class,"message-out")])[last()]'
+    '//span[@data-icon="msg-check" or @data-icon="msg-dblcheck" or @data-icon="msg-dblcheck-ack"]'
+)
+LAST_OUTGOING_TEXT_XPATH = '(//div[contains(@class,"message-out")])[last()]//span[contains(@class,"selectable-text")]'
+
+# إدخال النص كاملاً في مربع الكتابة بحدث لصق واحد (يعالجه محرر WhatsApp كلصق عادي)
+# مع execCommand كبديل للمحررات التي لا تعالج حدث اللصق، ويعيد النص الموجود في المربع
+INJECT_TEXT_SCRIPT = """
+const box = arguments[0], text = arguments[1];
+box.focus();
+const data = new DataTransfer();
+data.setData('text/plain', text);
+box.dispatchEvent(new ClipboardEvent('paste', {clipboardData: data, bubbles: true, cancelable: true}));
+if (!(box.innerText || '').trim()) {
+    document.execCommand('insertText', false, text);
+}
+return box.innerText || box.textContent || '';
+"""
+
+# مسار ChromeDriver محلي يتجاوز البحث والتنزيل (مثلاً على خادم بدون إنترنت)
+CHROMEDRIVER_ENV = "CHROMEDRIVER_PATH"
+
+# مهلات الانتظار المبنية على الشروط (بالثواني)
+WAIT_POLL = 0.2
+LOGIN_TIMEOUT = 40
+ELEMENT_TIMEOUT = 20
+CONTACT_TIMEOUT = 10
+DELIVERY_TIMEOUT = 30
+UPLOAD_TIMEOUT = 120
+
+
+def _normalize_text(text: str) -> str:
+    """النص بدون فروق المسافات والأسطر (محرر WhatsApp قد يغير المسافات عند العرض)"""
+    return " ".join(text.split())
+
+
+def _timed_step(step_name: str):
+    """تسجيل الزمن الفعلي لكل خطوة ونتيجتها في step_timings وسجل المقاييس"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(self, *args, **kwargs):
+            start = time.perf_counter()
+            result = None
+            try:
+                result = func(self, *args, **kwargs)
+                return result
+            finally:
+                # الخطوات التي ترفع استثناء (مثل انتهاء مهلة الانتظار) تُسجل كفاشلة مع زمنها
+                seconds = time.perf_counter() - start
+                self.step_timings.append({
+                    "step": step_name,
+                    "seconds": round(seconds, 3),
+                    "success": bool(result)
+                })
+                REGISTRY.observe("whatsapp_step_seconds", seconds, step=step_name)
+                REGISTRY.inc("whatsapp_steps_total", step=step_name, success=str(bool(result)).lower())
+        return wrapper
+    return decorator
+
 
 class WhatsAppWebSender:
     """مرسل رسائل WhatsApp Web"""
     
-    def __init__(self, profile_dir: str = "/home/ubuntu/.chrome_whatsapp_profile"):
+    def __init__(self, profile_dir: str = "/home/ubuntu/.chrome_whatsapp_profile",
+                 driver_factory: Optional[Callable] = None):
         self.profile_dir = profile_dir
         self.driver = None
+        # مصنع متصفح بديل (مثل متصفح وهمي للاختبار)
+        self.driver_factory = driver_factory
+        # أزمنة الخطوات الفعلية للإرسال الحالي
+        self.step_timings: List[Dict] = []
+        # طلب إيقاف جلسة قيد الفتح من خيط آخر
+        self._abort_requested = False
         self.config_file = "/home/ubuntu/whatsapp_config.json"
         self.config = self._load_config()
         
@@ -57,9 +132,74 @@ class WhatsAppWebSender:
         except Exception as e:
             logger.error(f"خطأ في حفظ الإعدادات: {str(e)}")
     
+    def get_step_timings(self) -> List[Dict]:
+        """أزمنة الخطوات المسجلة منذ آخر إعادة تعيين"""
+        return [dict(step) for step in self.step_timings]
+    
+    def reset_step_timings(self):
+        """مسح أزمنة الخطوات"""
+        self.step_timings = []
+    
+    def _wait(self, timeout: float):
+        from selenium.webdriver.support.ui import WebDriverWait
+        return WebDriverWait(self.driver, timeout, poll_frequency=WAIT_POLL)
+    
+    def _outgoing_count(self) -> int:
+        from selenium.webdriver.common.by import By
+        return len(self.driver.find_elements(By.XPATH, OUTGOING_MESSAGE_XPATH))
+    
+    def _wait_for_sent(self, previous_count: int, timeout: float):
+        """انتظار ظهور رسالة صادرة جديدة مع علامة الإرسال (✓ أو ✓✓)"""
+        from selenium.webdriver.common.by import By
+        self._wait(timeout).until(
+            lambda d: self._outgoing_count() > previous_count
+            and d.find_elements(By.XPATH, LAST_OUTGOING_SENT_XPATH)
+        )
+    
+    @_timed_step("import_selenium")
+    def _import_selenium(self) -> bool:
+        """تحميل Selenium لأول مرة (يُسجل زمنه منفصلاً عن تشغيل المتصفح)"""
+        importlib.import_module("selenium.webdriver")
+        return True
+    
+    @_timed_step("resolve_chromedriver")
+    def _resolve_chromedriver(self) -> str:
+        """مسار ChromeDriver: متغير البيئة، ثم المسار المحفوظ، ثم التنزيل مرة واحدة وحفظ المسار"""
+        env_path = os.environ.get(CHROMEDRIVER_ENV)
+        if env_path:
+            if os.path.exists(env_path):
+                return env_path
+            logger.warning(f"{CHROMEDRIVER_ENV} غير موجود: {env_path}")
+        
+        cached_path = self.config.get("chromedriver_path")
+        if cached_path and os.path.exists(cached_path):
+            return cached_path
+        
+        # البحث عن الإصدار المناسب وتنزيله (مرة واحدة فقط، أو الإصدار المثبت في الإعدادات)
+        from webdriver_manager.chrome import ChromeDriverManager
+        version = self.config.get("chromedriver_version")
+        manager = ChromeDriverManager(driver_version=version) if version else ChromeDriverManager()
+        driver_path = manager.install()
+        
+        self.config["chromedriver_path"] = driver_path
+        self._save_config()
+        logger.info(f"تم حفظ مسار ChromeDriver: {driver_path}")
+        return driver_path
+    
+    @_timed_step("launch_browser")
     def initialize_browser(self, headless: bool = False) -> bool:
         """تهيئة متصفح Chrome"""
         try:
+            if self.driver_factory:
+                self.driver = self.driver_factory()
+                logger.info("تم تهيئة المتصفح بنجاح")
+                return True
+            
+            self._import_selenium()
+            from selenium import webdriver
+            from selenium.webdriver.chrome.service import Service
+            from selenium.webdriver.chrome.options import Options
+            
             chrome_options = Options()
             chrome_options.add_argument(f"--user-data-dir={self.profile_dir}")
             chrome_options.add_argument("--no-sandbox")
@@ -70,10 +210,18 @@ class WhatsAppWebSender:
             if headless:
                 chrome_options.add_argument("--headless=new")
             
-            # تثبيت ChromeDriver تلقائياً
-            service = Service(ChromeDriverManager().install())
+            driver_path = self._resolve_chromedriver()
+            try:
+                self.driver = webdriver.Chrome(service=Service(driver_path), options=chrome_options)
+            except Exception as e:
+                # المسار المحفوظ قد لا يتوافق مع إصدار Chrome بعد تحديثه
+                if driver_path != self.config.get("chromedriver_path"):
+                    raise
+                logger.warning(f"فشل التشغيل بـ ChromeDriver المحفوظ، إعادة التحديد: {str(e)}")
+                self.config.pop("chromedriver_path", None)
+                driver_path = self._resolve_chromedriver()
+                self.driver = webdriver.Chrome(service=Service(driver_path), options=chrome_options)
             
-            self.driver = webdriver.Chrome(service=service, options=chrome_options)
             logger.info("تم تهيئة المتصفح بنجاح")
             return True
             
@@ -81,8 +229,11 @@ class WhatsAppWebSender:
             logger.error(f"خطأ في تهيئة المتصفح: {str(e)}")
             return False
     
+    @_timed_step("open_whatsapp")
     def open_whatsapp_web(self, wait_for_login: bool = True) -> bool:
         """فتح WhatsApp Web"""
+        from selenium.webdriver.common.by import By
+        from selenium.webdriver.support import expected_conditions as EC
         try:
             if not self.driver:
                 logger.error("المتصفح غير مهيأ")
@@ -92,19 +243,23 @@ class WhatsAppWebSender:
             self.driver.get("https://web.whatsapp.com")
             
             if wait_for_login:
-                # انتظار تحميل WhatsApp Web
+                # انتظار تحميل WhatsApp Web حتى يظهر مربع البحث أو رمز QR
                 logger.info("انتظار تحميل WhatsApp Web...")
-                time.sleep(10)
-                
-                # التحقق من تسجيل الدخول
                 try:
-                    # البحث عن عنصر يدل على تسجيل الدخول
-                    WebDriverWait(self.driver, 30).until(
-                        EC.presence_of_element_located((By.XPATH, '//div[@contenteditable="true"][@data-tab="3"]'))
+                    self._wait(LOGIN_TIMEOUT).until(
+                        lambda d: d.find_elements(By.XPATH, SEARCH_BOX_XPATH)
+                        or d.find_elements(By.XPATH, QR_CODE_XPATH)
                     )
+                    
+                    # التحقق من تسجيل الدخول (مع مهلة لمسح QR Code إن ظهر)
+                    if not self.driver.find_elements(By.XPATH, SEARCH_BOX_XPATH):
+                        logger.warning("يرجى مسح QR Code لتسجيل الدخول")
+                        self._wait(LOGIN_TIMEOUT).until(
+                            EC.presence_of_element_located((By.XPATH, SEARCH_BOX_XPATH))
+                        )
                     logger.info("تم تسجيل الدخول بنجاح")
                     return True
-                except:
+                except Exception:
                     logger.warning("قد تحتاج إلى مسح QR Code")
                     return False
             
@@ -114,30 +269,33 @@ class WhatsAppWebSender:
             logger.error(f"خطأ في فتح WhatsApp Web: {str(e)}")
             return False
     
+    @_timed_step("search_contact")
     def search_contact(self, contact_name: str) -> bool:
         """البحث عن جهة اتصال أو مجموعة"""
+        from selenium.webdriver.common.by import By
+        from selenium.webdriver.support import expected_conditions as EC
         try:
             logger.info(f"البحث عن: {contact_name}")
             
             # البحث عن مربع البحث
-            search_box = WebDriverWait(self.driver, 20).until(
-                EC.presence_of_element_located((By.XPATH, '//div[@contenteditable="true"][@data-tab="3"]'))
+            search_box = self._wait(ELEMENT_TIMEOUT).until(
+                EC.element_to_be_clickable((By.XPATH, SEARCH_BOX_XPATH))
             )
             
-            # مسح البحث السابق
+            # مسح البحث السابق وكتابة اسم الجهة
             search_box.clear()
-            time.sleep(1)
-            
-            # كتابة اسم الجهة
             search_box.send_keys(contact_name)
-            time.sleep(2)
             
-            # النقر على النتيجة الأولى
-            first_result = WebDriverWait(self.driver, 10).until(
-                EC.presence_of_element_located((By.XPATH, f'//span[@title="{contact_name}"]'))
+            # النقر على النتيجة الأولى فور ظهورها
+            first_result = self._wait(CONTACT_TIMEOUT).until(
+                EC.element_to_be_clickable((By.XPATH, CONTACT_XPATH.format(contact_name=contact_name)))
             )
             first_result.click()
-            time.sleep(2)
+            
+            # انتظار فتح المحادثة (ظهور مربع الكتابة)
+            self._wait(ELEMENT_TIMEOUT).until(
+                EC.presence_of_element_located((By.XPATH, MESSAGE_BOX_XPATH))
+            )
             
             logger.info(f"تم فتح المحادثة مع: {contact_name}")
             return True
@@ -146,29 +304,64 @@ class WhatsAppWebSender:
             logger.error(f"خطأ في البحث عن الجهة: {str(e)}")
             return False
     
-    def send_message(self, message: str) -> bool:
-        """إرسال رسالة نصية"""
+    def _inject_text(self, message_box, message: str) -> bool:
+        """إدخال الرسالة كاملة في عملية واحدة عبر سكربت اللصق
+
+        ينجح فقط إذا طابق محتوى المربع الرسالة (بتجاهل فروق المسافات)، فاللصق
+        الجزئي أو المكرر يُعامل كفشل ويُمسح المربع قبل الكتابة العادية
+        """
+        try:
+            content = self.driver.execute_script(INJECT_TEXT_SCRIPT, message_box, message)
+            if content and _normalize_text(content) == _normalize_text(message):
+                return True
+            if content and content.strip():
+                logger.warning("النص المُدخل لا يطابق الرسالة")
+            return False
+        except Exception as e:
+            logger.warning(f"تعذر إدخال النص دفعة واحدة: {str(e)}")
+            return False
+    
+    def _type_text(self, message_box, message: str):
+        """كتابة الرسالة سطراً بسطر عبر send_keys (الطريقة الاحتياطية)"""
+        from selenium.webdriver.common.keys import Keys
+        lines = message.split('\n')
+        for i, line in enumerate(lines):
+            message_box.send_keys(line)
+            if i < len(lines) - 1:
+                # استخدام Shift+Enter للسطر الجديد
+                message_box.send_keys(Keys.SHIFT + Keys.ENTER)
+    
+    def _clear_message_box(self, message_box):
+        """مسح أي نص جزئي من مربع الكتابة"""
+        from selenium.webdriver.common.keys import Keys
+        message_box.send_keys(Keys.CONTROL, 'a')
+        message_box.send_keys(Keys.DELETE)
+    
+    @_timed_step("send_message")
+    def send_message(self, message: str, fast: bool = True) -> bool:
+        """إرسال رسالة نصية (إدخال سريع دفعة واحدة مع الكتابة حرفاً بحرف كبديل)"""
+        from selenium.webdriver.common.by import By
+        from selenium.webdriver.common.keys import Keys
+        from selenium.webdriver.support import expected_conditions as EC
         try:
             logger.info("إرسال الرسالة...")
             
             # البحث عن مربع الرسالة
-            message_box = WebDriverWait(self.driver, 20).until(
-                EC.presence_of_element_located((By.XPATH, '//div[@contenteditable="true"][@data-tab="10"]'))
+            message_box = self._wait(ELEMENT_TIMEOUT).until(
+                EC.element_to_be_clickable((By.XPATH, MESSAGE_BOX_XPATH))
             )
+            previous_count = self._outgoing_count()
             
-            # تقسيم الرسالة إلى أسطر وإرسالها
-            lines = message.split('\n')
-            for i, line in enumerate(lines):
-                message_box.send_keys(line)
-                if i < len(lines) - 1:
-                    # استخدام Shift+Enter للسطر الجديد
-                    message_box.send_keys(Keys.SHIFT + Keys.ENTER)
+            # إدخال الرسالة كاملة، أو كتابتها سطراً بسطر إذا لم ينجح الإدخال السريع
+            if not (fast and self._inject_text(message_box, message)):
+                if fast:
+                    logger.warning("الإدخال السريع غير متاح، استخدام الكتابة العادية")
+                    self._clear_message_box(message_box)
+                self._type_text(message_box, message)
             
-            time.sleep(1)
-            
-            # إرسال الرسالة
+            # إرسال الرسالة وانتظار ظهورها مع علامة الإرسال
             message_box.send_keys(Keys.ENTER)
-            time.sleep(2)
+            self._wait_for_sent(previous_count, DELIVERY_TIMEOUT)
             
             logger.info("تم إرسال الرسالة بنجاح")
             return True
@@ -177,8 +370,11 @@ class WhatsAppWebSender:
             logger.error(f"خطأ في إرسال الرسالة: {str(e)}")
             return False
     
+    @_timed_step("attach_file")
     def attach_file(self, file_path: str) -> bool:
         """إرفاق ملف"""
+        from selenium.webdriver.common.by import By
+        from selenium.webdriver.support import expected_conditions as EC
         try:
             if not os.path.exists(file_path):
                 logger.error(f"الملف غير موجود: {file_path}")
@@ -186,26 +382,28 @@ class WhatsAppWebSender:
             
             logger.info(f"إرفاق الملف: {file_path}")
             
+            previous_count = self._outgoing_count()
+            
             # النقر على زر الإرفاق
-            attach_button = WebDriverWait(self.driver, 20).until(
-                EC.presence_of_element_located((By.XPATH, '//div[@title="Attach"]'))
+            attach_button = self._wait(ELEMENT_TIMEOUT).until(
+                EC.element_to_be_clickable((By.XPATH, ATTACH_BUTTON_XPATH))
             )
             attach_button.click()
-            time.sleep(1)
             
             # اختيار "Document"
-            document_button = WebDriverWait(self.driver, 10).until(
-                EC.presence_of_element_located((By.XPATH, '//input[@accept="*"]'))
+            document_button = self._wait(CONTACT_TIMEOUT).until(
+                EC.presence_of_element_located((By.XPATH, FILE_INPUT_XPATH))
             )
             document_button.send_keys(os.path.abspath(file_path))
-            time.sleep(3)
             
-            # النقر على زر الإرسال
-            send_button = WebDriverWait(self.driver, 10).until(
-                EC.presence_of_element_located((By.XPATH, '//span[@data-icon="send"]'))
+            # انتظار جاهزية معاينة الملف ثم النقر على زر الإرسال
+            send_button = self._wait(ELEMENT_TIMEOUT).until(
+                EC.element_to_be_clickable((By.XPATH, SEND_BUTTON_XPATH))
             )
             send_button.click()
-            time.sleep(3)
+            
+            # انتظار اكتمال الرفع (ظهور الملف في المحادثة مع علامة الإرسال)
+            self._wait_for_sent(previous_count, UPLOAD_TIMEOUT)
             
             logger.info("تم إرفاق وإرسال الملف بنجاح")
             return True
@@ -222,41 +420,105 @@ class WhatsAppWebSender:
                 logger.info("تم إغلاق المتصفح")
         except Exception as e:
             logger.error(f"خطأ في إغلاق المتصفح: {str(e)}")
+        finally:
+            self.driver = None
+    
+    def abort_session(self):
+        """إيقاف جلسة قيد الفتح أو مفتوحة (يمكن استدعاؤها من خيط آخر)"""
+        self._abort_requested = True
+        self.close_browser()
+    
+    def start_session(self, headless: bool = False) -> bool:
+        """تهيئة المتصفح وفتح WhatsApp Web حتى تسجيل الدخول"""
+        self._abort_requested = False
+        if not self.initialize_browser(headless=headless):
+            return False
+        
+        # إغلاق المتصفح إذا طُلب الإيقاف أثناء تشغيله
+        if self._abort_requested:
+            logger.info("تم إيقاف فتح الجلسة")
+            self.close_browser()
+            return False
+        
+        if not self.open_whatsapp_web():
+            logger.error("فشل فتح WhatsApp Web")
+            self.close_browser()
+            return False
+        
+        return True
+    
+    def is_session_healthy(self) -> bool:
+        """التحقق من أن المتصفح يعمل وأن WhatsApp Web ما زال مسجلاً للدخول"""
+        try:
+            if not self.driver:
+                return False
+            from selenium.webdriver.common.by import By
+            if self.driver.execute_script("return document.readyState") != "complete":
+                return False
+            return len(self.driver.find_elements(By.XPATH, SEARCH_BOX_XPATH)) > 0
+        except Exception as e:
+            logger.warning(f"جلسة WhatsApp Web غير صالحة: {str(e)}")
+            return False
+    
+    def last_outgoing_text(self) -> Optional[str]:
+        """نص آخر رسالة صادرة في المحادثة المفتوحة، أو None"""
+        try:
+            from selenium.webdriver.common.by import By
+            elements = self.driver.find_elements(By.XPATH, LAST_OUTGOING_TEXT_XPATH)
+            return elements[-1].text if elements else None
+        except Exception as e:
+            logger.warning(f"تعذر قراءة آخر رسالة صادرة: {str(e)}")
+            return None
+    
+    def send_in_session(self, contact_name: str, message: str,
+                        pdf_file: Optional[str] = None, skip_if_sent: bool = False) -> bool:
+        """إرسال رسالة (وملف اختياري) عبر جلسة مفتوحة مسبقاً بدون إغلاق المتصفح
+        
+        skip_if_sent: عدم الإرسال إذا كانت آخر رسالة صادرة في المحادثة هي نفس الرسالة
+        (عند إعادة محاولة إرسال قد يكون اكتمل دون تأكيد)
+        """
+        # البحث عن الجهة
+        if not self.search_contact(contact_name):
+            logger.error(f"فشل البحث عن: {contact_name}")
+            return False
+        
+        if skip_if_sent:
+            last_text = self.last_outgoing_text()
+            if last_text is not None and _normalize_text(last_text) == _normalize_text(message):
+                logger.info(f"تم إرسال الرسالة إلى {contact_name} سابقاً - لا حاجة لإعادة الإرسال")
+                return True
+        
+        # إرفاق الملف أولاً إذا كان موجوداً
+        if pdf_file and os.path.exists(pdf_file):
+            if not self.attach_file(pdf_file):
+                logger.warning("فشل إرفاق الملف، سيتم إرسال الرسالة فقط")
+        
+        # إرسال الرسالة
+        if not self.send_message(message):
+            logger.error("فشل إرسال الرسالة")
+            return False
+        
+        return True
     
     def send_complete_message(self, contact_name: str, message: str, 
                             pdf_file: Optional[str] = None) -> bool:
         """إرسال رسالة كاملة مع ملف PDF اختياري"""
         try:
-            # تهيئة المتصفح
-            if not self.initialize_browser(headless=False):
-                return False
+            self.reset_step_timings()
             
-            # فتح WhatsApp Web
-            if not self.open_whatsapp_web():
-                logger.error("فشل فتح WhatsApp Web")
-                self.close_browser()
+            # تهيئة المتصفح وفتح WhatsApp Web
+            if not self.start_session(headless=False):
                 return False
             
-            # البحث عن الجهة
-            if not self.search_contact(contact_name):
-                logger.error(f"فشل البحث عن: {contact_name}")
-                self.close_browser()
-                return False
-            
-            # إرفاق الملف أولاً إذا كان موجوداً
-            if pdf_file and os.path.exists(pdf_file):
-                if not self.attach_file(pdf_file):
-                    logger.warning("فشل إرفاق الملف، سيتم إرسال الرسالة فقط")
-            
-            # إرسال الرسالة
-            if not self.send_message(message):
-                logger.error("فشل إرسال الرسالة")
+            if not self.send_in_session(contact_name, message, pdf_file):
                 self.close_browser()
                 return False
             
             # إغلاق المتصفح
             self.close_browser()
             
+            steps = ", ".join(f"{t['step']}={t['seconds']:.2f}s" for t in self.step_timings)
+            logger.info(f"أزمنة الخطوات: {steps}")
             logger.info("تم إرسال الرسالة الكاملة بنجاح")
             return True
             
@@ -264,6 +526,69 @@ class WhatsAppWebSender:
             logger.error(f"خطأ في إرسال الرسالة الكاملة: {str(e)}")
             self.close_browser()
             return False
+    
+    def _dismiss_open_dialogs(self):
+        """إغلاق أي نافذة أو بحث مفتوح بعد فشل إرسال قبل الانتقال للمستلم التالي"""
+        try:
+            from selenium.webdriver.common.by import By
+            from selenium.webdriver.common.keys import Keys
+            self.driver.find_element(By.TAG_NAME, 'body').send_keys(Keys.ESCAPE)
+        except Exception:
+            pass
+    
+    def send_to_recipients(self, recipients: List[Dict], headless: bool = False) -> List[Dict]:
+        """إرسال إلى عدة مستلمين بالترتيب عبر جلسة متصفح واحدة (الحالية إن كانت سليمة)
+        
+        كل مستلم: {"contact": الاسم, "message": النص, "pdf_file": ملف اختياري,
+                   "skip_if_sent": التحقق من المحادثة قبل الإرسال}
+        يعيد نتيجة لكل مستلم، وفشل أحدهم لا يوقف البقية
+        """
+        results = []
+        try:
+            # استخدام جلسة مفتوحة مسبقاً إن وجدت (مثل متصفح تم تجهيزه أثناء جلب Gmail)
+            session_ok = self.is_session_healthy()
+            if not session_ok:
+                self.reset_step_timings()
+                session_ok = self.start_session(headless=headless)
+            
+            for recipient in recipients:
+                contact_name = recipient["contact"]
+                start = time.perf_counter()
+                first_step = len(self.step_timings)
+                result = {"contact": contact_name, "success": False}
+                
+                try:
+                    # إعادة فتح الجلسة إذا توقف المتصفح أثناء مستلم سابق
+                    if not session_ok or not self.is_session_healthy():
+                        self.close_browser()
+                        session_ok = self.start_session(headless=headless)
+                    
+                    if not session_ok:
+                        result["error"] = "session unavailable"
+                    elif self.send_in_session(contact_name, recipient.get("message", ""),
+                                              recipient.get("pdf_file"),
+                                              skip_if_sent=recipient.get("skip_if_sent", False)):
+                        result["success"] = True
+                    else:
+                        result["error"] = "send failed"
+                        self._dismiss_open_dialogs()
+                        
+                except Exception as e:
+                    result["error"] = str(e)
+                
+                result["seconds"] = round(time.perf_counter() - start, 3)
+                result["steps"] = self.get_step_timings()[first_step:]
+                results.append(result)
+                
+                status = "✓" if result["success"] else "✗"
+                logger.info(f"{status} {contact_name} ({result['seconds']:.2f}s)")
+            
+        finally:
+            self.close_browser()
+        
+        sent = sum(1 for r in results if r["success"])
+        logger.info(f"تم الإرسال إلى {sent}/{len(recipients)} مستلم")
+        return results
 
 
 def main():